@@ -0,0 +1,368 @@
+import csv
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+import mp_stats
+import vacancies
+import vacancy_index
+from compression import open_file
+from manifest import list_partitions
+from table_writer import get_exporter
+from year_splitter import RawDataSet
+
+
+def measure(function, repeat=3):
+    """Лучшее время выполнения функции
+
+    :param function: Функция без аргументов
+    :param int repeat: Количество повторов
+    :return float: Время в секундах
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best: best = elapsed
+    return best
+
+
+def get_peak_rss():
+    """ :return int: Пиковый RSS процесса в МБ (VmHWM из /proc, сбрасывается при запуске нового процесса) """
+    with open('/proc/self/status', mode='r') as file:
+        for line in file:
+            if line.startswith('VmHWM:'): return int(line.split()[1]) // 1024
+    return 0
+
+
+def run_measured(function, args):
+    """Выполняет функцию и возвращает пиковую память процесса (выполняется в отдельном процессе)
+
+    :param function: Функция
+    :param tuple args: Аргументы
+    :return tuple: Пиковый RSS до и после выполнения в МБ
+    """
+    before = get_peak_rss()
+    function(*args)
+    return before, get_peak_rss()
+
+
+def peak_memory(function, *args):
+    """Пиковая память функции в новом процессе (память этого процесса не учитывается)
+
+    :param function: Функция уровня модуля
+    :param args: Аргументы
+    :return tuple: Пиковый RSS после импорта модулей и после выполнения в МБ
+    """
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(run_measured, (function, args))
+
+
+def query_scan(file_name, filters, sort, reverse=False, slice_num=(0, 20)):
+    """Запрос полным проходом по файлу
+
+    :param str file_name: Название файла
+    :param list filters: Пары (параметр, значение)
+    :param str sort: Параметры сортировки
+    :param bool reverse: Обратный порядок
+    :param tuple slice_num: Срез вакансий
+    :return list: Отобранные вакансии
+    """
+    data = vacancies.DataSet(file_name, [list(f) for f in filters], sort, reverse, list(slice_num))
+    data.csv_reader()
+    data.filtering()
+    data.sorting()
+    data.get_range()
+    return data.vacancies_objects
+
+
+def query_index(file_name, filters, sort, reverse=False, slice_num=(0, 20)):
+    """Запрос через индексы
+
+    :param str file_name: Название файла
+    :param list filters: Пары (параметр, значение)
+    :param str sort: Параметры сортировки
+    :param bool reverse: Обратный порядок
+    :param tuple slice_num: Срез вакансий
+    :return list: Отобранные вакансии
+    """
+    data = vacancies.DataSet(file_name, [list(f) for f in filters], sort, reverse, list(slice_num))
+    data.index_reader()
+    return data.vacancies_objects
+
+
+def compare_queries(indexed_name, queries):
+    """Время запросов полным проходом и через индексы (результаты должны совпадать)
+
+    :param str indexed_name: Файл с построенными индексами
+    :param list queries: Пары (описание, (фильтры, сортировка, обратный порядок))
+    :return list: Строки результата
+    """
+    lines = []
+    for description, query in queries:
+        scanned = [v.values for v in query_scan(indexed_name, *query)]
+        if [v.values for v in query_index(indexed_name, *query)] != scanned:
+            raise AssertionError('Результаты не совпадают: ' + description)
+        lines.append('{0}: проход {1:.3f} с, индекс {2:.3f} с (вакансий: {3})'.format(
+            description, measure(lambda: query_scan(indexed_name, *query)),
+            measure(lambda: query_index(indexed_name, *query)), len(scanned)))
+    return lines
+
+
+def bench_bitmap(file_name, indexed_name):
+    """Пересечение четырех условий битового индекса с сортировкой по окладу
+
+    :param str file_name: Исходный файл
+    :param str indexed_name: Копия файла с индексами
+    :return list: Строки результата
+    """
+    filters = [('Опыт работы', 'От 1 года до 3 лет'), ('Премиум-вакансия', 'Нет'),
+               ('Идентификатор валюты оклада', 'Рубли'), ('Название региона', 'Москва')]
+    return compare_queries(indexed_name, [('4 условия И + сортировка по окладу', (filters, 'Оклад'))])
+
+
+def bench_salary(file_name, indexed_name):
+    """Запросы по индексу интервалов зарплат с сортировкой
+
+    :param str file_name: Исходный файл
+    :param str indexed_name: Копия файла с индексами
+    :return list: Строки результата
+    """
+    return compare_queries(indexed_name, [
+        ('Оклад: 100000 + сортировка по окладу', ([('Оклад', '100000')], 'Оклад')),
+        ('Диапазон оклада: 50000 - 60000 + сортировка по дате', ([('Диапазон оклада', '50000 - 60000')],
+                                                                 'Дата публикации вакансии', True)),
+        ('Диапазон оклада: 0 - 1000000 + сортировка по окладу', ([('Диапазон оклада', '0 - 1000000')], 'Оклад')),
+    ])
+
+
+def bench_session(file_name, indexed_name):
+    """Запросы интерактивной сессии после загрузки файла в сравнении с разовыми запросами
+
+    :param str file_name: Исходный файл
+    :param str indexed_name: Копия файла с индексами
+    :return list: Строки результата
+    """
+    start = time.perf_counter()
+    with mock.patch('builtins.input', return_value='Выход'), mock.patch('builtins.print'):
+        session = vacancies.InputSession(file_name)
+    lines = ['загрузка файла {0:.3f} с'.format(time.perf_counter() - start)]
+    session.run_command('Диапазон: 1 21')
+    for commands in (['Фильтр: Название региона: Москва', 'Сортировка: Оклад'],
+                     ['Уточнить: Опыт работы: От 1 года до 3 лет'],
+                     ['Сортировка: Дата публикации вакансии', 'Обратный порядок: Да'],
+                     ['Фильтр: Навыки: Python', 'Сортировка: Название, Оклад', 'Обратный порядок: Нет']):
+        for command in commands: session.run_command(command)
+        query = (session.filter_params, session.sort_params, session.sort_reverse)
+        elapsed = measure(session.query, repeat=1)
+        lines.append('{0}: разовый запрос {1:.3f} с, сессия {2:.3f} с'.format(
+            '; '.join(commands), measure(lambda: query_scan(file_name, *query)), elapsed))
+    return lines
+
+
+def bench_memory(file_name, indexed_name):
+    """Память на одну загруженную вакансию (по tracemalloc)
+
+    Для сравнения - словарь строки, как его возвращает csv.DictReader.
+
+    :param str file_name: Исходный файл
+    :param str indexed_name: Копия файла с индексами
+    :return list: Строки результата
+    """
+    tracemalloc.start()
+    data = vacancies.DataSet(file_name, [], '', False, [])
+    data.csv_reader()
+    loaded = list(data.vacancies_objects)
+    plain = tracemalloc.get_traced_memory()[0]
+    for v in loaded: v.name, v.description, v.skills_len, v.salary_average
+    cached = tracemalloc.get_traced_memory()[0]
+    count = len(loaded) or 1
+    del data, loaded
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    with open_file(file_name, mode='r', encoding='utf-8-sig') as file:
+        rows = list(csv.DictReader(file))
+    dictionaries = tracemalloc.get_traced_memory()[0] / (len(rows) or 1)
+    tracemalloc.stop()
+    return ['вакансия {0:.0f} байт, с ключами сортировки {1:.0f} байт, словарь строки {2:.0f} байт'.format(
+        plain / count, cached / count, dictionaries)]
+
+
+def bench_html(file_name, indexed_name):
+    """Очистка и укорачивание описаний: только начало текста против очистки всего текста
+
+    Кэши очистки не используются, каждое описание чистится заново.
+
+    :param str file_name: Исходный файл
+    :param str indexed_name: Копия файла с индексами
+    :return list: Строки результата
+    """
+    with open_file(file_name, mode='r', encoding='utf-8-sig') as file:
+        descriptions = list({row.get('description', ''): None for row in csv.DictReader(file)})
+    short = vacancies.Cleaners.html_short.__wrapped__
+    remove = vacancies.Cleaners.html_remove.__wrapped__
+    if [short(d, 100) for d in descriptions] != [vacancies.Cleaners.short_text(remove(d), 100) for d in descriptions]:
+        raise AssertionError('Результаты очистки не совпадают')
+    size = sum(map(len, descriptions)) / (len(descriptions) or 1)
+    return ['описаний {0}, в среднем {1:.0f} символов: весь текст {2:.3f} с, начало текста {3:.3f} с'.format(
+        len(descriptions), size, measure(lambda: [vacancies.Cleaners.short_text(remove(d), 100) for d in descriptions]),
+        measure(lambda: [short(d, 100) for d in descriptions]))]
+
+
+def export_all(file_name, export_name):
+    """Выгружает все вакансии файла, как InputExport с пустыми параметрами
+
+    :param str file_name: Название файла
+    :param str export_name: Файл выгрузки
+    :return int: Количество строк
+    """
+    data = vacancies.DataSet(file_name, [], '', False, [])
+    data.csv_reader()
+    data.sorting()
+    data.vacancies_objects = data.iter_range(data.vacancies_objects)
+    columns = vacancies.InputConnect.table_header
+    return get_exporter(export_name)(export_name, columns, data.iter_table(columns))
+
+
+def bench_export(file_name, indexed_name):
+    """Пиковая память выгрузки всех вакансий в CSV и XLSX
+
+    :param str file_name: Исходный файл
+    :param str indexed_name: Копия файла с индексами (выгрузка пишется рядом с ней)
+    :return list: Строки результата
+    """
+    lines = []
+    for extension in ('.csv', '.xlsx'):
+        export_name = os.path.splitext(indexed_name)[0] + '_export' + extension
+        base, peak = peak_memory(export_all, file_name, export_name)
+        lines.append('{0}: после импорта {1} МБ, пик {2} МБ'.format(extension, base, peak))
+        os.remove(export_name)
+    return lines
+
+
+def sort_all(file_name, sort_memory):
+    """Сортирует все вакансии файла по описанию и читает результат
+
+    :param str file_name: Название файла
+    :param int sort_memory: Бюджет памяти сортировки (None - только в памяти)
+    :return int: Количество вакансий
+    """
+    data = vacancies.DataSet(file_name, [], 'Описание', False, [])
+    data.sort_memory = sort_memory
+    data.csv_reader()
+    data.sorting()
+    return sum(1 for _ in data.iter_range(data.vacancies_objects))
+
+
+def bench_sort(file_name, indexed_name):
+    """Пиковая память полной сортировки в памяти и внешней сортировки с разным бюджетом
+
+    Учитывается основной процесс; серии, отсортированные в пуле, занимают память процессов пула.
+
+    :param str file_name: Исходный файл
+    :param str indexed_name: Копия файла с индексами
+    :return list: Строки результата
+    """
+    lines = []
+    for sort_memory in (None, 16 << 20, 4 << 20):
+        start = time.perf_counter()
+        base, peak = peak_memory(sort_all, file_name, sort_memory)
+        budget = 'в памяти' if sort_memory is None else 'бюджет {0} МБ'.format(sort_memory >> 20)
+        lines.append('{0}: {1:.1f} с, после импорта {2} МБ, пик {3} МБ'.format(
+            budget, time.perf_counter() - start, base, peak))
+    return lines
+
+
+def partition_statistics(partitions, vacancy_name, without_name):
+    """Статистика mp_stats по партициям в одном процессе
+
+    :param list partitions: Пары (файл партиции, количество строк)
+    :param str vacancy_name: Название профессии
+    :param set without_name: Партиции, в которых профессии нет по фильтру Блума
+    :return list: Статистика по партициям (словари атрибутов)
+    """
+    return [vars(mp_stats.DataSet(path, None if path in without_name else vacancy_name).get_statistic())
+            for path, _ in partitions]
+
+
+def bench_bloom(file_name, indexed_name):
+    """Статистика mp_stats по партициям без фильтра Блума по названиям и с ним
+
+    Партиции читаются целиком в обоих случаях (общая статистика нужна по всем записям),
+    фильтр убирает только сравнение названия в каждой записи партиций без профессии.
+
+    :param str file_name: Исходный файл
+    :param str indexed_name: Копия файла с индексами (партиции пишутся рядом с ней)
+    :return list: Строки результата
+    """
+    directory = os.path.splitext(indexed_name)[0] + '_parts'
+    RawDataSet(file_name).split(directory)
+    partitions, _ = list_partitions(directory, need_salary=True)
+    lines = []
+    for vacancy_name in ('Аналитик', 'Водолаз'):
+        with_name, _ = list_partitions(directory, need_salary=True, contains={'name': vacancy_name})
+        without_name = set(f for f, _ in partitions) - set(f for f, _ in with_name)
+        if partition_statistics(partitions, vacancy_name, without_name) != \
+                partition_statistics(partitions, vacancy_name, set()):
+            raise AssertionError('Результаты не совпадают: ' + vacancy_name)
+        lines.append('{0}: партиций без профессии {1} из {2}, без фильтра {3:.3f} с, с фильтром {4:.3f} с'.format(
+            vacancy_name, len(without_name), len(partitions),
+            measure(lambda: partition_statistics(partitions, vacancy_name, set())),
+            measure(lambda: partition_statistics(partitions, vacancy_name, without_name))))
+    return lines
+
+
+BENCHMARKS = {
+    'bitmap': bench_bitmap,
+    'bloom': bench_bloom,
+    'memory': bench_memory,
+    'html': bench_html,
+    'salary': bench_salary,
+    'session': bench_session,
+    'export': bench_export,
+    'sort': bench_sort,
+}
+
+
+class InputConnect:
+    """Замеры производительности на файле вакансий
+
+    Индексы строятся для копии файла во временной папке, рядом с исходным файлом ничего не пишется.
+
+    Attributes:
+        file_name (str): Название CSV файла
+        names (list): Названия замеров
+    """
+    def __init__(self, fn=None, names=None):
+        """
+        Начало работы замеров
+
+        :param str fn: Название CSV файла
+        :param list names: Названия замеров (None - все)
+        """
+        self.file_name = fn
+        if fn is None:
+            self.file_name = input('Введите название файла: ')
+        self.names = names
+        if names is None:
+            self.names = input('Введите замеры ({0}; пусто - все): '.format(', '.join(BENCHMARKS))).split(', ')
+        self.names = [name for name in self.names if name in BENCHMARKS] or list(BENCHMARKS)
+
+        directory = tempfile.mkdtemp(prefix='vacancies_bench_')
+        try:
+            indexed_name = os.path.join(directory, os.path.basename(self.file_name))
+            shutil.copyfile(self.file_name, indexed_name)
+            vacancy_index.InputConnect(indexed_name)
+            for name in self.names:
+                for line in BENCHMARKS[name](self.file_name, indexed_name): print(name + ': ' + line)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__': InputConnect()
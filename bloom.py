@@ -0,0 +1,173 @@
+import base64
+import hashlib
+import math
+import zlib
+
+
+class BloomFilter:
+    """Фильтр Блума: компактное множество с ложноположительными ответами
+
+    Attributes:
+        size (int): Количество бит
+        hashes (int): Количество хэш-функций
+        bits (bytearray): Битовый массив
+    """
+    def __init__(self, capacity, error_rate=0.01):
+        """Конструктор фильтра
+
+        :param int capacity: Ожидаемое количество элементов
+        :param float error_rate: Допустимая доля ложноположительных ответов
+
+        >>> bloom = BloomFilter(100)
+        >>> bloom.add('Москва')
+        >>> 'Москва' in bloom, 'Казань' in bloom
+        (True, False)
+        """
+        self.size = self.get_size(capacity, error_rate)
+        self.hashes = max(1, round(-math.log2(error_rate)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    @staticmethod
+    def get_size(capacity, error_rate):
+        """Количество бит фильтра
+
+        :param int capacity: Ожидаемое количество элементов
+        :param float error_rate: Допустимая доля ложноположительных ответов
+        :return int: Количество бит
+        """
+        return max(256, int(-max(capacity, 1) * math.log(error_rate) / math.log(2) ** 2))
+
+    def positions(self, item):
+        """Номера бит элемента (двойное хэширование)
+
+        :param item: Элемент (строка или байты; 16 байт считаются готовым хэшем)
+        :return: Генератор номеров бит
+        """
+        if isinstance(item, bytes) and len(item) == 16: digest = item
+        else: digest = hashlib.blake2b(item if isinstance(item, bytes) else item.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        """Добавляет элемент
+
+        :param item: Элемент
+        """
+        for pos in self.positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        """Проверяет наличие элемента (возможна ложноположительная проверка)
+
+        :param item: Элемент
+        :return bool: False, если элемента точно нет
+        """
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(item))
+
+    def to_dict(self):
+        """ :return: Сериализованный фильтр """
+        return {'size': self.size, 'hashes': self.hashes,
+                'bits': base64.b64encode(zlib.compress(bytes(self.bits))).decode('ascii')}
+
+    @staticmethod
+    def from_dict(data):
+        """Восстанавливает фильтр
+
+        :param dict data: Сериализованный фильтр
+        :return BloomFilter: Фильтр
+
+        >>> bloom = BloomFilter(10)
+        >>> bloom.add('Python')
+        >>> 'Python' in BloomFilter.from_dict(bloom.to_dict())
+        True
+        """
+        bloom = BloomFilter(1)
+        bloom.size, bloom.hashes = data['size'], data['hashes']
+        bloom.bits = bytearray(zlib.decompress(base64.b64decode(data['bits'])))
+        return bloom
+
+    @staticmethod
+    def from_items(items, error_rate=0.01):
+        """Строит фильтр по готовому множеству элементов
+
+        :param set items: Элементы
+        :param float error_rate: Допустимая доля ложноположительных ответов
+        :return BloomFilter: Фильтр
+        """
+        bloom = BloomFilter(len(items), error_rate)
+        for item in items: bloom.add(item)
+        return bloom
+
+
+class ScalableBloomFilter:
+    """Масштабируемый фильтр Блума в пределах заданного объема памяти
+
+    Когда текущий фильтр заполнен, добавляется новый - вдвое больше и с вдвое меньшей
+    долей ошибок. Если следующий фильтр не помещается в бюджет, элементы продолжают
+    добавляться в последний: доля ложноположительных ответов растет, а память - нет.
+
+    Attributes:
+        memory (int): Бюджет памяти в байтах
+        error_rate (float): Доля ложноположительных ответов первого фильтра
+        filters (list): Фильтры
+        capacities (list): Расчетные емкости фильтров
+        count (int): Элементов в последнем фильтре
+    """
+    def __init__(self, memory, capacity=1 << 16, error_rate=0.001):
+        """Конструктор фильтра
+
+        :param int memory: Бюджет памяти в байтах
+        :param int capacity: Емкость первого фильтра
+        :param float error_rate: Доля ложноположительных ответов первого фильтра
+
+        >>> bloom = ScalableBloomFilter(1 << 12, capacity=10)
+        >>> for i in range(100): bloom.add(str(i))
+        >>> len(bloom.filters) > 1, all(str(i) in bloom for i in range(100)), sum(len(f.bits) for f in bloom.filters) <= 1 << 12
+        (True, True, True)
+        """
+        self.memory = memory
+        self.error_rate = error_rate
+        self.filters = []
+        capacity = max(self.fit(capacity, error_rate), 1)
+        self.filters = [BloomFilter(capacity, error_rate)]
+        self.capacities = [capacity]
+        self.count = 0
+
+    def fit(self, capacity, error_rate):
+        """Наибольшая емкость не больше заданной, при которой фильтр помещается в оставшийся бюджет
+
+        :param int capacity: Желаемая емкость
+        :param float error_rate: Доля ложноположительных ответов
+        :return int: Емкость (0 - не помещается)
+        """
+        left = (self.memory - self.size) * 8
+        while capacity > 0 and BloomFilter.get_size(capacity, error_rate) > left: capacity //= 2
+        return capacity
+
+    @property
+    def size(self):
+        """ :return int: Занятая память в байтах """
+        return sum(len(f.bits) for f in self.filters)
+
+    def add(self, item):
+        """Добавляет элемент
+
+        :param item: Элемент
+        """
+        if self.count >= self.capacities[-1]:
+            error_rate = self.error_rate / 2 ** len(self.filters)
+            capacity = self.fit(self.capacities[-1] * 2, error_rate)
+            if capacity > self.capacities[-1]:
+                self.filters.append(BloomFilter(capacity, error_rate))
+                self.capacities.append(capacity)
+                self.count = 0
+        self.filters[-1].add(item)
+        self.count += 1
+
+    def __contains__(self, item):
+        """Проверяет наличие элемента (возможна ложноположительная проверка)
+
+        :param item: Элемент
+        :return bool: False, если элемента точно нет
+        """
+        return any(item in f for f in self.filters)
@@ -0,0 +1,404 @@
+import csv
+import heapq
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+from operator import itemgetter
+
+from compression import open_file
+from manifest import Manifest, PartitionStats, PARTITION_EXTENSIONS, list_partitions, scan_partition
+from year_splitter import PartitionKey
+
+LEVEL0_DIR = '_level0'
+LOCK_NAME = 'compaction.lock'
+
+
+def extension(file_name):
+    """Расширение файла партиции
+
+    :param str file_name: Название файла
+    :return str: Расширение (.csv, .csv.gz, ...)
+
+    >>> extension('2007.g3.csv.gz'), extension('2007.csv')
+    ('.csv.gz', '.csv')
+    """
+    for ext in sorted(PARTITION_EXTENSIONS, key=len, reverse=True):
+        if file_name.endswith(ext): return ext
+    return os.path.splitext(file_name)[1]
+
+
+def read_rows(path, columns):
+    """Читает записи CSV файла в порядке заданных столбцов
+
+    Отсутствующие в файле столбцы заполняются пустыми строками, лишние отбрасываются.
+
+    :param str path: Путь к файлу
+    :param list columns: Нужные столбцы (None - столбцы файла)
+    :return: Генератор пар (заголовок файла, запись); записи с неверным числом полей пропускаются
+    """
+    with open_file(path, mode='r', encoding='utf-8-sig', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        columns = columns or header
+        indexes = [header.index(c) if c in header else None for c in columns]
+        for row in reader:
+            if len(row) != len(header):
+                yield header, None
+                continue
+            yield header, [row[i] if i is not None else '' for i in indexes]
+
+
+class Compactor:
+    """Уплотнение файлов выгрузки hh.ru в партиции (как в LSM-дереве)
+
+    Файлы выгрузки складываются в папку _level0 (сегменты уровня 0) и при уплотнении
+    сливаются с партициями: записи отсортированы по дате публикации, дубликаты удаляются.
+    Новые файлы партиций пишутся под следующим номером поколения, после чего манифест
+    атомарно заменяется - читатели видят либо старый, либо новый набор файлов целиком.
+    Замененные файлы удаляются не раньше, чем через grace секунд.
+    Записи сортируются сериями не больше sort_memory байт, серии сливаются потоком,
+    поэтому память не растет с размером партиции.
+
+    Attributes:
+        directory (str): Папка с партициями
+        level0 (str): Папка сегментов уровня 0
+        grace (float): Сколько секунд хранить замененные файлы партиций
+        skipped (int): Записей без ключа разбиения при последнем уплотнении
+        duplicates (int): Удалено дубликатов при последнем уплотнении
+    """
+    key_columns = ['name', 'area_name', 'published_at', 'salary_from', 'salary_to', 'salary_currency']
+    sort_memory = 64 << 20
+    run_chunk = 1024
+
+    def __init__(self, directory, grace=3600):
+        """Конструктор уплотнения
+
+        :param str directory: Папка с партициями
+        :param float grace: Сколько секунд хранить замененные файлы партиций
+        """
+        self.directory = directory
+        self.level0 = os.path.join(directory, LEVEL0_DIR)
+        self.grace = grace
+        self.skipped = 0
+        self.duplicates = 0
+
+    def ingest(self, file_name):
+        """Добавляет файл выгрузки как сегмент уровня 0
+
+        Файл копируется под временным именем и переименовывается, поэтому
+        уплотнение никогда не видит недописанный сегмент.
+
+        :param str file_name: Файл выгрузки (может быть сжат: .gz, .bz2, .xz)
+        :return str: Путь к сегменту
+        """
+        os.makedirs(self.level0, exist_ok=True)
+        path = os.path.join(self.level0, '{0:020d}{1}'.format(time.time_ns(), extension(file_name)))
+        shutil.copyfile(file_name, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        return path
+
+    def segments(self):
+        """ :return list: Пути к сегментам уровня 0 в порядке поступления """
+        if not os.path.isdir(self.level0): return []
+        return [os.path.join(self.level0, n) for n in sorted(os.listdir(self.level0)) if n.endswith(PARTITION_EXTENSIONS)]
+
+    def dedup_key(self, row, indexes):
+        """Ключ записи для удаления дубликатов
+
+        Зарплаты сравниваются как числа, чтобы '60000' и '60000.0' считались одним значением.
+
+        :param list row: Запись
+        :param list indexes: Пары (столбец, номер) ключевых столбцов
+        :return tuple: Ключ
+        """
+        key = []
+        for column, index in indexes:
+            value = row[index]
+            if column.startswith('salary_') and column != 'salary_currency' and value:
+                try:
+                    value = float(value)
+                except ValueError:
+                    pass
+            key.append(value)
+        return tuple(key)
+
+    @staticmethod
+    def get_size(row):
+        """ :return int: Примерный размер записи в памяти в байтах """
+        return sys.getsizeof(row) + sum(map(sys.getsizeof, row))
+
+    def spill_run(self, directory, rows, published):
+        """Сортирует серию по дате публикации и записывает ее во временный файл
+
+        Записи пишутся пачками по run_chunk штук, при слиянии в памяти держится по одной пачке каждой серии.
+
+        :param str directory: Папка временных файлов
+        :param list rows: Записи серии
+        :param int published: Номер столбца даты публикации
+        :return str: Файл серии
+        """
+        rows.sort(key=itemgetter(published))
+        descriptor, path = tempfile.mkstemp(suffix='.pickle', dir=directory)
+        with os.fdopen(descriptor, mode='wb') as file:
+            for i in range(0, len(rows), self.run_chunk):
+                pickle.dump(rows[i:i + self.run_chunk], file, pickle.HIGHEST_PROTOCOL)
+        return path
+
+    @staticmethod
+    def read_run(run):
+        """Читает серию
+
+        :param run: Файл серии или отсортированный список записей
+        :return: Итератор записей
+        """
+        if not isinstance(run, str): return iter(run)
+        return Compactor.iter_run_file(run)
+
+    @staticmethod
+    def iter_run_file(path):
+        """Читает серию из временного файла пачками
+
+        :param str path: Файл серии
+        :return: Генератор записей
+        """
+        with open(path, mode='rb') as file:
+            while True:
+                try:
+                    rows = pickle.load(file)
+                except EOFError:
+                    return
+                yield from rows
+
+    def sort_runs(self, rows, directory, published):
+        """Делит записи на отсортированные серии не больше sort_memory байт
+
+        Все серии, кроме последней, сбрасываются во временные файлы.
+
+        :param rows: Итератор записей
+        :param str directory: Папка временных файлов
+        :param int published: Номер столбца даты публикации
+        :return list: Серии в порядке чтения (файлы, последняя - список в памяти)
+        """
+        runs, run, size = [], [], 0
+        for row in rows:
+            run.append(row)
+            size += self.get_size(row)
+            if size >= self.sort_memory:
+                runs.append(self.spill_run(directory, run, published))
+                run, size = [], 0
+        run.sort(key=itemgetter(published))
+        runs.append(run)
+        return runs
+
+    def read_segments(self, segments, columns, key, directory):
+        """Раскладывает записи сегментов по партициям в отсортированные серии
+
+        Пока записи всех партиций помещаются в sort_memory байт, они копятся в памяти,
+        затем каждая партиция сбрасывает свою серию во временный файл.
+
+        :param list segments: Пути к сегментам уровня 0
+        :param list columns: Столбцы партиций
+        :param PartitionKey key: Ключ разбиения
+        :param str directory: Папка временных файлов
+        :return dict: Партиция -> серии в порядке поступления (файлы, последняя - список в памяти)
+        """
+        published = columns.index('published_at')
+        runs, buffers, size = {}, {}, 0
+        for segment in segments:
+            for _, row in read_rows(segment, columns):
+                partition = row and key.get(row)
+                if not partition:
+                    self.skipped += 1
+                    continue
+                buffers.setdefault('/'.join(partition), []).append(row)
+                size += self.get_size(row)
+                if size < self.sort_memory: continue
+                for name, rows in buffers.items():
+                    runs.setdefault(name, []).append(self.spill_run(directory, rows, published))
+                buffers, size = {}, 0
+        for name, rows in buffers.items():
+            rows.sort(key=itemgetter(published))
+            runs.setdefault(name, []).append(rows)
+        return runs
+
+    def merge_rows(self, path, sorted_partition, runs, columns, directory):
+        """Сливает записи партиции с сериями новых записей
+
+        Отсортированная партиция читается потоком, неотсортированная (после year_splitter)
+        один раз сортируется сериями. Слияние устойчивое: при равной дате сначала идут записи
+        партиции, затем новые в порядке поступления. Дубликаты имеют одинаковую дату публикации,
+        поэтому множество ключей хранится только для текущей даты.
+
+        :param str path: Путь к файлу партиции (None - новая партиция)
+        :param bool sorted_partition: Партиция уже отсортирована по дате публикации
+        :param list runs: Отсортированные серии новых записей
+        :param list columns: Столбцы партиции
+        :param str directory: Папка временных файлов
+        :return: Генератор записей, отсортированных по дате публикации
+        """
+        published = columns.index('published_at')
+        indexes = [(c, columns.index(c)) for c in self.key_columns if c in columns]
+        existing = []
+        if path:
+            existing = [(row for _, row in read_rows(path, columns) if row is not None)]
+            if not sorted_partition: existing = self.sort_runs(existing[0], directory, published)
+        last, seen = None, set()
+        for row in heapq.merge(*map(self.read_run, existing + runs), key=itemgetter(published)):
+            if row[published] != last: last, seen = row[published], set()
+            key = self.dedup_key(row, indexes)
+            if key in seen:
+                self.duplicates += 1
+                continue
+            seen.add(key)
+            yield row
+
+    def remove_obsolete(self, manifest):
+        """Удаляет замененные файлы партиций старше grace секунд
+
+        :param Manifest manifest: Манифест
+        """
+        now = time.time()
+        for file, replaced_at in list(manifest.obsolete.items()):
+            if now - replaced_at < self.grace: continue
+            try:
+                os.remove(os.path.join(self.directory, file))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            del manifest.obsolete[file]
+
+    def compact(self, min_segments=1):
+        """Уплотняет сегменты уровня 0 в партиции
+
+        Повторное уплотнение после сбоя (манифест сохранен, а сегменты не удалены)
+        безопасно: повторные записи отбрасываются как дубликаты.
+
+        :param int min_segments: Уплотнять, только если накопилось столько сегментов
+        :return int: Количество уплотненных сегментов
+        """
+        segments = self.segments()
+        if not segments or len(segments) < min_segments: return 0
+        lock = os.path.join(self.directory, LOCK_NAME)
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            raise RuntimeError('Уплотнение уже выполняется (или прервано, тогда удалите ' + lock + ')')
+        try:
+            self.compact_segments(segments)
+        finally:
+            os.remove(lock)
+        return len(segments)
+
+    def load_manifest(self):
+        """Манифест папки с партициями
+
+        Если manifest.json нет (папка разбита year_splitter без манифеста), манифест строится
+        проходом по файлам партиций, иначе уплотнение скрыло бы их от читателей.
+        Файл считается партицией года, только если все его записи относятся к этому году.
+
+        :return Manifest: Манифест
+        """
+        manifest = Manifest.load(self.directory)
+        if manifest is not None: return manifest
+        manifest = Manifest(self.directory)
+        files, _ = list_partitions(self.directory)
+        for path, _ in files:
+            file = os.path.relpath(path, self.directory).replace(os.sep, '/')
+            partition = file[:-len(extension(file))]
+            levels = partition.split('/')
+            try:
+                stats = scan_partition(path, file, lambda header: lambda row, key=PartitionKey(manifest.key, header):
+                                       key.get(row) == levels)
+            except ValueError:
+                stats = None
+            if stats is None or partition in manifest.partitions:
+                raise RuntimeError('Папка без манифеста, а файл {0} не является партицией по ключу {1} - '
+                                   'уплотнение невозможно, разбейте папку заново'.format(path, manifest.key))
+            manifest.partitions[partition] = stats
+        return manifest
+
+    def compact_segments(self, segments):
+        """Сливает сегменты с партициями и заменяет манифест
+
+        :param list segments: Пути к сегментам уровня 0
+        """
+        manifest = self.load_manifest()
+        manifest.rebuild_blooms()
+        self.remove_obsolete(manifest)
+        self.skipped, self.duplicates = 0, 0
+
+        existing = sorted(manifest.partitions.values(), key=lambda stats: stats.file)
+        source = os.path.join(self.directory, existing[0].file) if existing else segments[0]
+        with open_file(source, mode='r', encoding='utf-8-sig', newline='') as file:
+            columns = next(csv.reader(file))
+        key = PartitionKey(manifest.key, columns)
+        default_extension = extension(existing[0].file) if existing else '.csv'
+
+        directory = tempfile.mkdtemp(prefix='compaction_sort_')
+        try:
+            incoming = self.read_segments(segments, columns, key, directory)
+            manifest.generation += 1
+            for partition, runs in sorted(incoming.items()):
+                old = manifest.partitions.get(partition)
+                stats = PartitionStats(partition + '.g' + str(manifest.generation) +
+                                       (extension(old.file) if old else default_extension))
+                path = os.path.join(self.directory, stats.file)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                merged = self.merge_rows(old and os.path.join(self.directory, old.file), old and old.sorted,
+                                         runs, columns, directory)
+                with open_file(path, mode='w', encoding='utf-8-sig', newline='') as file:
+                    writer = csv.writer(file)
+                    writer.writerow(columns)
+                    for row in merged:
+                        writer.writerow(row)
+                        stats.add(dict(zip(columns, row)))
+                stats.size = os.path.getsize(path)
+                stats.sorted = True
+                stats.build_blooms()
+                if old: manifest.obsolete[old.file] = time.time()
+                manifest.partitions[partition] = stats
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        manifest.save()
+
+        for segment in segments: os.remove(segment)
+
+
+class InputConnect:
+    """Начальная точка программы. Объединяет всю логику программы
+
+    Attributes:
+        dir_name (str): Папка с партициями
+        file_names (list): Файлы выгрузки
+    """
+    def __init__(self, dn=None, fns=None, min_segments=1, grace=3600):
+        """
+        Начало работы программы
+
+        :param str dn: Папка с партициями
+        :param list fns: Файлы выгрузки для добавления (пустой список - только уплотнение)
+        :param int min_segments: Уплотнять, только если накопилось столько сегментов
+        :param float grace: Сколько секунд хранить замененные файлы партиций
+        """
+        self.dir_name = dn
+        if dn is None:
+            self.dir_name = input('Введите название папки с партициями: ')
+        self.file_names = fns
+        if fns is None:
+            names = input('Введите названия файлов выгрузки через запятую (пусто - только уплотнение): ')
+            self.file_names = [n.strip() for n in names.split(',') if n.strip()]
+
+        compactor = Compactor(self.dir_name, grace)
+        for file_name in self.file_names: compactor.ingest(file_name)
+        compacted = compactor.compact(min_segments)
+        print('Уплотнено сегментов: ' + str(compacted))
+        if compacted:
+            print('Удалено дубликатов: ' + str(compactor.duplicates))
+            if compactor.skipped: print('Пропущено записей без ключа разбиения: ' + str(compactor.skipped))
+
+
+if __name__ == '__main__': InputConnect()
@@ -0,0 +1,127 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+
+COMPRESSORS = {'.gz': gzip, '.bz2': bz2, '.xz': lzma}
+THREAD_THRESHOLD = 16 << 20
+
+
+def get_compressor(file_name):
+    """Модуль сжатия по расширению файла
+
+    :param str file_name: Название файла
+    :return: Модуль (gzip, bz2, lzma) или None для несжатого файла
+
+    >>> get_compressor('2007.csv.gz').__name__, get_compressor('2007.csv')
+    ('gzip', None)
+    """
+    return COMPRESSORS.get(os.path.splitext(file_name)[1].lower())
+
+
+class ThreadedReader(io.RawIOBase):
+    """Чтение сжатого потока с распаковкой в отдельном потоке
+
+    Распаковщики zlib/bz2/lzma отпускают GIL, поэтому распаковка следующих блоков
+    идет параллельно с разбором уже прочитанных.
+
+    Attributes:
+        stream: Исходный поток распаковки
+        chunks (Queue): Очередь распакованных блоков
+        buffer (bytes): Остаток текущего блока
+    """
+    def __init__(self, stream, chunk_size=1 << 20, depth=8):
+        """Конструктор читателя
+
+        :param stream: Поток распаковки (gzip.open, bz2.open, lzma.open)
+        :param int chunk_size: Размер блока
+        :param int depth: Сколько блоков распаковывать наперед
+        """
+        super().__init__()
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.chunks = queue.Queue(depth)
+        self.buffer = b''
+        self.stopped = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self.decompress, daemon=True)
+        self.thread.start()
+
+    def decompress(self):
+        """Распаковывает поток в очередь (выполняется в отдельном потоке)"""
+        try:
+            while not self.stopped.is_set():
+                chunk = self.stream.read(self.chunk_size)
+                self.put(chunk)
+                if not chunk: break
+        except Exception as error:
+            self.error = error
+            self.put(b'')
+
+    def put(self, chunk):
+        """Кладет блок в очередь, пока чтение не остановлено
+
+        :param bytes chunk: Блок
+        """
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self):
+        """ :return: Поток доступен для чтения """
+        return True
+
+    def readinto(self, b):
+        """Читает распакованные данные в буфер
+
+        :param b: Буфер
+        :return int: Количество прочитанных байт
+        """
+        if not self.buffer:
+            self.buffer = self.chunks.get()
+            if self.error is not None: raise self.error
+            if not self.buffer:
+                self.chunks.put(b'')
+                return 0
+        size = min(len(b), len(self.buffer))
+        b[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+    def close(self):
+        """Останавливает распаковку и закрывает поток"""
+        if not self.closed:
+            self.stopped.set()
+            self.thread.join()
+            self.stream.close()
+        super().close()
+
+
+def open_file(file_name, mode='r', encoding=None, newline=None, threaded=None):
+    """Открывает файл, прозрачно распаковывая или сжимая .gz, .bz2 и .xz
+
+    :param str file_name: Название файла
+    :param str mode: Режим открытия, как у open()
+    :param str encoding: Кодировка (для текстового режима)
+    :param str newline: Обработка переводов строк (для текстового режима)
+    :param bool threaded: Распаковывать в отдельном потоке (по умолчанию - для файлов от 16 МБ)
+    :return: Файловый объект
+    """
+    compressor = get_compressor(file_name)
+    if compressor is None:
+        return open(file_name, mode, encoding=encoding, newline=newline)
+
+    binary_mode = mode.replace('t', '').replace('b', '') + 'b'
+    if threaded is None: threaded = binary_mode == 'rb' and os.path.getsize(file_name) >= THREAD_THRESHOLD
+    if threaded and binary_mode == 'rb':
+        stream = io.BufferedReader(ThreadedReader(compressor.open(file_name, 'rb')), 1 << 20)
+    else:
+        stream = compressor.open(file_name, binary_mode)
+    if 'b' in mode: return stream
+    return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
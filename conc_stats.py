@@ -1,7 +1,5 @@
 import csv
-import os
 from concurrent.futures import ProcessPoolExecutor
-import multiprocessing
 
 import openpyxl
 import openpyxl.utils
@@ -14,6 +12,9 @@ import jinja2
 import pathlib
 import pdfkit
 
+from compression import open_file
+from manifest import list_partitions, run_partitions
+
 
 class Vacancy:
     """Класс для представления вакансии
@@ -190,11 +191,11 @@ class Statistic:
         """Заполение статистики
 
         :param Vacancy vacancy: Вакансия
-        :param str vacancy_name: Название определенной вакансии
+        :param str vacancy_name: Название определенной вакансии (None - профессии в партиции точно нет)
         """
         self.year_sal_dynamics(vacancy)
         self.year_vac_dynamics(vacancy)
-        self.curr_vac_dynamics(vacancy, vacancy_name)
+        if vacancy_name is not None: self.curr_vac_dynamics(vacancy, vacancy_name)
         self.count_of_vacancies += 1
 
 
@@ -217,7 +218,7 @@ class DataSet:
 
     def csv_reader(self):
         """Читает CSV файл"""
-        with open(self.file_name, mode='r', encoding='utf-8-sig') as file:
+        with open_file(self.file_name, mode='r', encoding='utf-8-sig') as file:
             reader = csv.reader(file)
             header = next(reader)
             header_length = len(header)
@@ -244,6 +245,9 @@ class InputConnect:
     Attributes:
         file_name (str): Название файла
         vacancy_name (list): Название необходимой вакансии
+        without_name (set): Партиции, в которых профессии точно нет (по фильтрам Блума); они все равно
+            читаются целиком ради общей статистики, пропускается только сравнение названий
+            (заметного выигрыша по времени это не дает, см. замер bloom в benchmarks.py)
     """
 
     def __init__(self, fn=None, vn=None):
@@ -257,12 +261,17 @@ class InputConnect:
         if vn is None:
             self.vacancy_name = input('Введите название профессии: ')
 
-        files = [self.file_name + "/" + f for f in os.listdir(self.file_name)]
+        partitions, skipped = list_partitions(self.file_name, need_salary=True)
+        if skipped: print('Пропущено партиций по манифесту: ' + str(skipped))
+        with_name, _ = list_partitions(self.file_name, need_salary=True, contains={'name': self.vacancy_name})
+        self.without_name = set(f for f, _ in partitions) - set(f for f, _ in with_name)
+        if self.without_name:
+            print('Партиций без профессии по фильтрам Блума: {0} из {1}'.format(len(self.without_name),
+                                                                               len(partitions)))
 
         self.container = StatsContainer()
         with ProcessPoolExecutor() as executor:
-            resp = executor.map(self.generate_statistic, files)
-            self.on_end_pool(list(resp))
+            self.on_end_pool(run_partitions(executor.map, self.generate_statistic, partitions))
 
         # report = Report(self.vacancy_name, self.container.get_stat1(), self.container.get_stat2(),
         #                 self.container.get_stat3(), self.container.get_stat4(), {}, {})
@@ -277,7 +286,7 @@ class InputConnect:
         :param filename: Название файла
         :return: Статистика одного года
         """
-        dataset = DataSet(filename, self.vacancy_name)
+        dataset = DataSet(filename, None if filename in self.without_name else self.vacancy_name)
         return dataset.get_statistic()
 
     def on_end_pool(self, response):
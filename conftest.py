@@ -0,0 +1,31 @@
+import csv
+
+import pytest
+
+HEADER = ['name', 'description', 'key_skills', 'experience_id', 'premium', 'employer_name',
+          'salary_from', 'salary_to', 'salary_gross', 'salary_currency', 'area_name', 'published_at']
+
+
+def make_row(name='Аналитик', skills='Python\nSQL', area='Москва', published='2022-01-02T10:00:00+0300',
+             salary_from='100', salary_to='200', currency='RUR', employer='Яндекс', description='<p>Описание</p>',
+             experience='noExperience', premium='False'):
+    """Запись вакансии в порядке HEADER"""
+    return [name, description, skills, experience, premium, employer, salary_from, salary_to, 'True',
+            currency, area, published]
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """Пишет CSV файл вакансий (переводы строк внутри полей - как в выгрузке hh.ru, \\r\\n)
+
+    :return: Функция (название, записи, заголовок) -> путь
+    """
+    def write(name, rows, header=HEADER, newline='\r\n'):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, mode='w', encoding='utf-8-sig', newline='') as file:
+            writer = csv.writer(file, lineterminator=newline)
+            if header is not None: writer.writerow(header)
+            for row in rows: writer.writerow([value.replace('\n', newline) for value in row])
+        return str(path)
+    return write
@@ -1,6 +1,5 @@
 import csv
 import multiprocessing
-import os
 from datetime import datetime
 import pytz
 
@@ -9,6 +8,9 @@ import pandas as pd
 import requests
 from xml.etree import ElementTree
 
+from compression import open_file
+from manifest import list_partitions, run_partitions
+
 
 class Vacancy:
     """Класс для представления вакансии
@@ -128,7 +130,7 @@ class DataSet:
 
     def csv_reader(self):
         """Читает CSV файл"""
-        with open(self.file_name, mode='r', encoding='utf-8-sig') as file:
+        with open_file(self.file_name, mode='r', encoding='utf-8-sig') as file:
             reader = csv.reader(file)
             header = next(reader)
             header_length = len(header)
@@ -163,13 +165,12 @@ class InputConnect:
         if fn is None:
             self.file_name = input('Введите название файла: ')
 
-        files = [self.file_name + "/" + f for f in os.listdir(self.file_name)]
+        partitions, skipped = list_partitions(self.file_name, need_currency=True)
+        if skipped: print('Пропущено партиций по манифесту: ' + str(skipped))
 
         self.container = StatsContainer()
-        pool = multiprocessing.Pool(multiprocessing.cpu_count())
-        pool.map_async(self.generate_statistic, files, callback=self.on_end_pool)
-        pool.close()
-        pool.join()
+        with multiprocessing.Pool(multiprocessing.cpu_count()) as pool:
+            self.on_end_pool(run_partitions(pool.imap, self.generate_statistic, partitions))
 
     def generate_statistic(self, filename):
         """Таск для многопотока
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+
+from bloom import ScalableBloomFilter
+
+
+class Deduplicator:
+    """Удаление дубликатов вакансий в пределах фиксированного объема памяти
+
+    Ключ записи (значения выбранных столбцов) хэшируется в 16 байт. Хэш сначала проверяется
+    по масштабируемому фильтру Блума: если его там нет, запись точно новая. Иначе хэш
+    проверяется по точному множеству на диске (таблица SQLite). Память делится между
+    фильтром Блума (половина), кэшем страниц SQLite и буфером еще не записанных хэшей.
+
+    Attributes:
+        columns (list): Столбцы ключа
+        path (str): Файл множества хэшей
+        temporary (bool): Файл удаляется при закрытии
+        memory (int): Бюджет памяти в байтах
+        bloom (ScalableBloomFilter): Фильтр Блума
+        pending (set): Хэши, еще не записанные на диск
+        batch_size (int): Размер пачки записи на диск
+        rows (int): Проверено записей
+        duplicates (int): Найдено дубликатов
+        disk_checks (int): Проверок по диску (срабатываний фильтра Блума)
+    """
+    default_columns = ['name', 'employer_name', 'published_at']
+
+    def __init__(self, columns=None, memory=64 << 20, path=None):
+        """Конструктор дедупликатора
+
+        :param list columns: Столбцы ключа (по умолчанию - название, работодатель и дата публикации)
+        :param int memory: Бюджет памяти в байтах
+        :param str path: Файл множества хэшей (None - временный файл); существующее множество дополняется
+
+        >>> dedup = Deduplicator(['name', 'published_at'], memory=1 << 20)
+        >>> [dedup.is_duplicate({'name': n, 'published_at': '2022'}) for n in ('A', 'B', 'A', 'B', 'C')]
+        [False, False, True, True, False]
+        >>> dedup.report()
+        'Дубликатов: 2 из 5 (40.00%)'
+        >>> dedup.close()
+        """
+        self.columns = columns or self.default_columns
+        self.temporary = path is None
+        if path is None:
+            descriptor, path = tempfile.mkstemp(suffix='.sqlite')
+            os.close(descriptor)
+        self.path = path
+        self.memory = memory
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode = OFF')
+        self.connection.execute('PRAGMA synchronous = OFF')
+        self.connection.execute('PRAGMA cache_size = -' + str(max(memory // 4 // 1024, 64)))
+        self.connection.execute('CREATE TABLE IF NOT EXISTS seen (hash BLOB PRIMARY KEY) WITHOUT ROWID')
+        self.bloom = ScalableBloomFilter(memory // 2)
+        self.pending = set()
+        self.batch_size = max(memory // 4 // 128, 1000)
+        self.rows = 0
+        self.duplicates = 0
+        self.disk_checks = 0
+        for (digest,) in self.connection.execute('SELECT hash FROM seen'): self.bloom.add(digest)
+
+    def get_columns(self, header):
+        """Столбцы ключа, которые есть в файле
+
+        :param list header: Столбцы файла
+        :return list: Столбцы ключа
+        """
+        columns = [c for c in self.columns if c in header]
+        if not columns: raise ValueError('В файле нет столбцов ключа дедупликации: ' + ', '.join(self.columns))
+        return columns
+
+    def get_hash(self, vacancy):
+        """Хэш ключа записи
+
+        :param dict vacancy: Поля записи
+        :return bytes: 16 байт хэша
+        """
+        key = '\x1f'.join(vacancy.get(c, '') for c in self.columns)
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+    def is_duplicate(self, vacancy):
+        """Проверяет, встречалась ли запись, и запоминает ее
+
+        :param dict vacancy: Поля записи
+        :return bool: Запись - дубликат
+        """
+        digest = self.get_hash(vacancy)
+        self.rows += 1
+        if digest in self.bloom:
+            if digest in self.pending: found = True
+            else:
+                self.disk_checks += 1
+                found = self.connection.execute('SELECT 1 FROM seen WHERE hash = ?', (digest,)).fetchone() is not None
+            if found:
+                self.duplicates += 1
+                return True
+        self.bloom.add(digest)
+        self.pending.add(digest)
+        if len(self.pending) >= self.batch_size: self.flush()
+        return False
+
+    def flush(self):
+        """Записывает накопленные хэши на диск"""
+        with self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO seen VALUES (?)', ((d,) for d in self.pending))
+        self.pending.clear()
+
+    def count(self):
+        """ :return int: Количество уникальных ключей """
+        self.flush()
+        return self.connection.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    def clear(self):
+        """Очищает множество (для полного пересчета)"""
+        self.pending.clear()
+        with self.connection:
+            self.connection.execute('DELETE FROM seen')
+        self.bloom = ScalableBloomFilter(self.memory // 2)
+
+    def report(self):
+        """ :return str: Доля дубликатов """
+        rate = self.duplicates / self.rows if self.rows else 0
+        return 'Дубликатов: {0} из {1} ({2:.2%})'.format(self.duplicates, self.rows, rate)
+
+    def close(self):
+        """Записывает хэши и закрывает множество (временный файл удаляется)"""
+        self.flush()
+        self.connection.close()
+        if self.temporary: os.remove(self.path)
@@ -1,9 +1,12 @@
 import csv
 import multiprocessing
-import os
 from datetime import datetime
 import pandas as pd
 
+from compression import open_file
+from dedup import Deduplicator
+from manifest import list_partitions, run_partitions
+
 
 class Vacancy:
     """Класс для представления вакансии
@@ -46,19 +49,28 @@ class DataSet:
     """Дата-сет для работы с таблицей
     Attributes:
         file_name (str): Название файла
+        dedup (list): Столбцы ключа для удаления дубликатов или None
+        rows (int): Прочитано записей с зарплатой
+        duplicates (int): Пропущено дубликатов
     """
-    def __init__(self, file_name, sc):
+    columns = ['name', 'salary', 'area_name', 'date']
+
+    def __init__(self, file_name, sc, dedup=None):
         """Конструктор класса DataSet
 
         :param str file_name: Название файла
         :param SalaryConverter sc: Конвентер валюты
+        :param list dedup: Столбцы ключа для удаления дубликатов или None
         """
         self.file_name = file_name
         self.sc = sc
+        self.dedup = dedup
+        self.rows = 0
+        self.duplicates = 0
 
     def csv_reader(self):
         """Читает CSV файл"""
-        with open(self.file_name, mode='r', encoding='utf-8-sig') as file:
+        with open_file(self.file_name, mode='r', encoding='utf-8-sig') as file:
             reader = csv.reader(file)
             header = next(reader)
             header_length = len(header)
@@ -73,12 +85,19 @@ class DataSet:
 
         :return Statistics: Статистика
         """
-        result = pd.DataFrame(columns=['name', 'salary', 'area_name', 'date'])
-
-        for vacancy in self.csv_reader():
-            v = Vacancy(vacancy, self.sc)
-            if v.salary != 0:
-                result.loc[len(result)] = list(v.to_dict().values())
+        result = pd.DataFrame(columns=self.columns)
+        deduplicator = Deduplicator(self.dedup) if self.dedup else None
+
+        try:
+            for vacancy in self.csv_reader():
+                if deduplicator and deduplicator.is_duplicate(vacancy): continue
+                v = Vacancy(vacancy, self.sc)
+                if v.salary != 0:
+                    result.loc[len(result)] = list(v.to_dict().values())
+        finally:
+            if deduplicator:
+                self.rows, self.duplicates = deduplicator.rows, deduplicator.duplicates
+                deduplicator.close()
 
         return result
 
@@ -92,7 +111,7 @@ class SalaryConverter:
 
     def csv_reader(self):
         """Читает CSV файл"""
-        with open(self.file_name, mode='r', encoding='utf-8-sig') as file:
+        with open_file(self.file_name, mode='r', encoding='utf-8-sig') as file:
             reader = csv.reader(file)
             header = next(reader)
             header.pop(0)
@@ -120,21 +139,33 @@ class InputConnect:
 
     Attributes:
         file_name (str): Название файла
+        dedup (list): Столбцы ключа для удаления дубликатов или None
     """
-    def __init__(self, fn=None):
+    def __init__(self, fn=None, output='updated_vacancies.csv', dedup=None):
         """
         Начало работы программы
+
+        Дубликаты удаляются внутри каждой партиции: при разбиении по датам и ключе,
+        содержащем published_at, одинаковые записи всегда попадают в одну партицию.
+
+        :param str fn: Название папки с партициями
+        :param str output: Выходной файл (.csv, или сжатый .csv.gz, .csv.bz2, .csv.xz)
+        :param list dedup: Столбцы ключа для удаления дубликатов (например name, employer_name, published_at)
         """
         self.file_name = fn
         if fn is None:
             self.file_name = input('Введите название файла: ')
+        self.output = output
+        self.dedup = dedup
 
         self.sc = SalaryConverter('date_dinamics.csv')
-        files = [self.file_name + "/" + f for f in os.listdir(self.file_name)]
-        pool = multiprocessing.Pool(multiprocessing.cpu_count())
-        pool.map_async(self.generate_statistic, files, callback=self.on_end_pool)
-        pool.close()
-        pool.join()
+        dates = sorted(self.sc.info.keys())
+        partitions, skipped = list_partitions(self.file_name, need_salary=True,
+                                              date_from=dates[0] if dates else None,
+                                              date_to=dates[-1] if dates else None)
+        if skipped: print('Пропущено партиций по манифесту: ' + str(skipped))
+        with multiprocessing.Pool(multiprocessing.cpu_count()) as pool:
+            self.on_end_pool(run_partitions(pool.imap, self.generate_statistic, partitions))
 
     def generate_statistic(self, filename):
         """Таск для многопотока
@@ -142,19 +173,25 @@ class InputConnect:
         :param filename: Название файла
         :return: Статистика одного года
         """
-        dataset = DataSet(filename, self.sc)
+        dataset = DataSet(filename, self.sc, self.dedup)
         info = dataset.get_info()
-        return info
+        return info, dataset.rows, dataset.duplicates
 
     def on_end_pool(self, response):
         """Коллбэк по окончанию работы
 
+        Если манифест отсек все партиции, пишется файл только с заголовком.
+
         :param response: ответ
         :return:
         """
         print('Собираем')
-        d = pd.concat(response)
-        d.to_csv('updated_vacancies.csv',index=False)
+        if not response: print('Нет партиций, подходящих под запрос')
+        if self.dedup:
+            rows, duplicates = sum(r[1] for r in response), sum(r[2] for r in response)
+            print('Дубликатов: {0} из {1} ({2:.2%})'.format(duplicates, rows, duplicates / rows if rows else 0))
+        d = pd.concat([r[0] for r in response]) if response else pd.DataFrame(columns=DataSet.columns)
+        d.to_csv(self.output, index=False, compression='infer')
 
 
 if __name__ == '__main__': InputConnect("chunks2")
@@ -41,12 +41,12 @@ def on_end_parse(response):
                 temp[2] = r['salary']['to']
                 temp[3] = r['salary']['currency']
             df.loc[len(df)] = temp
-    df.to_csv(SAVE_NAME, index=False)
+    df.to_csv(SAVE_NAME, index=False, compression='infer')
 
 
 if __name__ == "__main__":
     date_to = datetime.datetime.strptime(input("Дата от (ГОД-МЕСЯЦ-ДЕНЬ): "), "%Y-%m-%d")
-    SAVE_NAME = input("Название выходного файла: ")
+    SAVE_NAME = input("Название выходного файла (.csv, .csv.gz, .csv.bz2, .csv.xz): ")
     date_from = date_to - datetime.timedelta(days=1)
     time = pd.date_range(date_from, date_to, freq="H")
 
@@ -1,11 +1,15 @@
 import vacancies
+import vacancy_store
 import statistics
 import year_splitter
 
 
 def start():
-    prog = input("Что делаем (Вакансии/Статистика/Разбить по годам): ")
+    prog = input("Что делаем (Вакансии/Сессия вакансий/Выгрузка вакансий/Загрузка в базу/Статистика/Разбить по годам): ")
     if prog == "Вакансии": vacancies.InputConnect()
+    elif prog == "Сессия вакансий": vacancies.InputSession()
+    elif prog == "Выгрузка вакансий": vacancies.InputExport()
+    elif prog == "Загрузка в базу": vacancy_store.InputConnect()
     elif prog == "Статистика": statistics.InputConnect()
     elif prog == "Разбить по годам": year_splitter.InputConnect()
     else: print("Неизвестная программа")
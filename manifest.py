@@ -0,0 +1,407 @@
+import csv
+import json
+import os
+import re
+
+from bloom import BloomFilter
+from compression import open_file
+
+MANIFEST_NAME = 'manifest.json'
+BLOOM_VERSION = 2
+PARTITION_EXTENSIONS = ('.csv', '.csv.gz', '.csv.bz2', '.csv.xz')
+
+
+def trigrams(text):
+    """Триграммы строки в нижнем регистре
+
+    :param str text: Строка
+    :return set: Триграммы
+
+    >>> sorted(trigrams('Java'))
+    ['ava', 'jav']
+    """
+    text = text.lower()
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def bloom_tokens(column, value):
+    """Токены значения для фильтра Блума
+
+    Название раскладывается на триграммы (исходного и очищенного от HTML текста),
+    чтобы по фильтру можно было проверять и точное совпадение, и вхождение подстроки.
+    Переводы строк приводятся к '\\n', как при чтении файла в текстовом режиме
+    (сырые поля из raw_csv их не нормализуют).
+
+    :param str column: Столбец
+    :param str value: Значение
+    :return set: Токены
+
+    >>> sorted(bloom_tokens('key_skills', 'SQL\\r\\nPython\\rGit'))
+    ['Git', 'Python', 'SQL']
+    """
+    value = value.replace('\r\n', '\n').replace('\r', '\n')
+    if column == 'name':
+        return trigrams(value) | trigrams(' '.join(re.sub('<.*?>', '', value).split()))
+    if column == 'key_skills': return set(value.split('\n'))
+    return {value}
+
+
+class PartitionStats:
+    """Статистика одной партиции (zone map)
+
+    Attributes:
+        file (str): Путь к файлу партиции относительно папки
+        rows (int): Количество записей
+        size (int): Размер файла в байтах
+        published_min (str): Самая ранняя дата публикации
+        published_max (str): Самая поздняя дата публикации
+        salary_min (float): Минимальная зарплата (по salary_from и salary_to)
+        salary_max (float): Максимальная зарплата (по salary_from и salary_to)
+        currencies (set): Встречающиеся валюты
+        tokens (dict): Токены для фильтров Блума по столбцам (до построения фильтров)
+        blooms (dict): Фильтры Блума по столбцам
+        sorted (bool): Записи партиции отсортированы по дате публикации
+    """
+    columns = ['published_at', 'salary_from', 'salary_to', 'salary_currency']
+    bloom_columns = ['name', 'area_name', 'key_skills']
+
+    def __init__(self, file=''):
+        """Конструктор статистики партиции
+
+        :param str file: Путь к файлу партиции
+        """
+        self.file = file
+        self.rows = 0
+        self.size = 0
+        self.published_min = None
+        self.published_max = None
+        self.salary_min = None
+        self.salary_max = None
+        self.currencies = set()
+        self.tokens = {}
+        self.blooms = {}
+        self.sorted = False
+
+    def add(self, vacancy):
+        """Учитывает запись в статистике
+
+        :param dict vacancy: Поля записи (столбцы из PartitionStats.columns,
+            для фильтров Блума - также из PartitionStats.bloom_columns)
+
+        >>> stats = PartitionStats()
+        >>> stats.add({'published_at': '2007-12-03T17:34:36+0300', 'salary_from': '10', 'salary_to': '',
+        ...            'salary_currency': 'USD'})
+        >>> stats.rows, stats.salary_min, stats.salary_max, stats.currencies
+        (1, 10.0, 10.0, {'USD'})
+        """
+        self.rows += 1
+        published = vacancy.get('published_at')
+        if published:
+            if self.published_min is None or published < self.published_min: self.published_min = published
+            if self.published_max is None or published > self.published_max: self.published_max = published
+        for column in ('salary_from', 'salary_to'):
+            try:
+                salary = float(vacancy.get(column) or 'nan')
+            except ValueError:
+                continue
+            if salary != salary: continue
+            if self.salary_min is None or salary < self.salary_min: self.salary_min = salary
+            if self.salary_max is None or salary > self.salary_max: self.salary_max = salary
+        if vacancy.get('salary_currency'): self.currencies.add(vacancy['salary_currency'])
+        for column in self.bloom_columns:
+            if column in vacancy: self.tokens.setdefault(column, set()).update(bloom_tokens(column, vacancy[column]))
+
+    def merge(self, other):
+        """Объединяет статистику с другой частью той же партиции
+
+        :param PartitionStats other: Статистика другой части
+        """
+        self.rows += other.rows
+        for attr, func in (('published_min', min), ('published_max', max), ('salary_min', min), ('salary_max', max)):
+            values = [v for v in (getattr(self, attr), getattr(other, attr)) if v is not None]
+            setattr(self, attr, func(values) if values else None)
+        self.currencies |= other.currencies
+        for column, tokens in other.tokens.items():
+            self.tokens.setdefault(column, set()).update(tokens)
+
+    def build_blooms(self, error_rate=0.01):
+        """Строит фильтры Блума по собранным токенам
+
+        :param float error_rate: Допустимая доля ложноположительных ответов
+        """
+        for column, tokens in self.tokens.items():
+            self.blooms[column] = BloomFilter.from_items(tokens, error_rate)
+        self.tokens = {}
+
+    def may_contain(self, column, value):
+        """Проверяет по фильтру Блума, может ли в партиции встречаться значение
+
+        :param str column: Столбец (name - вхождение подстроки, key_skills - список навыков)
+        :param value: Значение
+        :return bool: False, если значения в партиции точно нет
+
+        >>> stats = PartitionStats()
+        >>> stats.add({'name': 'Аналитик данных', 'area_name': 'Москва', 'key_skills': 'SQL\\nPython'})
+        >>> stats.build_blooms()
+        >>> stats.may_contain('name', 'аналитик'), stats.may_contain('name', 'Тестировщик')
+        (True, False)
+        >>> stats.may_contain('key_skills', ['SQL', 'Python']), stats.may_contain('area_name', 'Казань')
+        (True, False)
+        """
+        bloom = self.blooms.get(column)
+        if bloom is None: return True
+        if column == 'name': tokens = trigrams(value)
+        elif column == 'key_skills': tokens = value
+        else: tokens = [value]
+        return all(token in bloom for token in tokens)
+
+    def to_dict(self):
+        """ :return: Представление статистики для манифеста """
+        return {
+            'file': self.file,
+            'rows': self.rows,
+            'size': self.size,
+            'published_min': self.published_min,
+            'published_max': self.published_max,
+            'salary_min': self.salary_min,
+            'salary_max': self.salary_max,
+            'currencies': sorted(self.currencies),
+            'blooms': {column: bloom.to_dict() for column, bloom in self.blooms.items()},
+            'sorted': self.sorted,
+        }
+
+    @staticmethod
+    def from_dict(data):
+        """Восстанавливает статистику из манифеста
+
+        :param dict data: Запись манифеста
+        :return PartitionStats: Статистика партиции
+        """
+        stats = PartitionStats(data['file'])
+        for key, value in data.items():
+            if key == 'currencies': value = set(value)
+            elif key == 'blooms': value = {column: BloomFilter.from_dict(b) for column, b in value.items()}
+            setattr(stats, key, value)
+        return stats
+
+    def may_match(self, date_from=None, date_to=None, need_salary=False, need_currency=False, contains=None):
+        """Проверяет, могут ли в партиции быть записи, подходящие под запрос
+
+        :param str date_from: Начало диапазона дат (префикс ISO даты, включительно)
+        :param str date_to: Конец диапазона дат (префикс ISO даты, включительно)
+        :param bool need_salary: Нужны записи с зарплатой
+        :param bool need_currency: Нужны записи с валютой
+        :param dict contains: Значения, которые должны встречаться в партиции (проверка по фильтрам Блума)
+        :return bool: False, если партицию можно пропустить
+
+        >>> stats = PartitionStats.from_dict({'file': '2007.csv', 'rows': 5,
+        ...                                   'published_min': '2007-01-10T10:00:00+0300',
+        ...                                   'published_max': '2007-12-03T17:34:36+0300'})
+        >>> stats.may_match('2007-12', '2008-05'), stats.may_match('2008', None), stats.may_match(need_salary=True)
+        (True, False, False)
+        """
+        if self.rows == 0: return False
+        if need_salary and self.salary_min is None: return False
+        if need_currency and not self.currencies: return False
+        if date_from is not None and self.published_max is not None and \
+                self.published_max[:len(date_from)] < date_from: return False
+        if date_to is not None and self.published_min is not None and \
+                self.published_min[:len(date_to)] > date_to: return False
+        for column, value in (contains or {}).items():
+            if not self.may_contain(column, value): return False
+        return True
+
+
+def scan_partition(path, file, check=None):
+    """Статистика партиции полным проходом по ее файлу
+
+    Файл читается в текстовом режиме, как его читают программы, записи с неверным
+    числом полей пропускаются.
+
+    :param str path: Путь к файлу
+    :param str file: Путь к файлу относительно папки с партициями
+    :param check: Функция заголовок -> проверка записи (запись -> bool; False - запись не относится к партиции)
+    :return PartitionStats: Статистика или None, если проверка отвергла какую-то запись
+    """
+    stats = PartitionStats(file)
+    stats.sorted, last = True, ''
+    with open_file(path, mode='r', encoding='utf-8-sig') as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        belongs = check(header) if check is not None else None
+        for row in reader:
+            if len(row) != len(header): continue
+            if belongs is not None and not belongs(row): return None
+            vacancy = dict(zip(header, row))
+            stats.add(vacancy)
+            published = vacancy.get('published_at', '')
+            if published < last: stats.sorted = False
+            last = published
+    stats.size = os.path.getsize(path)
+    stats.build_blooms()
+    return stats
+
+
+class Manifest:
+    """Манифест папки с партициями
+
+    Фильтры Блума, построенные прежней версией токенизации (BLOOM_VERSION), при чтении
+    отбрасываются - такие партиции не отсекаются по фильтрам, пока их не перестроит
+    rebuild_blooms (его вызывает уплотнение) или новое разбиение.
+
+    Attributes:
+        directory (str): Папка с партициями
+        key (str): Ключ разбиения
+        partitions (dict): Статистика партиций по названиям
+        generation (int): Номер поколения файлов (увеличивается при каждом уплотнении)
+        obsolete (dict): Замененные файлы, ожидающие удаления, и время замены
+        stale_blooms (set): Партиции, фильтры Блума которых отброшены как устаревшие
+    """
+    def __init__(self, directory, key='year'):
+        """Конструктор манифеста
+
+        :param str directory: Папка с партициями
+        :param str key: Ключ разбиения
+        """
+        self.directory = directory
+        self.key = key
+        self.partitions = {}
+        self.generation = 0
+        self.obsolete = {}
+        self.stale_blooms = set()
+
+    @staticmethod
+    def load(directory):
+        """Читает манифест из папки
+
+        :param str directory: Папка с партициями
+        :return Manifest: Манифест или None, если его нет
+        """
+        path = os.path.join(directory, MANIFEST_NAME)
+        if not os.path.isfile(path): return None
+        with open(path, mode='r', encoding='utf-8') as file:
+            data = json.load(file)
+        manifest = Manifest(directory, data.get('key', 'year'))
+        manifest.generation = data.get('generation', 0)
+        manifest.obsolete = data.get('obsolete', {})
+        for name, partition in data['partitions'].items():
+            manifest.partitions[name] = PartitionStats.from_dict(partition)
+        if data.get('bloom_version', 1) != BLOOM_VERSION:
+            for name, stats in manifest.partitions.items():
+                if stats.blooms:
+                    stats.blooms = {}
+                    manifest.stale_blooms.add(name)
+        return manifest
+
+    def rebuild_blooms(self):
+        """Перестраивает отброшенные фильтры Блума проходом по файлам партиций"""
+        for name in self.stale_blooms:
+            stats = self.partitions.get(name)
+            if stats is not None:
+                stats.blooms = scan_partition(os.path.join(self.directory, stats.file), stats.file).blooms
+        self.stale_blooms = set()
+
+    def save(self):
+        """Атомарно записывает манифест (через временный файл)"""
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        data = {
+            'key': self.key,
+            'bloom_version': BLOOM_VERSION,
+            'generation': self.generation,
+            'obsolete': self.obsolete,
+            'partitions': {name: stats.to_dict() for name, stats in sorted(self.partitions.items())},
+        }
+        with open(path + '.tmp', mode='w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=1)
+        os.replace(path + '.tmp', path)
+
+    def select(self, **query):
+        """Отбирает партиции, которые могут подходить под запрос
+
+        :param query: Параметры PartitionStats.may_match
+        :return list: Подходящие партиции
+        """
+        return [stats for _, stats in sorted(self.partitions.items()) if stats.may_match(**query)]
+
+
+def list_partitions(directory, **query):
+    """Список файлов партиций в папке с отсечением по манифесту
+
+    Если манифеста нет, возвращаются все CSV файлы папки (в том числе сжатые), количество строк неизвестно.
+    Служебные папки (начинающиеся с '_', например сегменты уровня 0) не просматриваются.
+
+    :param str directory: Папка с партициями
+    :param query: Параметры PartitionStats.may_match
+    :return tuple: Список пар (путь к файлу, количество строк или None) и количество пропущенных партиций
+    """
+    manifest = Manifest.load(directory)
+    if manifest is None:
+        files = []
+        for root, dirs, names in os.walk(directory):
+            dirs[:] = [d for d in dirs if not d.startswith('_')]
+            files += [os.path.join(root, n) for n in names if n.endswith(PARTITION_EXTENSIONS)]
+        return [(f, None) for f in sorted(files)], 0
+    selected = manifest.select(**query)
+    return [(os.path.join(directory, s.file), s.rows) for s in selected], len(manifest.partitions) - len(selected)
+
+
+def schedule(partitions):
+    """Порядок запуска задач: сначала самые большие партиции
+
+    :param list partitions: Пары (путь к файлу, количество строк)
+    :return list: Номера партиций в порядке запуска
+
+    >>> schedule([('a', 10), ('b', 30), ('c', None)])
+    [1, 0, 2]
+    """
+    return sorted(range(len(partitions)), key=lambda i: -(partitions[i][1] or 0))
+
+
+class Progress:
+    """Вывод прогресса обработки партиций
+
+    Attributes:
+        total (int): Всего строк (None, если неизвестно)
+        done (int): Обработано строк
+        files (int): Обработано файлов
+        files_total (int): Всего файлов
+    """
+    def __init__(self, partitions):
+        """Конструктор прогресса
+
+        :param list partitions: Пары (путь к файлу, количество строк)
+        """
+        counts = [rows for _, rows in partitions]
+        self.total = None if None in counts else sum(counts)
+        self.done = 0
+        self.files = 0
+        self.files_total = len(partitions)
+
+    def update(self, rows):
+        """Отмечает обработанную партицию
+
+        :param int rows: Количество строк в партиции
+        """
+        self.files += 1
+        self.done += rows or 0
+        if self.total:
+            print('Обработано {0} из {1} строк ({2:.0%})'.format(self.done, self.total, self.done / self.total))
+        else:
+            print('Обработано {0} из {1} файлов'.format(self.files, self.files_total))
+
+
+def run_partitions(mapper, func, partitions):
+    """Обрабатывает партиции: большие запускаются первыми, прогресс выводится по мере готовности
+
+    :param mapper: Функция отображения пула (Pool.imap, Executor.map), сохраняющая порядок задач
+    :param func: Обработчик одного файла
+    :param list partitions: Пары (путь к файлу, количество строк)
+    :return list: Результаты в исходном порядке партиций
+    """
+    order = schedule(partitions)
+    progress = Progress(partitions)
+    results = [None] * len(partitions)
+    for i, result in zip(order, mapper(func, [partitions[i][0] for i in order])):
+        results[i] = result
+        progress.update(partitions[i][1])
+    return results
@@ -1,7 +1,8 @@
 import pandas as pd
-import os
 import multiprocessing
 
+from manifest import list_partitions
+
 
 class Vacancy:
     """Класс для представления вакансии
@@ -208,7 +209,7 @@ class InputConnect:
         if vn is None:
             self.vacancy_name = input('Введите название профессии: ')
 
-        files = [self.file_name + "/" + f for f in os.listdir(self.file_name)]
+        files = [f for f, _ in list_partitions(self.file_name)[0]]
 
         self.container = StatsContainer()
         pool = multiprocessing.Pool(multiprocessing.cpu_count())
@@ -0,0 +1,211 @@
+import csv
+import io
+import zlib
+
+BOM = b'\xef\xbb\xbf'
+
+
+def iter_records(file):
+    """Читает записи CSV файла в сыром (байтовом) виде
+
+    Строки, оказавшиеся внутри кавычек (многострочные поля), склеиваются в одну запись,
+    поэтому каждая запись возвращается байт в байт так, как она лежит в файле.
+
+    :param file: Файл, открытый в бинарном режиме
+    :return: Генератор записей (bytes)
+
+    >>> list(iter_records(io.BytesIO(b'a,b\\n"x\\ny",2\\n')))
+    [b'a,b\\n', b'"x\\ny",2\\n']
+    """
+    parts = []
+    quotes = 0
+    for line in file:
+        quotes += line.count(b'"')
+        if quotes % 2:
+            parts.append(line)
+            continue
+        if parts:
+            parts.append(line)
+            line = b''.join(parts)
+            parts = []
+        quotes = 0
+        yield line
+    if parts: yield b''.join(parts)
+
+
+def parse_record(record):
+    """Полный разбор сырой записи на поля
+
+    :param bytes record: Сырая запись
+    :return list: Поля записи (str)
+
+    >>> parse_record(b'"a,b",c\\r\\n')
+    ['a,b', 'c']
+    """
+    return next(csv.reader(io.StringIO(record.decode('utf-8'))), [])
+
+
+def parse_header(line):
+    """Разбор строки заголовка (с учетом BOM)
+
+    :param bytes line: Сырая строка заголовка
+    :return list: Названия столбцов
+
+    >>> parse_header(BOM + b'name,published_at\\r\\n')
+    ['name', 'published_at']
+    """
+    if line.startswith(BOM): line = line[len(BOM):]
+    return parse_record(line)
+
+
+def get_field(record, index, length):
+    """Достает одно поле из сырой записи без полного разбора
+
+    Поле ищется в части записи до первой или после последней кавычки,
+    полный разбор выполняется только если поле попало внутрь кавычек.
+
+    :param bytes record: Сырая запись
+    :param int index: Номер поля
+    :param int length: Количество полей в заголовке
+    :return bytes: Значение поля
+
+    >>> get_field(b'a,"<p>1,\\n2</p>",2007-12-03T17:34:36+0300\\r\\n', 2, 3)
+    b'2007-12-03T17:34:36+0300'
+    >>> get_field(b'a,"b,c",d\\n', 1, 3)
+    b'b,c'
+    """
+    record = record.rstrip(b'\r\n')
+    if b'"' not in record:
+        return record.split(b',')[index]
+    parts = record[:record.find(b'"')].split(b',')
+    if index < len(parts) - 1: return parts[index]
+    parts = record[record.rfind(b'"') + 1:].split(b',')
+    if length - index < len(parts): return parts[index - length]
+    return parse_record(record)[index].encode('utf-8')
+
+
+def get_fields(record, indexes, length):
+    """Достает несколько полей из сырой записи
+
+    Если хотя бы одно поле попадает внутрь кавычек, запись разбирается целиком один раз.
+
+    :param bytes record: Сырая запись
+    :param list indexes: Номера полей
+    :param int length: Количество полей в заголовке
+    :return dict: Значения полей (str) по номерам
+
+    >>> get_fields(b'"a\\nb",x,2007\\n', [0, 2], 3)
+    {0: 'a\\nb', 2: '2007'}
+    """
+    record = record.rstrip(b'\r\n')
+    if b'"' not in record:
+        fields = record.split(b',')
+        return {i: fields[i].decode('utf-8') for i in indexes}
+    head = record[:record.find(b'"')].split(b',')
+    tail = record[record.rfind(b'"') + 1:].split(b',')
+    if all(i < len(head) - 1 or length - i < len(tail) for i in indexes):
+        return {i: (head[i] if i < len(head) - 1 else tail[i - length]).decode('utf-8') for i in indexes}
+    fields = parse_record(record)
+    if len(fields) != length: raise IndexError('Неверное количество полей')
+    return {i: fields[i] for i in indexes}
+
+
+class LineCounter:
+    """Итератор строк бинарного файла для csv.reader, считающий прочитанные байты
+
+    csv.reader берет строки по одной и не читает вперед, поэтому после каждой записи
+    offset указывает на ее конец, а quotes позволяет заметить незакрытую кавычку.
+
+    Attributes:
+        file: Файл, открытый в бинарном режиме
+        offset (int): Смещение конца последней отданной строки
+        checksum (int): CRC32 всех отданных байт (продолжает переданное значение)
+        quotes (int): Количество кавычек с момента последнего сброса
+        line (bytes): Последняя отданная строка
+
+    >>> counter = LineCounter(io.BytesIO(b'"a\\nb",c\\nd,e'))
+    >>> reader = csv.reader(counter)
+    >>> next(reader), counter.offset, counter.quotes % 2
+    (['a\\nb', 'c'], 8, 0)
+    >>> next(reader), counter.offset, counter.line.endswith(b'\\n')
+    (['d', 'e'], 11, False)
+    """
+    def __init__(self, file, offset=0, checksum=0):
+        """Конструктор счетчика
+
+        :param file: Файл, открытый в бинарном режиме (на позиции offset)
+        :param int offset: Начальное смещение
+        :param int checksum: Начальное значение CRC32
+        """
+        self.file = file
+        self.offset = offset
+        self.checksum = checksum
+        self.quotes = 0
+        self.line = b''
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.file)
+        self.line = line
+        self.offset += len(line)
+        self.checksum = zlib.crc32(line, self.checksum)
+        self.quotes += line.count(b'"')
+        return line.decode('utf-8')
+
+
+def iter_range(file, start, end):
+    """Читает строки файла в диапазоне байт [start, end)
+
+    :param file: Файл, открытый в бинарном режиме
+    :param int start: Начало диапазона
+    :param int end: Конец диапазона
+    :return: Генератор строк (bytes)
+    """
+    file.seek(start)
+    position = start
+    for line in file:
+        if position >= end: break
+        position += len(line)
+        yield line
+
+
+def record_ranges(file_name, start, parts, block_size=1 << 24):
+    """Делит файл на диапазоны байт, границы которых совпадают с началами записей
+
+    Граница сдвигается на ближайший перевод строки, стоящий вне кавычек,
+    поэтому многострочные поля не разрезаются между диапазонами.
+
+    :param str file_name: Название файла
+    :param int start: Начало данных (после заголовка)
+    :param int parts: Желаемое количество диапазонов
+    :param int block_size: Размер блока чтения
+    :return list: Список пар (начало, конец)
+    """
+    with open(file_name, mode='rb') as file:
+        size = file.seek(0, 2)
+        targets = [start + (size - start) * i // parts for i in range(1, parts)]
+        bounds = [start]
+        file.seek(start)
+        offset, quotes = start, 0
+        while targets:
+            block = file.read(block_size)
+            if not block: break
+            target, counted = max(targets[0] - offset, 0), 0
+            while targets and target < len(block):
+                pos = block.find(b'\n', target)
+                if pos == -1: break
+                quotes += block.count(b'"', counted, pos)
+                counted = pos
+                if quotes % 2:
+                    target = pos + 1
+                    continue
+                bounds.append(offset + pos + 1)
+                targets.pop(0)
+                while targets and targets[0] < bounds[-1]: targets.pop(0)
+                if targets: target = max(targets[0] - offset, pos + 1)
+            quotes += block.count(b'"', counted)
+            offset += len(block)
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
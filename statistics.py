@@ -1,4 +1,7 @@
 import csv
+import json
+import os
+import zlib
 from datetime import datetime
 import openpyxl
 import openpyxl.utils
@@ -11,6 +14,12 @@ import jinja2
 import pathlib
 import pdfkit
 
+from compression import open_file
+from dedup import Deduplicator
+from manifest import list_partitions
+from raw_csv import LineCounter
+from vacancy_store import VacancyStore
+
 
 class Vacancy:
     """Класс для представления вакансии
@@ -73,15 +82,21 @@ class Vacancy:
 class Statistic:
     """Класс для представления статистики
 
+    Зарплаты хранятся как пары [сумма, количество], поэтому статистику можно
+    сохранить и дополнить новыми вакансиями без повторного чтения старых.
+
     Attributes:
-        salary (dict): Зарплата по годам
+        salary (dict): Сумма и количество зарплат по годам
         vacancies_number (dict): Количество вакансий по названиям
-        salary_of_vacancy_name (dict): Зарплата по вакансиям
+        salary_of_vacancy_name (dict): Сумма и количество зарплат по вакансиям
         vac_count_of_vacancy_name (dict): Количество вакансий по названию
-        salary_city (dict): Вакансии по городам
+        salary_city (dict): Сумма и количество зарплат по городам
         vac_city_number (dict): Количество вакансий по городам
         count_of_vacancies (int): Количество вакансий
     """
+    fields = ['salary', 'vacancies_number', 'salary_of_vacancy_name', 'vac_count_of_vacancy_name',
+              'salary_city', 'vac_city_number']
+
     def __init__(self):
         """Конструктор класса статистики"""
         self.salary = {}
@@ -98,8 +113,10 @@ class Statistic:
         :param Vacancy vacancy: Вакансия
         """
         if vacancy.year not in self.salary:
-            self.salary[vacancy.year] = [vacancy.salary_average]
-        else: self.salary[vacancy.year].append(vacancy.salary_average)
+            self.salary[vacancy.year] = [vacancy.salary_average, 1]
+        else:
+            self.salary[vacancy.year][0] += vacancy.salary_average
+            self.salary[vacancy.year][1] += 1
 
     def year_vac_dynamics(self, vacancy):
         """Составление динамики вакансий по годам
@@ -118,8 +135,10 @@ class Statistic:
         """
         if vacancy.name.find(vacancy_name) != -1:
             if vacancy.year not in self.salary_of_vacancy_name:
-                self.salary_of_vacancy_name[vacancy.year] = [vacancy.salary_average]
-            else: self.salary_of_vacancy_name[vacancy.year].append(vacancy.salary_average)
+                self.salary_of_vacancy_name[vacancy.year] = [vacancy.salary_average, 1]
+            else:
+                self.salary_of_vacancy_name[vacancy.year][0] += vacancy.salary_average
+                self.salary_of_vacancy_name[vacancy.year][1] += 1
 
             if vacancy.year not in self.vac_count_of_vacancy_name:
                 self.vac_count_of_vacancy_name[vacancy.year] = 1
@@ -131,8 +150,10 @@ class Statistic:
         :param Vacancy vacancy: Вакансия
         """
         if vacancy.area_name not in self.salary_city:
-            self.salary_city[vacancy.area_name] = [vacancy.salary_average]
-        else: self.salary_city[vacancy.area_name].append(vacancy.salary_average)
+            self.salary_city[vacancy.area_name] = [vacancy.salary_average, 1]
+        else:
+            self.salary_city[vacancy.area_name][0] += vacancy.salary_average
+            self.salary_city[vacancy.area_name][1] += 1
 
     def city_count_dynamics(self, vacancy):
         """Составление динамики количества вакансий по городам
@@ -156,14 +177,43 @@ class Statistic:
         self.city_count_dynamics(vacancy)
         self.count_of_vacancies += 1
 
+    def to_dict(self):
+        """Представление статистики для сохранения в JSON
+
+        Словари сохраняются списками пар, чтобы не терять порядок и числовые ключи (годы).
+
+        :return dict: Статистика
+        """
+        data = {field: list(getattr(self, field).items()) for field in self.fields}
+        data['count_of_vacancies'] = self.count_of_vacancies
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        """Восстанавливает статистику
+
+        :param dict data: Статистика из Statistic.to_dict
+        :return Statistic: Статистика
+
+        >>> stats = Statistic()
+        >>> stats.write(Vacancy({'test_data': True}), 'Test')
+        >>> Statistic.from_dict(json.loads(json.dumps(stats.to_dict()))).get_stat1()
+        {2007: 909}
+        """
+        statistics = Statistic()
+        for field in Statistic.fields:
+            setattr(statistics, field, dict((key, value) for key, value in data[field]))
+        statistics.count_of_vacancies = data['count_of_vacancies']
+        return statistics
+
     def get_stat1(self):
         """ Получить динамику уровня зарплат по годам
 
         :return dict: Динамика уровня зарплат по годам
         """
         result = {}
-        for year, sal in self.salary.items():
-            result[year] = int(sum(sal) / len(sal))
+        for year, (total, count) in self.salary.items():
+            result[year] = int(total / count)
         return result
 
     def get_stat2(self):
@@ -179,12 +229,10 @@ class Statistic:
         :return dict: Динамика уровня зарплат по годам для выбранной профессии
         """
         if not self.salary_of_vacancy_name:
-            self.salary_of_vacancy_name = self.salary.copy()
-            self.salary_of_vacancy_name = dict([(key, []) for key, value in self.salary_of_vacancy_name.items()])
+            return dict([(key, 0) for key in self.salary.keys()])
         result = {}
-        for year, sal in self.salary_of_vacancy_name.items():
-            if len(sal) == 0: result[year] = 0
-            else: result[year] = int(sum(sal) / len(sal))
+        for year, (total, count) in self.salary_of_vacancy_name.items():
+            result[year] = int(total / count)
         return result
 
     def get_stat4(self):
@@ -193,9 +241,7 @@ class Statistic:
         :return dict: Динамика количества вакансий по годам для выбранной профессии
         """
         if not self.vac_count_of_vacancy_name:
-            self.vac_count_of_vacancy_name = self.vacancies_number.copy()
-            self.vac_count_of_vacancy_name = dict(
-                [(key, 0) for key, value in self.vac_count_of_vacancy_name.items()])
+            return dict([(key, 0) for key in self.vacancies_number.keys()])
         return self.vac_count_of_vacancy_name
 
     def get_stat5and6(self):
@@ -211,8 +257,8 @@ class Statistic:
         result1.sort(key=lambda a: a[-1], reverse=True)
 
         result2 = {}
-        for city, sal in self.salary_city.items():
-            result2[city] = int(sum(sal) / len(sal))
+        for city, (total, count) in self.salary_city.items():
+            result2[city] = int(total / count)
         result2 = list(filter(lambda a: a[0] in list(dict(result1).keys()),
                              [(key, value) for key, value in result2.items()]))
         result2.sort(key=lambda a: a[-1], reverse=True)
@@ -230,41 +276,253 @@ class Statistic:
         print('Доля вакансий по городам (в порядке убывания): ' + str(stat6))
 
 
+class StoreStatistic(Statistic):
+    """Статистика, вычисляемая SQL запросами к хранилищу вакансий
+
+    Attributes:
+        store (VacancyStore): Хранилище вакансий
+        vacancy_name (str): Название необходимой вакансии
+    """
+    def __init__(self, store, vacancy_name):
+        """Конструктор статистики по хранилищу
+
+        :param VacancyStore store: Хранилище вакансий
+        :param str vacancy_name: Название необходимой вакансии
+        """
+        super().__init__()
+        self.store = store
+        self.vacancy_name = vacancy_name
+
+    def get_stat1(self):
+        """ :return dict: Динамика уровня зарплат по годам """
+        return self.store.get_stat1()
+
+    def get_stat2(self):
+        """ :return dict: Динамика количества вакансий по годам """
+        return self.store.get_stat2()
+
+    def get_stat3(self):
+        """ :return dict: Динамика уровня зарплат по годам для выбранной профессии """
+        return self.store.get_stat3(self.vacancy_name)
+
+    def get_stat4(self):
+        """ :return dict: Динамика количества вакансий по годам для выбранной профессии """
+        return self.store.get_stat4(self.vacancy_name)
+
+    def get_stat5and6(self):
+        """ :return: Уровень и доля зарплат по городам (в порядке убывания) """
+        return self.store.get_stat5and6()
+
+
+class StatisticState:
+    """Сохраненное состояние статистики: агрегаты и прочитанная часть входных файлов
+
+    Для каждого файла хранится смещение конца последней прочитанной записи, контрольная
+    сумма всех байт перед ним, а также размер и время изменения файла. Если файл не менялся,
+    он не перечитывается; если дописан - контрольная сумма прочитанной части сверяется
+    целиком и читается только новая часть. Если файл пропал или изменился (например,
+    перезаписан уплотнением или исправлена старая запись), статистика считается заново.
+
+    Attributes:
+        file_name (str): Файл состояния
+        vacancy_name (str): Название вакансии, для которой собрана статистика
+        statistic (Statistic): Накопленная статистика
+        sources (dict): Прочитанные файлы: смещение, заголовок, контрольная сумма, размер и время изменения
+        dedup_rows (int): Уникальных ключей в множестве дедупликации на момент сохранения
+    """
+    block_size = 1 << 20
+
+    def __init__(self, file_name, vacancy_name):
+        """Конструктор состояния
+
+        :param str file_name: Файл состояния
+        :param str vacancy_name: Название вакансии
+        """
+        self.file_name = file_name
+        self.vacancy_name = vacancy_name
+        self.statistic = Statistic()
+        self.sources = {}
+        self.dedup_rows = 0
+
+    @staticmethod
+    def get_path(input_name, vacancy_name):
+        """Файл состояния для входных данных и названия вакансии
+
+        :param str input_name: Входной файл или папка с партициями
+        :param str vacancy_name: Название вакансии
+        :return str: Путь к файлу состояния
+
+        >>> StatisticState.get_path('vacancies.csv', 'Аналитик')
+        'vacancies.csv.stats-e0fcc571.json'
+        """
+        return '{0}.stats-{1:08x}.json'.format(input_name.rstrip('/\\'), zlib.crc32(vacancy_name.encode('utf-8')))
+
+    @staticmethod
+    def load(file_name, vacancy_name):
+        """Читает состояние (пустое, если файла нет или он собран для другой вакансии)
+
+        :param str file_name: Файл состояния
+        :param str vacancy_name: Название вакансии
+        :return StatisticState: Состояние
+        """
+        state = StatisticState(file_name, vacancy_name)
+        if not os.path.isfile(file_name): return state
+        with open(file_name, mode='r', encoding='utf-8') as file:
+            data = json.load(file)
+        if data['vacancy_name'] != vacancy_name: return state
+        state.statistic = Statistic.from_dict(data['statistic'])
+        state.sources = data['sources']
+        state.dedup_rows = data.get('dedup_rows', 0)
+        return state
+
+    def save(self):
+        """Атомарно записывает состояние (через временный файл)"""
+        data = {'vacancy_name': self.vacancy_name, 'sources': self.sources, 'dedup_rows': self.dedup_rows,
+                'statistic': self.statistic.to_dict()}
+        with open(self.file_name + '.tmp', mode='w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(self.file_name + '.tmp', self.file_name)
+
+    def is_valid(self):
+        """Проверяет, что прочитанные ранее части файлов не изменились
+
+        :return bool: Состояние можно дополнять
+        """
+        for path, source in self.sources.items():
+            if not os.path.isfile(path) or 'mtime_ns' not in source: return False
+            stat = os.stat(path)
+            if stat.st_size == source['size'] and stat.st_mtime_ns == source['mtime_ns']: continue
+            if self.get_checksum(path, source['offset']) != source['checksum']: return False
+        return True
+
+    @staticmethod
+    def get_checksum(path, offset):
+        """Контрольная сумма начала файла
+
+        :param str path: Путь к файлу
+        :param int offset: Длина начала файла в байтах
+        :return int: CRC32 или None, если файл короче
+        """
+        checksum = 0
+        with open_file(path, mode='rb') as file:
+            while offset > 0:
+                block = file.read(min(offset, StatisticState.block_size))
+                if not block: return None
+                checksum = zlib.crc32(block, checksum)
+                offset -= len(block)
+        return checksum
+
+    def reset(self):
+        """Сбрасывает состояние для полного пересчета"""
+        self.statistic = Statistic()
+        self.sources = {}
+        self.dedup_rows = 0
+
+
 class DataSet:
     """Дата-сет для работы с таблицей
     Attributes:
-        file_name (str): Название файла
+        file_name (str): Название файла или папки с партициями
         vacancy_name (str): Название необходимой вакансии
+        dedup (list): Столбцы ключа для удаления дубликатов или None
+        deduplicator (Deduplicator): Дедупликатор последнего подсчета
     """
-    def __init__(self, file_name, vacancy_name):
+    def __init__(self, file_name, vacancy_name, dedup=None):
         """Конструктор класса DataSet
 
-        :param str file_name: Название файла
+        :param str file_name: Название файла или папки с партициями
         :param str vacancy_name: Название необходимой вакансии
+        :param list dedup: Столбцы ключа для удаления дубликатов или None
         """
         self.file_name = file_name
         self.vacancy_name = vacancy_name
+        self.dedup = dedup
+        self.deduplicator = None
+
+    def get_files(self):
+        """ :return list: Входные файлы (для папки - партиции с зарплатами) """
+        if not os.path.isdir(self.file_name): return [self.file_name]
+        return [path for path, _ in list_partitions(self.file_name, need_salary=True)[0]]
 
-    def csv_reader(self):
-        """Читает CSV файл"""
-        with open(self.file_name, mode='r', encoding='utf-8-sig') as file:
+    def csv_reader(self, path, source=None):
+        """Читает CSV файл (целиком или с сохраненного смещения)
+
+        :param str path: Путь к файлу
+        :param dict source: Прочитанная часть файла или None, если состояние не сохраняется
+        :return: Генератор словарей вакансий
+        """
+        if source is not None:
+            yield from self.append_reader(path, source)
+            return
+        with open_file(path, mode='r', encoding='utf-8-sig') as file:
             reader = csv.reader(file)
-            header = next(reader)
+            header = next(reader, [])
             header_length = len(header)
             for row in reader:
                 if '' not in row and len(row) == header_length:
                     yield dict(zip(header, row))
 
-    def get_statistic(self):
+    @staticmethod
+    def append_reader(path, source):
+        """Читает CSV файл с сохраненного смещения, запоминая конец последней полной записи
+
+        Недописанная последняя запись (без перевода строки или с незакрытой кавычкой) не читается -
+        она войдет в следующий запуск.
+
+        :param str path: Путь к файлу
+        :param dict source: Прочитанная часть файла (offset, header, checksum, size, mtime_ns), обновляется
+        :return: Генератор словарей вакансий
+        """
+        stat = os.stat(path)
+        with open_file(path, mode='rb') as file:
+            if source['offset'] != 0: file.seek(source['offset'])
+            counter = LineCounter(file, source['offset'], source.get('checksum', 0))
+            reader = csv.reader(counter)
+            if source['offset'] == 0:
+                header = next(reader, [])
+                if header: header[0] = header[0].lstrip('\ufeff')
+                source.update(offset=counter.offset, header=header, checksum=counter.checksum)
+            header = source['header']
+            header_length = len(header)
+            try:
+                for row in reader:
+                    if counter.quotes % 2 or not counter.line.endswith(b'\n'): break
+                    counter.quotes = 0
+                    source['offset'], source['checksum'] = counter.offset, counter.checksum
+                    if '' not in row and len(row) == header_length:
+                        yield dict(zip(header, row))
+            finally:
+                source.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+    def get_statistic(self, state=None):
         """Получить статистические данные
 
+        :param StatisticState state: Сохраненное состояние (дополняется только новыми записями)
         :return Statistics: Статистика
-        """
-        statistics = Statistic()
 
-        for vacancy_dictionary in self.csv_reader():
-            vacancy = Vacancy(vacancy_dictionary)
-            statistics.write(vacancy, self.vacancy_name)
+        При удалении дубликатов множество ключей хранится рядом с файлом состояния
+        и сбрасывается вместе с ним.
+        """
+        if state is None: state = StatisticState('', self.vacancy_name)
+        elif not state.is_valid(): state.reset()
+        if self.dedup:
+            self.deduplicator = Deduplicator(self.dedup, path=state.file_name + '.dedup' if state.file_name else None)
+            if self.deduplicator.count() != state.dedup_rows:
+                state.reset()
+                self.deduplicator.clear()
+        statistics = state.statistic
+
+        try:
+            for path in self.get_files():
+                source = state.sources.setdefault(path, {'offset': 0})
+                for vacancy_dictionary in self.csv_reader(path, source):
+                    if self.deduplicator and self.deduplicator.is_duplicate(vacancy_dictionary): continue
+                    vacancy = Vacancy(vacancy_dictionary)
+                    statistics.write(vacancy, self.vacancy_name)
+        finally:
+            if self.deduplicator:
+                state.dedup_rows = self.deduplicator.count()
+                self.deduplicator.close()
 
         return statistics
 
@@ -276,9 +534,15 @@ class InputConnect:
         file_name (str): Название файла
         vacancy_name (list): Название необходимой вакансии
     """
-    def __init__(self, fn=None, vn=None):
+    def __init__(self, fn=None, vn=None, incremental=False, dedup=None):
         """
         Начало работы программы
+
+        :param str fn: Название файла (CSV, папка с партициями или хранилище .db/.sqlite)
+        :param str vn: Название профессии
+        :param bool incremental: Сохранять статистику рядом с входными данными (<файл>.stats-<crc>.json)
+            и при следующем запуске читать только новые записи
+        :param list dedup: Столбцы ключа для удаления дубликатов (например name, employer_name, published_at)
         """
         self.file_name = fn
         if fn is None:
@@ -287,8 +551,21 @@ class InputConnect:
         if vn is None:
             self.vacancy_name = input('Введите название профессии: ')
 
-        dataset = DataSet(self.file_name, self.vacancy_name)
-        stats = dataset.get_statistic()
+        if self.file_name.endswith(('.db', '.sqlite')):
+            store = VacancyStore.open(self.file_name)
+            if store is None:
+                print('Нет базы данных')
+                exit()
+            stats = StoreStatistic(store, self.vacancy_name)
+        else:
+            dataset = DataSet(self.file_name, self.vacancy_name, dedup)
+            if incremental:
+                state = StatisticState.load(StatisticState.get_path(self.file_name, self.vacancy_name),
+                                            self.vacancy_name)
+                stats = dataset.get_statistic(state)
+                state.save()
+            else: stats = dataset.get_statistic()
+            if dataset.deduplicator: print(dataset.deduplicator.report())
         stats.print_statistics()
 
         stat5, stat6 = stats.get_stat5and6()
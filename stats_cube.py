@@ -0,0 +1,261 @@
+import gzip
+import json
+import multiprocessing
+import os
+
+from compression import get_compressor, open_file
+from raw_csv import iter_records, iter_range, parse_header, parse_record, record_ranges
+from statistics import DataSet, Report, Statistic, Vacancy
+
+
+def normalize_name(name):
+    """Нормализованное название вакансии (пробельные символы схлопываются)
+
+    Название в запросе нормализуется так же, поэтому любая подстрока ищется по ячейкам куба.
+    От поиска в исходном названии это отличается только для названий с переводами строк
+    или повторными пробелами: в них подстрока находится без учета вида пробелов.
+
+    :param str name: Название вакансии
+    :return str: Нормализованное название
+
+    >>> normalize_name(' Python \\n  разработчик ')
+    'Python разработчик'
+    """
+    return ' '.join(name.split())
+
+
+def add_salary(stat, key, count, total):
+    """Добавляет сумму и количество зарплат к статистике
+
+    :param dict stat: Словарь ключ -> [сумма, количество]
+    :param key: Ключ (год или город)
+    :param int count: Количество вакансий
+    :param float total: Сумма зарплат
+    """
+    if key not in stat: stat[key] = [total, count]
+    else:
+        stat[key][0] += total
+        stat[key][1] += count
+
+
+class AggregateCube:
+    """Материализованный куб агрегатов статистики
+
+    Для каждого сочетания (год, город, валюта, нормализованное название) хранятся
+    количество вакансий и сумма зарплат в рублях. Ячейки идут в порядке первого появления,
+    поэтому статистика из куба выдает годы и города в том же порядке, что и проход по файлу.
+    Суммы складываются по ячейкам, поэтому средние могут отличаться от прохода по файлу
+    в последнем знаке из-за порядка сложения.
+
+    Attributes:
+        file_name (str): Входной файл или папка с партициями
+        sources (dict): Размер и время изменения входных файлов на момент построения
+        cells (dict): (год, город, валюта, название) -> [количество, сумма зарплат]
+    """
+    def __init__(self, file_name):
+        """Конструктор куба
+
+        :param str file_name: Входной файл или папка с партициями
+        """
+        self.file_name = file_name
+        self.sources = {}
+        self.cells = {}
+
+    @property
+    def path(self):
+        """ :return str: Файл куба """
+        return self.file_name.rstrip('/\\') + '.cube.json.gz'
+
+    def get_sources(self):
+        """ :return dict: Размер и время изменения входных файлов """
+        return {path: [os.path.getsize(path), os.path.getmtime(path)]
+                for path in DataSet(self.file_name, None).get_files()}
+
+    def get_tasks(self, processes):
+        """Задачи построения: по файлу на партицию или диапазоны байт одного несжатого файла
+
+        :param int processes: Количество процессов
+        :return list: Тройки (файл, начало, конец диапазона; None - весь файл)
+        """
+        files = DataSet(self.file_name, None).get_files()
+        if len(files) > 1 or processes <= 1 or get_compressor(files[0]): return [(f, None, None) for f in files]
+        with open(files[0], mode='rb') as file:
+            start = len(file.readline())
+        return [(files[0], a, b) for a, b in record_ranges(files[0], start, processes)]
+
+    @staticmethod
+    def aggregate(task):
+        """Агрегирует часть входных данных
+
+        :param tuple task: Файл и диапазон байт
+        :return dict: Ячейки куба в порядке первого появления
+        """
+        path, start, end = task
+        cells = {}
+        with open_file(path, mode='rb') as file:
+            header = parse_header(file.readline())
+            header_length = len(header)
+            lines = file if start is None else iter_range(file, start, end)
+            for record in iter_records(lines):
+                row = parse_record(record)
+                if '' in row or len(row) != header_length: continue
+                vacancy = Vacancy(dict(zip(header, row)))
+                key = (vacancy.year, vacancy.area_name, vacancy.salary_currency, normalize_name(vacancy.name))
+                cell = cells.get(key)
+                if cell is None: cells[key] = [1, vacancy.salary_average]
+                else:
+                    cell[0] += 1
+                    cell[1] += vacancy.salary_average
+        return cells
+
+    def build(self, processes=None):
+        """Строит куб за один параллельный проход
+
+        :param int processes: Количество процессов (по умолчанию - по числу ядер)
+        """
+        processes = processes or multiprocessing.cpu_count()
+        self.sources = self.get_sources()
+        tasks = self.get_tasks(processes)
+        with multiprocessing.Pool(min(processes, len(tasks)) or 1) as pool:
+            results = pool.map(AggregateCube.aggregate, tasks)
+        self.cells = {}
+        for cells in results:
+            for key, (count, total) in cells.items():
+                cell = self.cells.get(key)
+                if cell is None: self.cells[key] = [count, total]
+                else:
+                    cell[0] += count
+                    cell[1] += total
+
+    def save(self):
+        """Сохраняет куб: значения измерений - справочниками, ячейки - номерами в справочниках"""
+        dimensions = [{}, {}, {}, {}]
+        cells = []
+        for key, (count, total) in self.cells.items():
+            cells.append([dimension.setdefault(value, len(dimension)) for dimension, value in zip(dimensions, key)] +
+                         [count, total])
+        data = {'sources': self.sources, 'dimensions': [list(d) for d in dimensions], 'cells': cells}
+        with gzip.open(self.path + '.tmp', mode='wt', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, separators=(',', ':'))
+        os.replace(self.path + '.tmp', self.path)
+
+    @staticmethod
+    def load(file_name):
+        """Читает куб, если он построен по текущей версии входных данных
+
+        :param str file_name: Входной файл или папка с партициями
+        :return AggregateCube: Куб или None, если его нет или входные данные изменились
+        """
+        cube = AggregateCube(file_name)
+        if not os.path.isfile(cube.path): return None
+        with gzip.open(cube.path, mode='rt', encoding='utf-8') as file:
+            data = json.load(file)
+        cube.sources = data['sources']
+        if not cube.is_fresh(): return None
+        dimensions = data['dimensions']
+        for *key, count, total in data['cells']:
+            cube.cells[tuple(dimension[i] for dimension, i in zip(dimensions, key))] = [count, total]
+        return cube
+
+    def is_fresh(self):
+        """ :return bool: Входные данные не менялись с построения куба """
+        return self.sources == self.get_sources()
+
+    def get_statistic(self, vacancy_name, areas=None):
+        """Статистика по ячейкам куба
+
+        :param str vacancy_name: Название вакансии (поиск подстроки в нормализованных названиях)
+        :param set areas: Города (None - все)
+        :return Statistic: Статистика
+        """
+        vacancy_name = normalize_name(vacancy_name)
+        statistics = Statistic()
+        matches = {}
+        for (year, area, currency, name), (count, total) in self.cells.items():
+            if areas is not None and area not in areas: continue
+            add_salary(statistics.salary, year, count, total)
+            statistics.vacancies_number[year] = statistics.vacancies_number.get(year, 0) + count
+            if name not in matches: matches[name] = vacancy_name in name
+            if matches[name]:
+                add_salary(statistics.salary_of_vacancy_name, year, count, total)
+                statistics.vac_count_of_vacancy_name[year] = statistics.vac_count_of_vacancy_name.get(year, 0) + count
+            add_salary(statistics.salary_city, area, count, total)
+            statistics.vac_city_number[area] = statistics.vac_city_number.get(area, 0) + count
+            statistics.count_of_vacancies += count
+        return statistics
+
+    def scan(self, vacancy_name, areas=None):
+        """Статистика полным проходом по входным данным (если куб устарел)
+
+        Названия сравниваются нормализованными, как в get_statistic.
+
+        :param str vacancy_name: Название вакансии
+        :param set areas: Города (None - все)
+        :return Statistic: Статистика
+        """
+        vacancy_name = normalize_name(vacancy_name)
+        dataset = DataSet(self.file_name, vacancy_name)
+        statistics = Statistic()
+        for path in dataset.get_files():
+            for vacancy_dictionary in dataset.csv_reader(path):
+                vacancy = Vacancy(vacancy_dictionary)
+                vacancy.name = normalize_name(vacancy.name)
+                if areas is None or vacancy.area_name in areas: statistics.write(vacancy, vacancy_name)
+        return statistics
+
+    def query(self, vacancy_name, areas=None):
+        """Статистика по кубу, а если входные данные изменились после его построения - полным проходом
+
+        :param str vacancy_name: Название вакансии
+        :param set areas: Города (None - все)
+        :return Statistic: Статистика
+        """
+        if self.is_fresh(): return self.get_statistic(vacancy_name, areas)
+        return self.scan(vacancy_name, areas)
+
+
+class InputConnect:
+    """Начальная точка программы. Объединяет всю логику программы
+
+    Attributes:
+        file_name (str): Название файла или папки с партициями
+        vacancy_name (str): Название необходимой вакансии
+        areas (set): Города (None - все)
+    """
+    def __init__(self, fn=None, vn=None, areas=None, processes=None):
+        """
+        Начало работы программы
+
+        :param str fn: Название файла или папки с партициями
+        :param str vn: Название профессии
+        :param list areas: Города (None - спросить, пустой список - все)
+        :param int processes: Количество процессов для построения куба
+        """
+        self.file_name = fn
+        if fn is None:
+            self.file_name = input('Введите название файла: ')
+        self.vacancy_name = vn
+        if vn is None:
+            self.vacancy_name = input('Введите название профессии: ')
+        if areas is None:
+            areas = [a.strip() for a in input('Введите города через запятую (пусто - все): ').split(',') if a.strip()]
+        self.areas = set(areas) or None
+
+        cube = AggregateCube.load(self.file_name)
+        if cube is None:
+            cube = AggregateCube(self.file_name)
+            cube.build(processes)
+            cube.save()
+        stats = cube.query(self.vacancy_name, self.areas)
+        stats.print_statistics()
+
+        stat5, stat6 = stats.get_stat5and6()
+        report = Report(self.vacancy_name, stats.get_stat1(), stats.get_stat2(),
+                        stats.get_stat3(), stats.get_stat4(), stat5, stat6)
+
+        report.generate_excel('report.xlsx')
+        report.generate_img('graph.png')
+        report.generate_pdf('report.pdf')
+
+
+if __name__ == '__main__': InputConnect()
@@ -0,0 +1,148 @@
+import csv
+import os
+import sys
+import textwrap
+
+import openpyxl
+
+
+class TableWriter:
+    """Потоковый вывод таблицы: строки печатаются сразу, без накопления всей таблицы в памяти
+
+    Оформление как у PrettyTable(align='l', max_width=..., hrules=1) и get_string(fields=...):
+    переносятся только строки длиннее столбца, высота строки таблицы считается по всем ячейкам,
+    включая скрытые. Ширина столбцов не подбирается по всем строкам (их еще нет), а задается
+    заранее: max_width, но не уже названия столбца, или по первым строкам (get_widths).
+
+    Attributes:
+        widths (list): Ширина столбцов
+        shown (list): Признаки показываемых столбцов
+        rule (str): Горизонтальная линия
+        file: Файл вывода
+    """
+    def __init__(self, field_names, max_width=20, widths=None, fields=None, file=None):
+        """Конструктор таблицы, сразу печатает заголовок
+
+        :param list field_names: Названия столбцов
+        :param int max_width: Ширина столбца
+        :param dict widths: Ширина отдельных столбцов по названию
+        :param list fields: Показываемые столбцы (None - все)
+        :param file: Файл вывода (по умолчанию - sys.stdout)
+
+        >>> table = TableWriter(['№', 'Название', 'Навыки'], max_width=8, widths={'№': 2}, fields=['№', 'Название'])
+        +----+----------+
+        | №  | Название |
+        +----+----------+
+        >>> table.write_row([1, 'Аналитик данных', 'Python\\nSQL\\nGit'])
+        | 1  | Аналитик |
+        |    | данных   |
+        |    |          |
+        +----+----------+
+        """
+        widths = widths or {}
+        self.widths = [widths.get(name, max(max_width, len(name))) for name in field_names]
+        self.shown = [fields is None or name in fields for name in field_names]
+        self.rule = '+' + '+'.join('-' * (w + 2) for w, shown in zip(self.widths, self.shown) if shown) + '+\n'
+        self.file = file or sys.stdout
+        self.file.write(self.rule)
+        self.write_row(field_names)
+
+    @staticmethod
+    def get_widths(field_names, rows, max_width=20):
+        """Ширина столбцов по строкам, как ее считает PrettyTable: самая длинная строка ячейки,
+        но не больше max_width и не меньше названия столбца
+
+        :param list field_names: Названия столбцов
+        :param list rows: Строки таблицы
+        :param int max_width: Наибольшая ширина столбца
+        :return dict: Ширина столбцов по названию
+
+        >>> TableWriter.get_widths(['№', 'Навыки'], [[1, 'Git'], [10, 'SQL\\nPython']], 4)
+        {'№': 2, 'Навыки': 6}
+        """
+        widths = {name: len(name) for name in field_names}
+        for row in rows:
+            for name, value in zip(field_names, row):
+                width = min(max(map(len, str(value).split('\n'))), max_width)
+                if width > widths[name]: widths[name] = width
+        return widths
+
+    @staticmethod
+    def wrap(value, width):
+        """Переносит по словам строки ячейки, которые длиннее столбца (как PrettyTable)
+
+        :param value: Значение
+        :param int width: Ширина столбца
+        :return list: Строки ячейки
+
+        >>> TableWriter.wrap('Python\\nDjango REST\\n\\n  SQL', 6)
+        ['Python', 'Django', 'REST', '', '  SQL']
+        """
+        lines = []
+        for line in str(value).split('\n'):
+            if len(line) <= width: lines.append(line)
+            else: lines.extend(textwrap.wrap(line, width) or [''])
+        return lines
+
+    def write_row(self, row):
+        """Печатает строку таблицы и горизонтальную линию под ней
+
+        :param list row: Значения ячеек
+        """
+        cells = [self.wrap(value, width) for value, width in zip(row, self.widths)]
+        shown = [(c, w) for c, w, s in zip(cells, self.widths, self.shown) if s]
+        for i in range(max(map(len, cells))):
+            self.file.write('| ' + ' | '.join((c[i] if i < len(c) else '').ljust(w) for c, w in shown) + ' |\n')
+        self.file.write(self.rule)
+
+
+def write_csv(file_name, field_names, rows):
+    """Выгружает строки в CSV по одной
+
+    :param str file_name: Название файла
+    :param list field_names: Названия столбцов
+    :param rows: Итератор строк
+    :return int: Количество строк
+    """
+    count = 0
+    with open(file_name, mode='w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file)
+        writer.writerow(field_names)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_xlsx(file_name, field_names, rows):
+    """Выгружает строки в XLSX в режиме только для записи (строки сразу уходят во временный файл)
+
+    :param str file_name: Название файла
+    :param list field_names: Названия столбцов
+    :param rows: Итератор строк
+    :return int: Количество строк
+    """
+    count = 0
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Вакансии')
+    ws.append(field_names)
+    for row in rows:
+        ws.append(row)
+        count += 1
+    wb.save(file_name)
+    return count
+
+
+EXPORTERS = {'.csv': write_csv, '.xlsx': write_xlsx}
+
+
+def get_exporter(file_name):
+    """Функция выгрузки по расширению файла
+
+    :param str file_name: Название файла
+    :return: Функция (файл, столбцы, строки) -> количество строк или None, если формат не поддерживается
+
+    >>> get_exporter('vacancies.xlsx').__name__, get_exporter('vacancies.txt')
+    ('write_xlsx', None)
+    """
+    return EXPORTERS.get(os.path.splitext(file_name)[1].lower())
@@ -0,0 +1,117 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+import pytest
+
+import year_splitter
+from compaction import Compactor
+from conftest import make_row
+from manifest import MANIFEST_NAME, Manifest, list_partitions
+
+
+def legacy_split(path, directory):
+    """Разбиение по годам без манифеста (как исходный year_splitter)"""
+    dataset = year_splitter.DataSet(path)
+    dataset.csv_reader()
+    dataset.export_csv(directory)
+
+
+def read_names(directory, **query):
+    names = []
+    for path, _ in list_partitions(directory, **query)[0]:
+        dataset = year_splitter.DataSet(path)
+        dataset.csv_reader()
+        names += [row['name'] for rows in dataset.data.values() for row in rows]
+    return sorted(names)
+
+
+def test_legacy_directory_keeps_existing_partitions(write_csv, tmp_path):
+    directory = str(tmp_path / 'legacy')
+    legacy_split(write_csv('old.csv', [make_row(name='Аналитик', published='2021-01-02T10:00:00+0300'),
+                                       make_row(name='Бухгалтер', published='2022-01-02T10:00:00+0300')]), directory)
+    compactor = Compactor(directory, grace=0)
+    compactor.ingest(write_csv('crawl.csv', [make_row(name='Водитель', published='2022-03-02T10:00:00+0300')]))
+    assert compactor.compact() == 1
+
+    manifest = Manifest.load(directory)
+    assert sorted(manifest.partitions) == ['2021', '2022']
+    assert manifest.partitions['2021'].file == '2021.csv' and manifest.partitions['2022'].rows == 2
+    assert read_names(directory) == ['Аналитик', 'Бухгалтер', 'Водитель']
+    assert read_names(directory, contains={'name': 'Водитель'}) == ['Бухгалтер', 'Водитель']
+
+
+def test_legacy_directory_with_foreign_file_is_refused(write_csv, tmp_path):
+    directory = str(tmp_path / 'legacy')
+    write_csv('legacy/2021.csv', [make_row(published='2022-01-02T10:00:00+0300')])
+    compactor = Compactor(directory)
+    compactor.ingest(write_csv('crawl.csv', [make_row()]))
+    with pytest.raises(RuntimeError):
+        compactor.compact()
+    assert not os.path.exists(os.path.join(directory, MANIFEST_NAME))
+    assert len(compactor.segments()) == 1 and os.listdir(directory) != []
+
+
+def test_compressed_crlf_segments_and_duplicates(write_csv, tmp_path):
+    directory = str(tmp_path / 'parts')
+    crawl = write_csv('crawl.csv', [make_row(name='A', skills='Python\nSQL'), make_row(name='B')])
+    with open(crawl, mode='rb') as source, gzip.open(crawl + '.gz', mode='wb') as target:
+        shutil.copyfileobj(source, target)
+    compactor = Compactor(directory)
+    compactor.ingest(crawl + '.gz')
+    compactor.ingest(crawl)
+    assert compactor.compact() == 2 and compactor.duplicates == 2
+    stats = Manifest.load(directory).partitions['2022']
+    assert stats.rows == 2 and stats.sorted and stats.may_contain('key_skills', ['Python', 'SQL'])
+
+
+def test_nothing_to_compact(tmp_path):
+    assert Compactor(str(tmp_path / 'parts')).compact() == 0
+
+
+def test_stale_blooms_are_rebuilt(write_csv, tmp_path):
+    directory = str(tmp_path / 'parts')
+    compactor = Compactor(directory)
+    compactor.ingest(write_csv('a.csv', [make_row(area='Казань', published='2021-01-02T10:00:00+0300')]))
+    compactor.compact()
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    del data['bloom_version']
+    with open(path, mode='w', encoding='utf-8') as file:
+        json.dump(data, file)
+
+    compactor.ingest(write_csv('b.csv', [make_row()]))
+    compactor.compact()
+    assert not Manifest.load(directory).partitions['2021'].may_contain('area_name', 'Москва')
+
+
+def test_spilled_runs_match_in_memory_merge(write_csv, tmp_path, monkeypatch):
+    days = [9, 3, 3, 7, 1, 3, 9, 5]
+    crawls = [[make_row(name='Вакансия {0}-{1}'.format(n, i), employer='Компания {0}'.format(i % 3),
+                        published='2022-01-{0:02}T10:00:00+0300'.format(days[(n + i) % len(days)]))
+               for i in range(40)] for n in range(3)]
+    crawls[2] += crawls[0][:10]
+
+    def compact(name):
+        directory = str(tmp_path / name)
+        legacy_split(write_csv('old.csv', crawls[0]), directory)
+        compactor = Compactor(directory)
+        for n, rows in enumerate(crawls[1:]):
+            compactor.ingest(write_csv('crawl{0}.csv'.format(n), rows))
+        compactor.compact()
+        with open(os.path.join(directory, Manifest.load(directory).partitions['2022'].file), mode='rb') as file:
+            return compactor.duplicates, file.read()
+
+    expected = compact('memory')
+    spilled = []
+    os.mkdir(tmp_path / 'tmp')
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path / 'tmp'))
+    monkeypatch.setattr(Compactor, 'sort_memory', 4 << 10)
+    monkeypatch.setattr(Compactor, 'run_chunk', 3)
+    spill_run = Compactor.spill_run
+    monkeypatch.setattr(Compactor, 'spill_run', lambda self, *args: spilled.append(1) or spill_run(self, *args))
+    assert compact('spilled') == expected and expected[0] == 10 and len(spilled) > 4
+    assert os.listdir(tmp_path / 'tmp') == []
@@ -0,0 +1,95 @@
+import csv
+import gzip
+import os
+import shutil
+
+import pytest
+
+from conftest import make_row
+from dedup import Deduplicator
+from year_splitter import RawDataSet
+
+
+def keys(count):
+    return [{'name': str(i), 'employer_name': 'Яндекс', 'published_at': '2022'} for i in range(count)]
+
+
+def test_exact_beyond_memory_budget(tmp_path):
+    dedup = Deduplicator(memory=1 << 12)
+    try:
+        assert not any(dedup.is_duplicate(k) for k in keys(5000))
+        assert all(dedup.is_duplicate(k) for k in keys(5000))
+        assert (dedup.rows, dedup.duplicates, dedup.count()) == (10000, 5000, 5000)
+        assert dedup.disk_checks >= 5000 - len(dedup.pending)
+    finally:
+        dedup.close()
+    assert not os.path.exists(dedup.path)
+
+
+def test_persisted_set_and_clear(tmp_path):
+    path = str(tmp_path / 'seen.sqlite')
+    dedup = Deduplicator(path=path)
+    [dedup.is_duplicate(k) for k in keys(3)]
+    dedup.close()
+
+    dedup = Deduplicator(path=path)
+    assert [dedup.is_duplicate(k) for k in keys(4)] == [True, True, True, False]
+    dedup.clear()
+    assert dedup.count() == 0 and not dedup.is_duplicate(keys(1)[0])
+    dedup.close()
+    assert os.path.exists(path)
+
+
+def test_missing_columns():
+    dedup = Deduplicator(['salary_gross'])
+    with pytest.raises(ValueError):
+        dedup.get_columns(['name'])
+    assert dedup.report() == 'Дубликатов: 0 из 0 (0.00%)'
+    dedup.close()
+
+
+def test_split_drops_duplicates_from_compressed_crlf_input(write_csv, tmp_path):
+    rows = [make_row(skills='Python\nSQL'), make_row(skills='Python\nSQL'), make_row(name='Программист'),
+            make_row(employer='Сбер', skills='Git\nLinux')]
+    source = write_csv('v.csv', rows)
+    path = str(tmp_path / 'v.csv.gz')
+    with open(source, mode='rb') as file, gzip.open(path, mode='wb') as compressed:
+        shutil.copyfileobj(file, compressed)
+
+    dataset = RawDataSet(path, dedup=Deduplicator.default_columns)
+    dataset.split(str(tmp_path / 'parts'))
+    with open(tmp_path / 'parts' / '2022.csv', encoding='utf-8-sig', newline='') as file:
+        result = list(csv.reader(file))[1:]
+    assert [(r[0], r[2], r[5]) for r in result] == [('Аналитик', 'Python\r\nSQL', 'Яндекс'),
+                                                     ('Программист', 'Python\r\nSQL', 'Яндекс'),
+                                                     ('Аналитик', 'Git\r\nLinux', 'Сбер')]
+
+
+def test_empty_input(write_csv, tmp_path):
+    dataset = RawDataSet(write_csv('v.csv', []), dedup=Deduplicator.default_columns)
+    dataset.split(str(tmp_path / 'parts'))
+    assert os.listdir(tmp_path / 'parts') == ['manifest.json']
+
+
+def test_statistics_keeps_hash_set_with_state(write_csv, tmp_path):
+    statistics = pytest.importorskip('statistics')
+    pytest.importorskip('matplotlib')
+    path = write_csv('v.csv', [make_row(), make_row()])
+    state_path = str(tmp_path / 'v.json')
+
+    def run():
+        dataset = statistics.DataSet(path, 'Аналитик', dedup=Deduplicator.default_columns)
+        state = statistics.StatisticState.load(state_path, 'Аналитик')
+        result = dataset.get_statistic(state).get_stat2()
+        state.save()
+        return result
+
+    assert run() == {2022: 1}
+    with open(write_csv('more.csv', [make_row(), make_row(employer='Сбер')]), mode='rb') as file:
+        file.readline()
+        appended = file.read()
+    with open(path, mode='ab') as file:
+        file.write(appended)
+    assert run() == {2022: 2}
+    os.remove(state_path + '.dedup')
+    assert run() == {2022: 2}
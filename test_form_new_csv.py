@@ -0,0 +1,34 @@
+import csv
+
+import pytest
+
+pytest.importorskip('pandas')
+
+import form_new_csv  # noqa: E402
+from conftest import make_row  # noqa: E402
+from year_splitter import RawDataSet  # noqa: E402
+
+
+def convert(write_csv, tmp_path, monkeypatch, months):
+    RawDataSet(write_csv('v.csv', [make_row(published='2022-01-02T10:00:00+0300', currency='USD'),
+                                   make_row(published='2021-03-04T10:00:00+0300', currency='RUR')])
+               ).split(str(tmp_path / 'parts'))
+    with open(tmp_path / 'date_dinamics.csv', mode='w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['', 'date', 'USD'])
+        for i, month in enumerate(months): writer.writerow([i, month, '60'])
+    monkeypatch.chdir(tmp_path)
+    form_new_csv.InputConnect('parts', 'out.csv')
+    with open(tmp_path / 'out.csv', encoding='utf-8') as file:
+        return list(csv.reader(file))
+
+
+def test_converts_partitions(write_csv, tmp_path, monkeypatch):
+    rows = convert(write_csv, tmp_path, monkeypatch, ['2021-03', '2022-01'])
+    assert rows[0] == form_new_csv.DataSet.columns
+    assert sorted(r[1] for r in rows[1:]) == ['9000.0']
+
+
+def test_all_partitions_pruned(write_csv, tmp_path, monkeypatch, capsys):
+    assert convert(write_csv, tmp_path, monkeypatch, ['2003-01', '2003-02']) == [form_new_csv.DataSet.columns]
+    assert 'Нет партиций, подходящих под запрос' in capsys.readouterr().out.splitlines()
@@ -0,0 +1,66 @@
+import json
+import os
+
+from conftest import make_row
+from manifest import BLOOM_VERSION, MANIFEST_NAME, Manifest, list_partitions, scan_partition
+from year_splitter import RawDataSet
+
+
+def split(path, directory):
+    dataset = RawDataSet(path)
+    dataset.split(directory)
+    return Manifest.load(directory)
+
+
+def test_bloom_keeps_every_crlf_skill(write_csv, tmp_path):
+    path = write_csv('v.csv', [make_row(skills='Python\nSQL\nGit', published='2022-01-02T10:00:00+0300'),
+                               make_row(skills='Excel', published='2021-01-02T10:00:00+0300')])
+    directory = str(tmp_path / 'parts')
+    split(path, directory)
+    selected, skipped = list_partitions(directory, contains={'key_skills': ['Python', 'SQL']})
+    assert [os.path.basename(f) for f, _ in selected] == ['2022.csv'] and skipped == 1
+
+
+def test_stale_blooms_are_dropped_and_rebuilt(write_csv, tmp_path):
+    path = write_csv('v.csv', [make_row(skills='Python\nSQL', area='Казань')])
+    directory = str(tmp_path / 'parts')
+    split(path, directory)
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    with open(manifest_path, encoding='utf-8') as file:
+        data = json.load(file)
+    del data['bloom_version']
+    with open(manifest_path, mode='w', encoding='utf-8') as file:
+        json.dump(data, file)
+
+    manifest = Manifest.load(directory)
+    assert manifest.stale_blooms == {'2022'}
+    assert manifest.partitions['2022'].may_contain('area_name', 'Москва')
+    manifest.rebuild_blooms()
+    assert not manifest.partitions['2022'].may_contain('area_name', 'Москва')
+    assert manifest.partitions['2022'].may_contain('key_skills', ['Python', 'SQL'])
+    manifest.save()
+    assert Manifest.load(directory).stale_blooms == set()
+    with open(manifest_path, encoding='utf-8') as file:
+        assert json.load(file)['bloom_version'] == BLOOM_VERSION
+
+
+def test_list_partitions_without_manifest(write_csv, tmp_path):
+    write_csv('parts/2021.csv', [make_row()])
+    write_csv('parts/_level0/segment.csv', [make_row()])
+    selected, skipped = list_partitions(str(tmp_path / 'parts'), contains={'area_name': 'Казань'})
+    assert [os.path.basename(f) for f, _ in selected] == ['2021.csv'] and skipped == 0
+
+
+def test_scan_partition(write_csv):
+    path = write_csv('2022.csv', [make_row(published='2022-02-01T10:00:00+0300'),
+                                  make_row(published='2022-01-01T10:00:00+0300', salary_from=''),
+                                  make_row()[:5]])
+    stats = scan_partition(path, '2022.csv')
+    assert (stats.rows, stats.sorted, stats.salary_min) == (2, False, 100.0)
+    assert stats.may_contain('key_skills', ['SQL']) and stats.size == os.path.getsize(path)
+    assert scan_partition(path, '2022.csv', lambda header: lambda row: row[-1].startswith('2021')) is None
+
+
+def test_empty_file(write_csv):
+    stats = scan_partition(write_csv('empty.csv', [], header=None), 'empty.csv')
+    assert stats.rows == 0 and not stats.may_match()
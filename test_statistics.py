@@ -0,0 +1,95 @@
+import gzip
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip('matplotlib')
+pytest.importorskip('pdfkit')
+
+from conftest import make_row
+from statistics import DataSet, StatisticState
+
+
+def rows(count, salary='100', year=2022):
+    return [make_row(name='Аналитик данных', salary_from=salary, published='{0}-01-02T10:00:00+0300'.format(year))
+            for _ in range(count)]
+
+
+def get_statistic(path, state_path=None):
+    dataset = DataSet(path, 'Аналитик')
+    if state_path is None: return dataset.get_statistic().to_dict()
+    state = StatisticState.load(state_path, 'Аналитик')
+    statistic = dataset.get_statistic(state).to_dict()
+    state.save()
+    return statistic
+
+
+def append(path, source_path):
+    with open(source_path, mode='rb') as source:
+        source.readline()
+        data = source.read()
+    with open(path, mode='ab') as file:
+        file.write(data)
+
+
+def test_incremental_reads_appended_rows(write_csv, tmp_path):
+    path = write_csv('v.csv', rows(3))
+    state_path = str(tmp_path / 'v.json')
+    assert get_statistic(path, state_path) == get_statistic(path)
+    append(path, write_csv('more.csv', rows(2, salary='300', year=2023)))
+    assert get_statistic(path, state_path) == get_statistic(path)
+    offset = StatisticState.load(state_path, 'Аналитик').sources[path]['offset']
+    assert offset == os.path.getsize(path)
+
+
+def test_edited_prefix_forces_rescan(write_csv, tmp_path):
+    path = write_csv('v.csv', rows(100))
+    state_path = str(tmp_path / 'v.json')
+    get_statistic(path, state_path)
+    with open(path, mode='rb') as file:
+        data = file.read()
+    with open(path, mode='wb') as file:
+        file.write(data.replace(b',100,', b',900,', 1))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    state = StatisticState.load(state_path, 'Аналитик')
+    assert not state.is_valid()
+    assert get_statistic(path, state_path) == get_statistic(path)
+
+
+def test_unchanged_file_is_not_rehashed(write_csv, tmp_path, monkeypatch):
+    path = write_csv('v.csv', rows(3))
+    state_path = str(tmp_path / 'v.json')
+    get_statistic(path, state_path)
+    monkeypatch.setattr(StatisticState, 'get_checksum', staticmethod(lambda *args: pytest.fail('rehashed')))
+    assert StatisticState.load(state_path, 'Аналитик').is_valid()
+
+
+def test_partial_record_waits_for_next_run(write_csv, tmp_path):
+    path = write_csv('v.csv', rows(2))
+    state_path = str(tmp_path / 'v.json')
+    complete = os.path.getsize(path)
+    with open(path, mode='ab') as file:
+        file.write('Аналитик,"<p>1\r\n'.encode('utf-8'))
+    get_statistic(path, state_path)
+    assert StatisticState.load(state_path, 'Аналитик').sources[path]['offset'] == complete
+
+
+def test_compressed_and_old_state(write_csv, tmp_path):
+    source = write_csv('v.csv', rows(3))
+    path = str(tmp_path / 'v.csv.gz')
+    with open(source, mode='rb') as file, gzip.open(path, mode='wb') as compressed:
+        shutil.copyfileobj(file, compressed)
+    state_path = str(tmp_path / 'v.json')
+    assert get_statistic(path, state_path) == get_statistic(source)
+
+    state = StatisticState.load(state_path, 'Аналитик')
+    del state.sources[path]['mtime_ns']
+    assert not state.is_valid()
+
+
+def test_empty_file(write_csv, tmp_path):
+    path = write_csv('v.csv', [], header=None)
+    assert get_statistic(path, str(tmp_path / 'v.json')) == get_statistic(path)
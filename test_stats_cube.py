@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+pytest.importorskip('matplotlib')
+pytest.importorskip('pdfkit')
+
+from conftest import make_row
+from stats_cube import AggregateCube
+
+
+def sample_rows():
+    names = ['Аналитик данных', 'Python разработчик', 'Ведущий аналитик\nданных', 'Аналитик', 'Тестировщик']
+    areas = ['Москва', 'Казань', 'Санкт-Петербург']
+    return [make_row(name=names[i % 5], area=areas[i % 3], salary_from=str(1000 * (i % 7)),
+                     salary_to=str(1000 * (i % 7) + 500 * (i % 4)),
+                     published='{0}-03-04T10:00:00+0300'.format(2018 + i % 4)) for i in range(80)]
+
+
+def get_stats(statistics):
+    return (statistics.get_stat1(), statistics.get_stat2(), statistics.get_stat3(), statistics.get_stat4(),
+            statistics.get_stat5and6())
+
+
+@pytest.fixture
+def cube(write_csv):
+    cube = AggregateCube(write_csv('v.csv', sample_rows()))
+    cube.build(2)
+    cube.save()
+    return AggregateCube.load(cube.file_name)
+
+
+@pytest.mark.parametrize('vacancy_name, areas', [('Аналитик данных', None), ('Python разработчик', {'Казань'}),
+                                                 ('аналитик  данных', None), ('Java', {'Москва', 'Казань'})])
+def test_query_is_answered_from_cube(cube, monkeypatch, vacancy_name, areas):
+    expected = get_stats(cube.scan(vacancy_name, areas))
+    monkeypatch.setattr(AggregateCube, 'scan', lambda *args: pytest.fail('scanned'))
+    assert get_stats(cube.query(vacancy_name, areas)) == expected
+
+
+def test_multi_word_query_matches_names(cube):
+    assert cube.query('Аналитик данных').get_stat4() == {2018: 4, 2019: 4, 2020: 4, 2021: 4}
+    assert cube.query('аналитик\nданных').get_stat4() == {2018: 4, 2019: 4, 2020: 4, 2021: 4}
+    assert cube.query('Ведущий аналитик данных').get_stat2() == {2018: 20, 2019: 20, 2020: 20, 2021: 20}
+
+
+def test_stale_cube_falls_back_to_scan(cube, write_csv):
+    path = cube.file_name
+    with open(write_csv('more.csv', [make_row(name='Аналитик данных', published='2023-01-02T10:00:00+0300')]),
+              mode='rb') as file:
+        file.readline()
+        appended = file.read()
+    with open(path, mode='ab') as file:
+        file.write(appended)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert not cube.is_fresh() and AggregateCube.load(path) is None
+    assert cube.query('Аналитик данных').get_stat4()[2023] == 1
+    assert get_stats(cube.query('Аналитик данных')) == get_stats(cube.scan('Аналитик данных'))
@@ -0,0 +1,201 @@
+import os
+
+import pytest
+
+from conftest import make_row
+
+pytest.importorskip('prettytable')
+pytest.importorskip('openpyxl')
+import vacancies  # noqa: E402
+import vacancy_store  # noqa: E402
+from year_splitter import RawDataSet  # noqa: E402
+
+
+def read(path, filters=(), sort='', reverse=False, slice_num=()):
+    data = vacancies.DataSet(path, [list(f) for f in filters], sort, reverse, list(slice_num))
+    data.csv_reader()
+    data.filtering()
+    data.sorting()
+    data.get_range()
+    return data.vacancies_objects
+
+
+def test_crlf_skills_filter_on_partitions(write_csv, tmp_path):
+    path = write_csv('v.csv', [make_row(skills='Python\nSQL', published='2022-01-02T10:00:00+0300'),
+                               make_row(skills='Git', published='2021-01-02T10:00:00+0300')])
+    directory = str(tmp_path / 'parts')
+    RawDataSet(path).split(directory)
+    assert [v['key_skills'] for v in read(directory, [('Навыки', 'Python')])] == ['Python\nSQL']
+
+
+def test_all_partitions_pruned(write_csv, tmp_path, capsys):
+    path = write_csv('v.csv', [make_row(area='Москва')])
+    directory = str(tmp_path / 'parts')
+    RawDataSet(path).split(directory)
+    with pytest.raises(SystemExit):
+        read(directory, [('Название региона', 'Казань')])
+    assert capsys.readouterr().out.splitlines()[-1] == 'Ничего не найдено'
+
+
+def sort_rows():
+    names = ['Аналитик', 'Программист', 'Тестировщик']
+    return [make_row(name=names[i % 3], salary_from=str(100 * (i % 4)), salary_to=str(100 * (i % 4) + 100),
+                     employer='Компания {0}'.format(i), published='2022-01-{0:02}T10:00:00+0300'.format(i % 28 + 1))
+            for i in range(300)]
+
+
+@pytest.mark.parametrize('sort, reverse', [('Оклад', False), ('Оклад, Название', False),
+                                           ('Оклад, Название', True), ('Название, Дата публикации вакансии', True)])
+def test_external_sort_matches_sorted(write_csv, tmp_path, monkeypatch, sort, reverse):
+    path = write_csv('v.csv', sort_rows())
+    expected = [v.values for v in read(path, sort=sort, reverse=reverse)]
+    monkeypatch.setattr(vacancies.DataSet, 'sort_memory', None)
+    assert [v.values for v in read(path, sort=sort, reverse=reverse)] == expected
+
+    directories = []
+    mkdtemp = vacancies.tempfile.mkdtemp
+    monkeypatch.setattr(vacancies.tempfile, 'mkdtemp', lambda **kwargs: directories.append(1) or mkdtemp(**kwargs))
+    monkeypatch.setattr(vacancies.tempfile, 'tempdir', str(tmp_path))
+    monkeypatch.setattr(vacancies.DataSet, 'sort_memory', 1 << 14)
+    assert [v.values for v in read(path, sort=sort, reverse=reverse)] == expected
+    assert directories == [1]
+    assert not [name for name in tmp_path.iterdir() if name.name.startswith('vacancies_sort_')]
+
+
+def test_external_sort_in_memory_and_single_process(write_csv):
+    data = vacancies.DataSet(write_csv('v.csv', sort_rows()), [], 'Оклад', True, [])
+    data.csv_reader()
+    rows = list(data.vacancies_objects)
+    expected = [v.values for v in sorted(rows, key=lambda v: v.salary_average, reverse=True)]
+    data.sort_memory = 1 << 20
+    assert isinstance(data.external_sort(iter(rows), ['salary_average'], processes=64), list)
+    data.sort_memory = 1 << 14
+    result = data.external_sort(iter(rows), ['salary_average'], processes=1)
+    assert [v.values for v in result] == expected
+    assert data.external_sort(iter([]), ['salary_average']) == []
+
+
+def start_session(path, monkeypatch):
+    monkeypatch.setattr('builtins.input', lambda prompt: 'Выход')
+    return vacancies.InputSession(path)
+
+
+def table_rows(path, filters=(), sort='', reverse=False, slice_num=()):
+    data = vacancies.DataSet(path, [list(f) for f in filters], sort, reverse, list(slice_num))
+    data.csv_reader()
+    data.filtering()
+    data.sorting()
+    data.get_range()
+    return data.get_rows()
+
+
+def test_session_matches_one_shot_queries(write_csv, monkeypatch):
+    path = write_csv('v.csv', sort_rows())
+    session = start_session(path, monkeypatch)
+    assert session.query() == table_rows(path)
+    for command in ('Фильтр: Название: Программист', 'Сортировка: Оклад, Компания', 'Обратный порядок: Да',
+                    'Диапазон: 3 12', 'Столбцы: Название, Оклад'):
+        assert session.run_command(command)
+    expected = table_rows(path, [('Название', 'Программист')], 'Оклад, Компания', True, (2, 11))
+    assert session.query() == expected and len(expected) == 9
+
+    assert session.run_command('Уточнить: Оклад: 250')
+    assert session.filter_params == [['Название', 'Программист'], ['Оклад', '250']]
+    assert session.query() == table_rows(path, session.filter_params, 'Оклад, Компания', True, (2, 11))
+    assert session.run_command('Фильтр: Оклад: 250')
+    assert session.query() == table_rows(path, [('Оклад', '250')], 'Оклад, Компания', True, (2, 11))
+
+
+def test_session_refines_cached_result(write_csv, monkeypatch):
+    path = write_csv('v.csv', sort_rows())
+    session = start_session(path, monkeypatch)
+    session.run_command('Фильтр: Название: Аналитик')
+    session.query()
+    base = session.results[(('Название', 'Аналитик'),)]
+    checked = []
+    predicate = vacancies.DataSet.get_predicate
+    monkeypatch.setattr(vacancies.DataSet, 'get_predicate',
+                        lambda self, filters: (lambda p: lambda v: checked.append(v) or p(v))(predicate(self, filters)))
+    session.run_command('Уточнить: Оклад: 50')
+    session.query()
+    assert len(checked) == len(base) == 100
+
+    session.cache_size = 2
+    session.run_command('Фильтр: Название: Тестировщик')
+    session.query()
+    assert list(session.results) == [(('Название', 'Аналитик'), ('Оклад', '50')), (('Название', 'Тестировщик'),)]
+
+
+def test_session_rejects_bad_commands(write_csv, monkeypatch, capsys):
+    path = write_csv('v.csv', sort_rows())
+    session = start_session(path, monkeypatch)
+    for command in ('Фильтр: Оклад: много', 'Фильтр: Город: Москва', 'Сортировка: Город', 'Диапазон: а', 'Поиск: 1'):
+        assert not session.run_command(command)
+    assert (session.filter_params, session.sort_params, session.slice_num) == ([], '', [])
+    assert capsys.readouterr().out.splitlines()[1:] == ['Формат ввода некорректен', 'Параметр поиска некорректен',
+                                                         'Параметр сортировки некорректен', 'Формат ввода некорректен',
+                                                         'Неизвестная команда']
+
+
+def test_session_empty_file_and_store(write_csv, tmp_path, monkeypatch, capsys):
+    with pytest.raises(SystemExit):
+        start_session(write_csv('empty.csv', []), monkeypatch)
+    assert capsys.readouterr().out.splitlines() == ['Нет данных']
+
+    path = write_csv('v.csv', sort_rows())
+    db_name = str(tmp_path / 'v.db')
+    store = vacancy_store.VacancyStore(db_name)
+    store.load(path)
+    store.close()
+    session = start_session(db_name, monkeypatch)
+    assert session.vacancies is None
+    session.run_command('Фильтр: Название: Тестировщик')
+    session.run_command('Диапазон: 1 4')
+    assert session.query() == table_rows(path, [('Название', 'Тестировщик')], slice_num=(0, 3))
+
+
+def run_connect(monkeypatch, answers):
+    answers = iter(answers)
+    monkeypatch.setattr('builtins.input', lambda prompt: next(answers))
+    vacancies.InputConnect()
+
+
+def test_hidden_columns_keep_row_height(write_csv, monkeypatch, capsys):
+    path = write_csv('v.csv', [make_row(skills='Python\nSQL\nGit'), make_row(name='Тестировщик', skills='Git')])
+    run_connect(monkeypatch, [path, '', '', '', '', 'Название'])
+    assert capsys.readouterr().out.splitlines() == [
+        '+---+-------------+',
+        '| № | Название    |',
+        '+---+-------------+',
+        '| 1 | Аналитик    |',
+        '|   |             |',
+        '|   |             |',
+        '+---+-------------+',
+        '| 2 | Тестировщик |',
+        '|   |             |',
+        '+---+-------------+',
+    ]
+
+
+@pytest.mark.parametrize('columns', ['', 'Название', 'Навыки, Премиум-вакансия'])
+def test_streamed_table_matches_pretty_table(write_csv, monkeypatch, capsys, columns):
+    path = write_csv('v.csv', [make_row(skills='Python\nSQL\nGit'), make_row(name='Тестировщик', skills='Git'),
+                               make_row(name='Ведущий аналитик данных', description='<p>Очень длинное описание</p>')])
+    run_connect(monkeypatch, [path, '', '', '', '', columns])
+    table = capsys.readouterr().out.splitlines()
+    monkeypatch.setattr(vacancies.InputConnect, 'stream_rows', 2)
+    monkeypatch.setattr(vacancies.InputConnect, 'stream_index_width', 1)
+    run_connect(monkeypatch, [path, '', '', '', '', columns])
+    notice, *streamed = capsys.readouterr().out.splitlines()
+    assert notice.startswith('Вакансий больше 2: таблица выводится построчно') and streamed == table
+
+
+def test_missing_and_empty_store(tmp_path, monkeypatch, capsys):
+    db_name = str(tmp_path / 'v.db')
+    with pytest.raises(SystemExit):
+        run_connect(monkeypatch, [db_name, '', '', '', '', ''])
+    assert not os.path.exists(db_name)
+    vacancy_store.VacancyStore(db_name).close()
+    with pytest.raises(SystemExit):
+        run_connect(monkeypatch, [db_name, '', '', '', '', ''])
+    assert capsys.readouterr().out.splitlines() == ['Нет базы данных', 'Нет данных']
@@ -0,0 +1,203 @@
+import gzip
+import os
+import random
+import shutil
+
+import pytest
+
+from conftest import make_row
+
+pytest.importorskip('prettytable')
+pytest.importorskip('openpyxl')
+import vacancies  # noqa: E402
+import vacancy_index  # noqa: E402
+from vacancy_index import BitmapIndex, IntervalIndex, RowIndex, SkillIndex, SortIndex  # noqa: E402
+
+
+def sample_rows():
+    """Вакансии с многострочными полями, повторяющимися ключами и пропусками"""
+    names = ['Аналитик', '<b>Программист</b>', 'Тестировщик', 'Аналитик данных']
+    areas = ['Москва', 'Казань', 'Санкт-Петербург']
+    skills = ['Python\nSQL', 'Git', 'SQL\nExcel\nGit', 'Python\nGit']
+    experiences = ['noExperience', 'between1And3', 'between3And6', 'moreThan6']
+    currencies = ['RUR', 'RUR', 'USD', 'EUR']
+    rows = []
+    for i in range(60):
+        rows.append(make_row(name=names[i % 4], skills=skills[i % 4], area=areas[i % 3], experience=experiences[i % 4],
+                             salary_from=str(1000 * (i % 7)), salary_to=str(1000 * (i % 7) + 500 * (i % 5)),
+                             currency=currencies[i % 4], premium=str(i % 6 == 0), employer='Компания ' + str(i % 9),
+                             published='2022-{0:02}-{1:02}T10:00:00+0300'.format(i % 12 + 1, i % 28 + 1),
+                             description='<p>Описание\nвакансии {0}</p>'.format(i % 5)))
+        if i % 11 == 0: rows.append(make_row(area=''))
+    return rows
+
+
+def scan(path, filters=(), sort='', reverse=False, slice_num=()):
+    data = vacancies.DataSet(path, [list(f) for f in filters], sort, reverse, list(slice_num))
+    data.csv_reader()
+    data.filtering()
+    data.sorting()
+    data.get_range()
+    return [(v.index, v.values) for v in data.vacancies_objects]
+
+
+def indexed(path, filters=(), sort='', reverse=False, slice_num=()):
+    data = vacancies.DataSet(path, [list(f) for f in filters], sort, reverse, list(slice_num))
+    data.index_reader()
+    return [(v.index, v.values) for v in data.vacancies_objects]
+
+
+def append(path, rows, write_csv):
+    with open(write_csv('more.csv', rows), mode='rb') as file:
+        file.readline()
+        data = file.read()
+    with open(path, mode='ab') as file:
+        file.write(data)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+@pytest.fixture
+def sample(write_csv):
+    path = write_csv('v.csv', sample_rows())
+    vacancy_index.InputConnect(path)
+    return path
+
+
+def test_row_index_offsets(sample):
+    index = RowIndex.load(sample)
+    rows = list(index.iter_rows())
+    assert len(index) == len(rows) == 60
+    assert list(index.read([59, 0, 7])) == [rows[59], rows[0], rows[7]]
+    assert rows[2]['key_skills'] == 'SQL\nExcel\nGit'
+
+
+@pytest.mark.parametrize('reverse, slice_num', [(False, ()), (False, (3, 9)), (True, (55,)), (True, (2, 2))])
+def test_row_index_slices_match_scan(sample, reverse, slice_num):
+    assert indexed(sample, reverse=reverse, slice_num=slice_num) == scan(sample, reverse=reverse, slice_num=slice_num)
+
+
+def test_stale_row_index_is_rebuilt(sample, write_csv):
+    append(sample, [make_row(name='Новая вакансия')], write_csv)
+    assert RowIndex.load(sample) is None
+    assert indexed(sample, slice_num=(59,)) == scan(sample, slice_num=(59,))
+    assert len(RowIndex.load(sample)) == 61
+
+
+def test_row_index_empty_and_compressed(write_csv, capsys):
+    path = write_csv('v.csv', [])
+    with pytest.raises(SystemExit):
+        indexed(path)
+    path = write_csv('empty.csv', [], header=None)
+    with pytest.raises(SystemExit):
+        indexed(path)
+    assert capsys.readouterr().out.splitlines() == ['Нет данных', 'Пустой файл']
+
+    path = write_csv('v.csv', sample_rows())
+    with open(path, mode='rb') as file, gzip.open(path + '.gz', mode='wb') as compressed:
+        shutil.copyfileobj(file, compressed)
+    assert RowIndex.supports(path) and not RowIndex.supports(path + '.gz')
+
+
+@pytest.mark.parametrize('sort', list(vacancies.DataSet.translate_list) + ['Оклад, Название', 'Опыт работы, Компания'])
+@pytest.mark.parametrize('reverse, slice_num', [(False, ()), (True, ()), (True, (4, 20))])
+def test_sort_index_matches_scan(sample, sort, reverse, slice_num):
+    assert indexed(sample, sort=sort, reverse=reverse, slice_num=slice_num) == \
+        scan(sample, sort=sort, reverse=reverse, slice_num=slice_num)
+
+
+def test_sort_index_with_filters(sample):
+    filters = [('Название региона', 'Москва'), ('Компания', 'Компания 3')]
+    for sort in ('Оклад', 'Название, Дата публикации вакансии'):
+        assert indexed(sample, filters, sort, True) == scan(sample, filters, sort, True)
+
+
+def test_stale_sort_index_is_rebuilt(sample, write_csv):
+    append(sample, [make_row(salary_from='999999', salary_to='999999')], write_csv)
+    assert SortIndex.load(RowIndex.open(sample)) is None
+    assert indexed(sample, sort='Оклад', reverse=True, slice_num=(0, 3)) == \
+        scan(sample, sort='Оклад', reverse=True, slice_num=(0, 3))
+    assert SortIndex.load(RowIndex.load(sample)) is not None
+
+    os.remove(SortIndex.get_path(sample))
+    assert SortIndex.open(RowIndex.load(sample), vacancies.Vacancy) is None
+    assert indexed(sample, sort='Оклад') == scan(sample, sort='Оклад')
+
+
+@pytest.mark.parametrize('filters', [
+    [('Опыт работы', 'От 1 года до 3 лет')],
+    [('Опыт работы', 'Нет опыта'), ('Премиум-вакансия', 'Да'), ('Название региона', 'Москва'),
+     ('Идентификатор валюты оклада', 'Рубли')],
+    [('Название региона', 'Казань'), ('Компания', 'Компания 4'), ('Название', 'Программист')],
+    [('Название региона', 'Омск')],
+])
+def test_bitmap_index_matches_scan(sample, filters):
+    assert indexed(sample, filters) == scan(sample, filters)
+    assert indexed(sample, filters, 'Оклад', True, (1, 5)) == scan(sample, filters, 'Оклад', True, (1, 5))
+
+
+def test_bitmap_select_leaves_other_filters(sample):
+    bitmap_index = BitmapIndex.load(RowIndex.load(sample), vacancies.DataSet.bitmap_columns)
+    bits, rest = bitmap_index.select([['Премиум-вакансия', 'Да'], ['Компания', 'Компания 0']])
+    assert list(vacancy_index.iter_bits(bits)) == list(range(0, 60, 6)) and rest == [['Компания', 'Компания 0']]
+    assert bitmap_index.select([['Название региона', 'Омск']], bits)[0] == 0
+
+
+def test_stale_bitmap_index_is_rebuilt(sample, write_csv):
+    columns = vacancies.DataSet.bitmap_columns
+    append(sample, [make_row(area='Омск')], write_csv)
+    assert BitmapIndex.load(RowIndex.open(sample), columns) is None
+    assert indexed(sample, [('Название региона', 'Омск')]) == scan(sample, [('Название региона', 'Омск')])
+    assert BitmapIndex.load(RowIndex.load(sample), columns) is not None
+    assert BitmapIndex.load(RowIndex.load(sample), {'Название региона': columns['Название региона']}) is None
+
+
+@pytest.mark.parametrize('filters', [
+    [('Оклад', '3000')], [('Оклад', '0')], [('Диапазон оклада', '2500 - 4100')], [('Диапазон оклада', '9000 - 9500')],
+    [('Диапазон оклада', '1000 - 6000'), ('Название региона', 'Москва'), ('Навыки', 'Git')],
+])
+def test_interval_index_matches_scan(sample, filters):
+    assert indexed(sample, filters) == scan(sample, filters)
+    assert indexed(sample, filters, 'Оклад, Компания', True) == scan(sample, filters, 'Оклад, Компания', True)
+
+
+def test_interval_query_matches_brute_force():
+    generator = random.Random(1)
+    intervals = [(low, low + generator.randrange(0, 300)) for low in (generator.randrange(-50, 1000) for _ in range(700))]
+    interval_index = IntervalIndex('test.csv')
+    interval_index.build_intervals(intervals)
+    for _ in range(300):
+        low = generator.randrange(-100, 1400)
+        high = low + generator.choice([0, 1, 50, 700])
+        assert interval_index.query(low, high) == [n for n, (a, b) in enumerate(intervals) if a <= high and low <= b]
+    interval_index.build_intervals([])
+    assert interval_index.query(0, 10 ** 9) == []
+
+
+def test_stale_interval_index_is_rebuilt(sample, write_csv):
+    append(sample, [make_row(salary_from='70000', salary_to='80000')], write_csv)
+    assert IntervalIndex.load(RowIndex.open(sample)) is None
+    assert indexed(sample, [('Оклад', '75000')]) == scan(sample, [('Оклад', '75000')]) != []
+    assert IntervalIndex.load(RowIndex.load(sample)) is not None
+
+
+@pytest.mark.parametrize('filters', [
+    [('Навыки', 'Excel')], [('Навыки', 'Git, Python')], [('Навыки', 'SQL'), ('Навыки', 'Git')],
+    [('Навыки', 'Git, Java')], [('Навыки', 'Python'), ('Премиум-вакансия', 'Да'), ('Оклад', '1000')],
+])
+def test_skill_index_matches_scan(sample, filters):
+    assert indexed(sample, filters) == scan(sample, filters)
+    assert indexed(sample, filters, 'Навыки', True, (0, 4)) == scan(sample, filters, 'Навыки', True, (0, 4))
+
+
+def test_skill_frequencies(sample):
+    skill_index = SkillIndex.load(RowIndex.load(sample))
+    assert skill_index.get_frequencies() == [('Git', 45), ('Python', 30), ('SQL', 30), ('Excel', 15)]
+    assert skill_index.get_postings('SQL\r') == skill_index.get_postings('Java') == vacancy_index.array('I')
+
+
+def test_stale_skill_index_is_rebuilt(sample, write_csv):
+    append(sample, [make_row(skills='Java\nKotlin')], write_csv)
+    assert SkillIndex.load(RowIndex.open(sample)) is None
+    assert indexed(sample, [('Навыки', 'Kotlin')]) == scan(sample, [('Навыки', 'Kotlin')]) != []
+    assert SkillIndex.load(RowIndex.load(sample)).get_frequencies(1) == [('Git', 45)]
@@ -0,0 +1,53 @@
+import gzip
+import shutil
+import sqlite3
+
+import pytest
+
+from conftest import make_row
+from vacancy_store import InputConnect, VacancyStore
+
+
+def test_reload_replaces_rows(write_csv, tmp_path):
+    path = write_csv('v.csv', [make_row(), make_row(name='Тестировщик', area='Казань')])
+    db_name = str(tmp_path / 'v.db')
+    store = VacancyStore(db_name)
+    assert store.load(path) == 2 and store.load(path) == 2
+    assert store.count() == 2
+    store.close()
+    InputConnect(path, db_name)
+    store = VacancyStore(db_name)
+    assert store.count() == 2
+    assert [v['name'] for _, v in store.get_vacancies([['Название региона', 'Казань']], '', False, [])] == \
+        ['Тестировщик']
+    store.close()
+
+
+def test_crlf_and_compressed_input(write_csv, tmp_path):
+    path = write_csv('v.csv', [make_row(skills='Python\nSQL')])
+    with open(path, mode='rb') as source, gzip.open(path + '.gz', mode='wb') as target:
+        shutil.copyfileobj(source, target)
+    store = VacancyStore(':memory:')
+    assert store.load(path + '.gz') == 1
+    assert store.get_vacancies([['Навыки', 'Python, SQL']], '', False, [])[0][1]['key_skills'] == 'Python\nSQL'
+
+
+def test_empty_input(write_csv):
+    store = VacancyStore(':memory:')
+    assert store.load(write_csv('v.csv', [])) == 0 and store.count() == 0
+
+
+def test_open_does_not_create_database(write_csv, tmp_path):
+    db_name = str(tmp_path / 'v.db')
+    assert VacancyStore.open(db_name) is None and not tmp_path.joinpath('v.db').exists()
+    sqlite3.connect(db_name).close()
+    assert VacancyStore.open(db_name).count() == 0
+
+    store = VacancyStore(db_name)
+    store.load(write_csv('v.csv', [make_row()]))
+    store.close()
+    store = VacancyStore.open(db_name)
+    assert store.count() == 1
+    with pytest.raises(sqlite3.OperationalError):
+        store.load(write_csv('v.csv', [make_row()]))
+    store.close()
@@ -0,0 +1,59 @@
+import gzip
+import os
+import shutil
+
+import pytest
+
+import year_splitter
+from conftest import make_row
+from year_splitter import DataSet, RawDataSet
+
+
+def sample_rows():
+    return [make_row(name='Аналитик {0}'.format(i), skills='Python\nSQL' if i % 2 else 'Git',
+                     description='<p>"Кавычки", запятые\nи переводы строк</p>' if i % 3 else '<p>Описание</p>',
+                     published='{0}-01-02T10:00:00+0300'.format(2018 + i % 3)) for i in range(60)]
+
+
+def read_partitions(directory):
+    result = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.csv'):
+            with open(os.path.join(directory, name), mode='rb') as file:
+                result[name] = file.read()
+    return result
+
+
+@pytest.fixture
+def expected(write_csv, tmp_path):
+    dataset = DataSet(write_csv('v.csv', sample_rows()))
+    dataset.csv_reader()
+    dataset.export_csv(str(tmp_path / 'old'))
+    return read_partitions(str(tmp_path / 'old'))
+
+
+@pytest.mark.parametrize('processes', [1, 3])
+def test_passthrough_matches_csv_split(expected, tmp_path, processes):
+    RawDataSet(str(tmp_path / 'v.csv')).split(str(tmp_path / 'new'), processes)
+    partitions = read_partitions(str(tmp_path / 'new'))
+    assert list(partitions) == ['2018.csv', '2019.csv', '2020.csv'] and partitions == expected
+    assert b'"Python\r\nSQL"' in partitions['2019.csv']
+    assert not [name for name in os.listdir(tmp_path / 'new') if '.part' in name]
+
+
+def test_compressed_input_matches_csv_split(expected, tmp_path):
+    with open(tmp_path / 'v.csv', mode='rb') as file, gzip.open(tmp_path / 'v.csv.gz', mode='wb') as compressed:
+        shutil.copyfileobj(file, compressed)
+    dataset = RawDataSet(str(tmp_path / 'v.csv.gz'))
+    assert dataset.get_processes() == 1
+    dataset.split(str(tmp_path / 'new'), 4)
+    assert read_partitions(str(tmp_path / 'new')) == expected
+
+
+def test_small_file_is_split_in_one_process(expected, tmp_path, monkeypatch):
+    monkeypatch.setattr(year_splitter.multiprocessing, 'Pool', lambda *args: pytest.fail('pool started'))
+    year_splitter.InputConnect(str(tmp_path / 'v.csv'), str(tmp_path / 'new'))
+    assert read_partitions(str(tmp_path / 'new')) == expected
+
+    monkeypatch.setattr(RawDataSet, 'parallel_size', 0)
+    assert RawDataSet(str(tmp_path / 'v.csv')).get_processes() == year_splitter.multiprocessing.cpu_count()
@@ -1,8 +1,26 @@
 import csv
+import heapq
+import itertools
+import multiprocessing
+import os
+import pickle
 import re
+import shutil
+import sys
+import tempfile
+from collections import OrderedDict, deque
 from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter, itemgetter
 from prettytable import PrettyTable
 
+from compression import get_compressor, open_file
+from manifest import list_partitions
+from raw_csv import iter_range, parse_header, record_ranges
+from table_writer import TableWriter, get_exporter
+from vacancy_index import BitmapIndex, IntervalIndex, RowIndex, SkillIndex, SortIndex, iter_bits
+from vacancy_store import VacancyStore
+
 
 class Salary:
     """Класс для представления зарплаты
@@ -75,10 +93,61 @@ class Salary:
                                                   self.salary_gross).replace(',', ' ')
 
 
+def intern(value):
+    """Интернирует строку, чтобы одинаковые значения разных вакансий хранились один раз
+
+    :param value: Значение поля
+    :return: То же значение (строки - из общей таблицы)
+    """
+    return sys.intern(value) if type(value) is str else value
+
+
+class cached_slot:
+    """Вычисляемый при первом обращении атрибут, как functools.cached_property,
+    но для классов со __slots__: значение хранится в слоте '_' + имя атрибута
+    """
+    def __init__(self, function):
+        """
+        :param function: Функция, вычисляющая значение
+        """
+        self.function = function
+        self.__doc__ = function.__doc__
+        self.slot = None
+
+    def __set_name__(self, owner, name):
+        """Находит слот атрибута в классе
+
+        :param type owner: Класс
+        :param str name: Имя атрибута
+        """
+        self.slot = owner.__dict__['_' + name]
+
+    def __get__(self, instance, owner=None):
+        """Значение атрибута: из слота или, при первом обращении, вычисленное
+
+        :param instance: Объект (None при обращении через класс)
+        :param type owner: Класс
+        """
+        if instance is None: return self
+        try:
+            return self.slot.__get__(instance, owner)
+        except AttributeError:
+            value = self.function(instance)
+            self.slot.__set__(instance, value)
+            return value
+
+
 class Vacancy:
     """Класс для представления вакансии
 
+    Хранит сырые поля строки кортежем в порядке raw_fields (строки интернированы, поэтому
+    повторяющиеся города, работодатели, валюты и т.п. хранятся по одному разу). Экземпляры
+    без __dict__ (__slots__). Ключи сортировки, которые дорого считать, вычисляются при первом
+    обращении и запоминаются, остальные атрибуты (объект зарплаты, строки для вывода)
+    вычисляются при каждом обращении - они нужны только для показанных вакансий.
+
     Attributes:
+        values (tuple): Сырые поля вакансии в порядке raw_fields
         index (int): Идентификатор
         name (str): Название вакансии
         description (str): Описание вакансии
@@ -94,9 +163,15 @@ class Vacancy:
         published_str (str): Дата публикации в строковом представлении
         published_at (datetime): Дата публикации
     """
+    __slots__ = ('values', 'index', '_name', '_description', '_skills_len', '_salary_average')
 
     fields = ['index', 'name', 'description', 'key_skills', 'experience_id',
               'premium', 'employer_name', 'salary', 'area_name', 'published_at']
+    raw_fields = ['name', 'description', 'key_skills', 'experience_id', 'premium', 'employer_name',
+                  'salary_from', 'salary_to', 'salary_gross', 'salary_currency', 'area_name', 'published_at']
+    positions = {field: i for i, field in enumerate(raw_fields)}
+    get_salary = itemgetter(raw_fields.index('salary_from'), raw_fields.index('salary_to'),
+                            raw_fields.index('salary_currency'))
     exp_weight = {
         'Нет опыта': 1,
         'От 1 года до 3 лет': 2,
@@ -110,17 +185,20 @@ class Vacancy:
         'moreThan6': 'Более 6 лет',
     }
 
-    def __init__(self, vacancy):
+    def __init__(self, vacancy, values=None):
         """Конструктор объекта вакансий
 
-        :param dict vacancy: Словарь вакансии
+        :param dict vacancy: Словарь вакансии (None, если заданы values)
+        :param tuple values: Сырые поля в порядке raw_fields
 
         >>> Vacancy({'test_data': True}).experience_id
         'Нет опыта'
         >>> Vacancy({'test_data': True}).premium
         'Да'
+        >>> Vacancy({'test_data': True})['salary_currency']
+        'RUR'
         """
-        if 'test_data' in vacancy.keys():
+        if values is None and 'test_data' in vacancy.keys():
             vacancy = {
                 'name': 'Test',
                 'description': 'Test',
@@ -136,46 +214,125 @@ class Vacancy:
                 'published_at': datetime.now().strftime('%Y-%m-%dT%H:%M:%S')+'+0300',
             }
 
+        if values is None: values = tuple(map(vacancy.get, self.raw_fields))
+        try:
+            self.values = tuple(map(sys.intern, values))
+        except TypeError:
+            self.values = tuple(map(intern, values))
         self.index = 0
 
-        self.name = Cleaners.html_remove(vacancy['name'])
-        self.description = Cleaners.short_text(Cleaners.html_remove(vacancy['description']), 100)
+    @staticmethod
+    def get_values_getter(header):
+        """Функция, выбирающая сырые поля вакансии из строки CSV
 
-        self.skills = vacancy['key_skills'].split('\n')
-        self.skills_len = len(self.skills)
-        self.key_skills = Cleaners.short_text(vacancy['key_skills'], 100)
+        :param list header: Заголовок CSV
+        :return: Функция строка -> кортеж полей в порядке raw_fields (отсутствующие в файле - None)
 
-        self.experience_id = self.ru_exp[vacancy['experience_id']]
-        self.premium = 'Да' if vacancy['premium'].lower() == "true" else "Нет"
-        self.employer_name = vacancy['employer_name']
+        >>> Vacancy.get_values_getter(['area_name', 'name'])(['Москва', 'Аналитик'])[:2]
+        ('Аналитик', None)
+        """
+        indexes = [header.index(field) if field in header else None for field in Vacancy.raw_fields]
+        if None not in indexes: return itemgetter(*indexes)
+        return lambda row: tuple(row[i] if i is not None else None for i in indexes)
 
-        self.salary_obj = Salary(vacancy)
-        self.salary = str(self.salary_obj)
+    def __getitem__(self, field):
+        """Сырое поле вакансии (вакансию можно передавать в правила фильтров вместо словаря)
 
-        self.area_name = vacancy['area_name']
+        :param str field: Название поля
+        :return: Значение поля
+        """
+        return self.values[self.positions[field]]
+
+    @property
+    def vacancy(self):
+        """ :return dict: Сырые поля вакансии """
+        return dict(zip(self.raw_fields, self.values))
 
-        self.published_str = vacancy['published_at']
-        self.published_at = datetime.strptime(self.published_str, '%Y-%m-%dT%H:%M:%S%z').strftime("%d.%m.%Y")
+    @cached_slot
+    def name(self):
+        """ :return: Название вакансии """
+        return Cleaners.html_remove(self['name'])
+
+    @cached_slot
+    def description(self):
+        """ :return: Описание вакансии (без HTML, укороченное) """
+        return Cleaners.html_short(self['description'], 100)
 
     @property
+    def skills(self):
+        """ :return: Навыки в списковом представлении """
+        return self['key_skills'].split('\n')
+
+    @cached_slot
+    def skills_len(self):
+        """ :return: Количество навыков """
+        return len(self.skills)
+
+    @property
+    def key_skills(self):
+        """ :return: Навыки в строковом представлении (укороченные) """
+        return Cleaners.short_text(self['key_skills'], 100)
+
+    @property
+    def experience_id(self):
+        """ :return: Опыт работы """
+        return self.ru_exp[self['experience_id']]
+
+    @property
+    def premium(self):
+        """ :return: Премиум вакансия (Да / Нет) """
+        return 'Да' if self['premium'].lower() == "true" else "Нет"
+
+    @property
+    def employer_name(self):
+        """ :return: Работодатель """
+        return self['employer_name']
+
+    @property
+    def salary_obj(self):
+        """ :return: Объект зарплаты """
+        return Salary(self)
+
+    @property
+    def salary(self):
+        """ :return: Зарплата в текстовом представлении """
+        return str(self.salary_obj)
+
+    @property
+    def area_name(self):
+        """ :return: Город """
+        return self['area_name']
+
+    @property
+    def published_str(self):
+        """ :return: Дата публикации в строковом представлении """
+        return self['published_at']
+
+    @property
+    def published_at(self):
+        """ :return: Дата публикации (ДД.ММ.ГГГГ) """
+        return datetime.strptime(self.published_str, '%Y-%m-%dT%H:%M:%S%z').strftime("%d.%m.%Y")
+
+    @cached_slot
     def salary_average(self):
-        """ :return: Средняя зарплата """
-        return self.salary_obj.salary_avg
+        """ :return: Средняя зарплата в рублях (ключ сортировки, без построения строки зарплаты) """
+        salary_from, salary_to, currency = Vacancy.get_salary(self.values)
+        return Salary.ru_convert[currency] * (int(float(salary_from)) + int(float(salary_to))) / 2
 
     @property
     def salary_currency(self):
         """ :return: Валюта зарплаты """
-        return self.salary_obj.salary_currency
+        return self['salary_currency']
 
     @property
     def salary_from(self):
         """ :return: Нижний порог зарплаты зарплаты """
-        return self.salary_obj.salary_from
+        return int(float(self['salary_from']))
 
     @property
     def salary_to(self):
         """ :return: Верхний порог зарплаты зарплаты """
-        return self.salary_obj.salary_to
+        return int(float(self['salary_to']))
 
     @property
     def experience_weight(self):
@@ -183,7 +340,7 @@ class Vacancy:
         return self.exp_weight[self.experience_id]
 
     def get_list(self):
-        """ :return: Представление вакансии в виде словаря """
+        """ :return list: Значения полей в порядке Vacancy.fields """
         return [getattr(self, key) for key in self.fields]
 
 
@@ -191,12 +348,18 @@ class DataSet:
     """Дата-сет для работы с таблицей
     Attributes:
         file_name (str): Название файла
-        filter_params (list): Параметр фильтра
-        sort_params (list): Параметр сортировки
+        filter_params (list): Фильтры - пары (параметр, значение), должны выполняться все
+        sort_params (str): Параметры сортировки (через запятую)
         sort_reverse (bool): Обратная сортировка?
         slice_num (list): Список со срезом от и до
-        vacancies_objects (list): Список с вакансиями
+        vacancies_objects: Вакансии (после csv_reader - итератор, после sorting - список
+            или итератор, если сортировки нет или она внешняя)
+        headers (list): Заголовок последнего прочитанного файла
+        sort_memory (int): Бюджет памяти сортировки в байтах (None - сортировка только в памяти)
     """
+    parallel_size = 64 << 20
+    sort_memory = 256 << 20
+    sort_chunk = 64 << 10
     translate_list = {
         'Описание': 'description',
         'Навыки': 'skills_len',
@@ -211,23 +374,37 @@ class DataSet:
     }
 
     filter_rules = {
-        'Навыки': lambda v, val: all([skill in v.skills for skill in val.split(', ')]),
-        'Оклад': lambda v, val: v.salary_from <= float(val) <= v.salary_to,
-        'Дата публикации вакансии': lambda v, val: v.published_at == val,
-        'Опыт работы': lambda v, val: v.experience_id == val,
-        'Премиум-вакансия': lambda v, val: v.premium == val,
-        'Идентификатор валюты оклада': lambda v, val: Salary.ru_name[v.salary_currency] == val,
-        'Название': lambda v, val: v.name == val,
-        'Название региона': lambda v, val: v.area_name == val,
-        'Компания': lambda v, val: v.employer_name == val
+        'Навыки': lambda r, val: all([skill in r['key_skills'].split('\n') for skill in val.split(', ')]),
+        'Оклад': lambda r, val: int(float(r['salary_from'])) <= float(val) <= int(float(r['salary_to'])),
+        'Диапазон оклада': lambda r, val: int(float(r['salary_from'])) <= DataSet.parse_range(val)[1] and
+                                          DataSet.parse_range(val)[0] <= int(float(r['salary_to'])),
+        'Дата публикации вакансии': lambda r, val: '.'.join(reversed(r['published_at'][:10].split('-'))) == val,
+        'Опыт работы': lambda r, val: Vacancy.ru_exp[r['experience_id']] == val,
+        'Премиум-вакансия': lambda r, val: ('Да' if r['premium'].lower() == 'true' else 'Нет') == val,
+        'Идентификатор валюты оклада': lambda r, val: Salary.ru_name[r['salary_currency']] == val,
+        'Название': lambda r, val: Cleaners.html_remove(r['name']) == val,
+        'Название региона': lambda r, val: r['area_name'] == val,
+        'Компания': lambda r, val: r['employer_name'] == val
+    }
+
+    bitmap_columns = {
+        'Опыт работы': lambda r: Vacancy.ru_exp[r['experience_id']],
+        'Премиум-вакансия': lambda r: 'Да' if r['premium'].lower() == 'true' else 'Нет',
+        'Идентификатор валюты оклада': lambda r: Salary.ru_name[r['salary_currency']],
+        'Название региона': lambda r: r['area_name'],
+    }
+
+    interval_filters = {
+        'Оклад': lambda val: (float(val), float(val)),
+        'Диапазон оклада': lambda val: DataSet.parse_range(val),
     }
 
     def __init__(self, filename, filter_params, sort_params, sort_reverse, slice_num):
         """Конструктор класса DataSet
 
         :param str filename: Название файла
-        :param list filter_params: Параметр фильтра
-        :param list sort_params: Параметр сортировки
+        :param list filter_params: Фильтры - пары (параметр, значение)
+        :param str sort_params: Параметры сортировки (через запятую)
         :param bool sort_reverse: Обратная сортировка?
         :param list slice_num: Список со срезом от и до
         """
@@ -237,59 +414,510 @@ class DataSet:
         self.sort_reverse = sort_reverse
         self.slice_num = slice_num
         self.vacancies_objects = []
+        self.headers = []
+
+    @staticmethod
+    def parse_range(value):
+        """Границы диапазона оклада из значения фильтра
+
+        :param str value: Диапазон вида 'от - до'
+        :return tuple: Нижняя и верхняя граница
+
+        >>> DataSet.parse_range('50000 - 100000')
+        (50000.0, 100000.0)
+        """
+        low, high = value.split(' - ')
+        return float(low), float(high)
+
+    def get_files(self):
+        """Файлы для чтения: сам файл или партиции папки, отобранные по фильтрам Блума
+
+        Если по фильтрам отброшены все партиции, подходящих вакансий нет.
+
+        :return list: Названия файлов
+        """
+        if not os.path.isdir(self.file_name): return [self.file_name]
+        partitions, skipped = list_partitions(self.file_name, contains=self.bloom_query())
+        print('Пропущено партиций по фильтрам Блума: {0} из {1}'.format(skipped, skipped + len(partitions)))
+        if len(partitions) == 0 and skipped != 0:
+            print('Ничего не найдено')
+            exit()
+        return [file_name for file_name, _ in partitions]
+
+    def bloom_query(self):
+        """Значения фильтра для проверки партиций по фильтрам Блума
+
+        :return dict: Значения по столбцам
+        """
+        query = {}
+        for key, val in self.filter_params:
+            if key == 'Название': query['name'] = val
+            elif key == 'Название региона': query['area_name'] = val
+            elif key == 'Навыки': query['key_skills'] = query.get('key_skills', []) + val.split(', ')
+        return query
+
+    def get_predicate(self, filters):
+        """Проверка сырой строки по всем фильтрам
+
+        :param list filters: Пары (параметр, значение)
+        :return: Функция строка -> bool
+        """
+        rules = [(self.filter_rules[key], value) for key, value in filters]
+        if len(rules) == 1: return lambda row: rules[0][0](row, rules[0][1])
+        return lambda row: all(rule(row, value) for rule, value in rules)
+
+    def iter_rows(self):
+        """Читает строки CSV файла (или папки с партициями)
+
+        Вакансии создаются прямо из списков полей, без промежуточного словаря.
+
+        :return: Генератор вакансий
+        """
+        for file_name in self.get_files():
+            with open_file(file_name, mode='r', encoding='utf-8-sig') as file:
+                reader = csv.reader(file)
+                for index, row in enumerate(reader):
+                    if index == 0:
+                        self.headers = row
+                        csv_header_length = len(row)
+                        get_values = Vacancy.get_values_getter(row)
+                    elif '' not in row and len(row) == csv_header_length:
+                        yield Vacancy(None, get_values(row))
 
     def csv_reader(self):
-        """Читает CSV файл"""
-        headers = []
-        with open(self.file_name, mode='r', encoding='utf-8-sig') as file:
-            reader = csv.reader(file)
-            for index, row in enumerate(reader):
-                if index == 0:
-                    headers = row
-                    csv_header_length = len(row)
-                elif '' not in row and len(row) == csv_header_length:
-                    self.vacancies_objects.append(Vacancy(dict(zip(headers, row))))
-
-        if len(self.vacancies_objects) == 0:
-            if len(headers) == 0: print('Пустой файл')
+        """Читает CSV файл (или папку с партициями)
+
+        Вакансии читаются потоком: дальше они фильтруются и сразу отбираются в нужный срез,
+        поэтому весь файл в памяти не держится.
+        """
+        vacancies = self.iter_rows()
+        first = next(vacancies, None)
+        if first is None:
+            if len(self.headers) == 0: print('Пустой файл')
+            else: print('Нет данных')
+            exit()
+        self.vacancies_objects = itertools.chain([first], vacancies)
+
+    def get_size(self):
+        """ :return int: Размер входных данных в байтах (файл или все файлы папки с партициями) """
+        if not os.path.isdir(self.file_name): return os.path.getsize(self.file_name)
+        return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(self.file_name) for f in files)
+
+    def get_tasks(self, files, processes):
+        """Задачи для пула: по файлу на партицию или диапазоны байт одного несжатого файла
+
+        :param list files: Входные файлы
+        :param int processes: Количество процессов
+        :return list: Тройки (файл, начало, конец диапазона; None - весь файл)
+        """
+        if len(files) != 1 or processes <= 1 or get_compressor(files[0]): return [(f, None, None) for f in files]
+        with open(files[0], mode='rb') as file:
+            start = len(file.readline())
+        return [(files[0], a, b) for a, b in record_ranges(files[0], start, processes)]
+
+    @staticmethod
+    def read_range(file_name, start, end):
+        """Читает вакансии из диапазона байт файла
+
+        Переводы строк приводятся к \\n, как при чтении файла в текстовом режиме.
+
+        :param str file_name: Название файла
+        :param int start: Начало диапазона (None - весь файл)
+        :param int end: Конец диапазона
+        :return: Генератор вакансий
+        """
+        with open_file(file_name, mode='rb') as file:
+            header = parse_header(file.readline())
+            get_values = Vacancy.get_values_getter(header)
+            lines = file if start is None else iter_range(file, start, end)
+            reader = csv.reader(line.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n') for line in lines)
+            for row in reader:
+                if '' not in row and len(row) == len(header): yield Vacancy(None, get_values(row))
+
+    @staticmethod
+    def select_range(task):
+        """Фильтрует и упорядочивает вакансии части входных данных (выполняется в процессе пула)
+
+        Возвращаются только вакансии, прошедшие фильтр, а если срез ограничен сверху -
+        только первые get_limit() из них.
+
+        :param tuple task: Файл, диапазон байт и параметры дата-сета
+        :return tuple: Есть ли в части вакансии и отобранные вакансии -
+            пары (ключ сортировки, сырые поля) или сырые поля, если сортировки нет
+        """
+        file_name, start, end, params = task
+        data = DataSet(file_name, *params)
+        vacancies = data.read_range(file_name, start, end)
+        first = next(vacancies, None)
+        if first is None: return False, []
+        vacancies = itertools.chain([first], vacancies)
+        if len(data.filter_params) != 0: vacancies = filter(data.get_predicate(data.filter_params), vacancies)
+        attrs = data.get_sort_attrs()
+        if attrs:
+            get_key = attrgetter(*attrs)
+            items = data.select(((get_key(v), v.values) for v in vacancies), key=itemgetter(0))
+        else: items = [v.values for v in data.select(vacancies)]
+        return True, items
+
+    def parallel_reader(self, processes=None):
+        """Читает, фильтрует и упорядочивает вакансии в пуле процессов
+
+        Каждый процесс обрабатывает свой диапазон записей (или свою партицию) и возвращает
+        только отобранные вакансии, уже упорядоченные. Части сливаются слиянием k списков,
+        при равных ключах сохраняется порядок файла, как у sorted. После чтения нужен get_range().
+
+        :param int processes: Количество процессов (по умолчанию - по числу ядер)
+        """
+        processes = processes or multiprocessing.cpu_count()
+        files = self.get_files()
+        params = (self.filter_params, self.sort_params, self.sort_reverse, self.slice_num)
+        tasks = [(f, a, b, params) for f, a, b in self.get_tasks(files, processes)]
+        with multiprocessing.Pool(min(processes, len(tasks)) or 1) as pool:
+            results = pool.map(DataSet.select_range, tasks)
+        if not any(found for found, _ in results):
+            if files:
+                with open_file(files[-1], mode='rb') as file:
+                    self.headers = parse_header(file.readline())
+            if len(self.headers) == 0: print('Пустой файл')
             else: print('Нет данных')
             exit()
 
+        parts = [items for _, items in results]
+        if self.get_sort_attrs():
+            merged = heapq.merge(*parts, key=itemgetter(0), reverse=self.sort_reverse)
+            merged = (values for _, values in merged)
+        else: merged = itertools.chain.from_iterable(reversed(parts) if self.sort_reverse else parts)
+        self.vacancies_objects = [Vacancy(None, values) for values in itertools.islice(merged, self.get_limit())]
+
+    def store_reader(self):
+        """Читает из базы SQLite уже отфильтрованный, отсортированный и обрезанный срез вакансий"""
+        store = VacancyStore.open(self.file_name)
+        if store is None:
+            print('Нет базы данных')
+            exit()
+        if store.count() == 0:
+            print('Нет данных')
+            exit()
+        for index, vacancy in store.get_vacancies(self.filter_params, self.sort_params,
+                                                  self.sort_reverse, self.slice_num):
+            v = Vacancy(vacancy)
+            v.index = index
+            self.vacancies_objects.append(v)
+        store.close()
+
+    def index_reader(self):
+        """Читает уже отфильтрованный, отсортированный и обрезанный срез вакансий через индекс смещений
+
+        Без фильтра нужные записи читаются сразу по смещениям - в порядке файла или в порядке
+        индекса сортировки. Фильтры по столбцам битового индекса проверяются пересечением
+        битовых карт, условия на оклад - по индексу интервалов, на навыки - по инвертированному
+        индексу, остальные - по записям (только по отобранным индексами, если они есть).
+        Хранятся только ключи сортировки (или их ранги из индекса сортировки) и номера записей,
+        а вакансии для вывода дочитываются по смещениям после отбора среза.
+        """
+        index = RowIndex.open(self.file_name)
+        if len(index) == 0:
+            if len(index.header) == 0: print('Пустой файл')
+            else: print('Нет данных')
+            exit()
+
+        attrs = self.get_sort_attrs()
+        sort_index = SortIndex.open(index, Vacancy) if attrs and SortIndex.covers(attrs) else None
+        if len(self.filter_params) == 0 and (len(attrs) == 0 or sort_index and len(attrs) == 1):
+            start = max(self.slice_num[0], 0) if self.slice_num else 0
+            end = max(self.slice_num[1], 0) if len(self.slice_num) > 1 else len(index)
+            if attrs: order = sort_index.iter_order(attrs[0], self.sort_reverse)
+            else: order = reversed(range(len(index))) if self.sort_reverse else iter(range(len(index)))
+            numbers = list(itertools.islice(order, start, max(start, end)))
+            positions = range(start, start + len(numbers))
+        else:
+            numbers, filters = self.select_indexed(index)
+            items = None
+            if len(filters) != 0 or attrs and sort_index is None:
+                items = enumerate(index.iter_rows()) if numbers is None else zip(numbers, index.read(numbers))
+            if len(filters) != 0:
+                predicate = self.get_predicate(filters)
+                items = filter(lambda item: predicate(item[1]), items)
+            if attrs and sort_index is None:
+                get_key = attrgetter(*attrs)
+                keyed = ((get_key(Vacancy(row)), number) for number, row in items)
+                ordered = [number for _, number in self.select(keyed, key=lambda item: item[0])]
+            else:
+                if items is not None: numbers = (number for number, _ in items)
+                elif numbers is None: numbers = range(len(index))
+                ordered = self.select(numbers, key=sort_index.get_key(attrs) if attrs else None)
+            positions = [p for p in range(len(ordered)) if self.in_range(p)]
+            numbers = [ordered[p] for p in positions]
+
+        self.vacancies_objects = []
+        for position, row in zip(positions, index.read(numbers)):
+            v = Vacancy(row)
+            v.index = position + 1
+            self.vacancies_objects.append(v)
+
+    def select_indexed(self, index):
+        """Отбирает записи по фильтрам, для которых построены индексы
+
+        Индекс открывается, только если среди фильтров есть условия, которые он обслуживает.
+
+        :param RowIndex index: Индекс смещений
+        :return tuple: Номера отобранных записей по возрастанию (None, если индексы не применялись)
+            и фильтры, которые нужно проверить по самим записям
+        """
+        bits, filters = None, self.filter_params
+        keys = {key for key, _ in filters}
+        if keys & set(self.bitmap_columns):
+            bitmap_index = BitmapIndex.open(index, self.bitmap_columns)
+            if bitmap_index is not None: bits, filters = bitmap_index.select(filters, bits)
+        if keys & set(self.interval_filters):
+            interval_index = IntervalIndex.open(index)
+            if interval_index is not None: bits, filters = interval_index.select(filters, self.interval_filters, bits)
+        if 'Навыки' in keys:
+            skill_index = SkillIndex.open(index)
+            if skill_index is not None: bits, filters = skill_index.select(filters, 'Навыки', bits)
+        return (None if bits is None else list(iter_bits(bits))), filters
+
     def get_rows(self):
-        """Получить вакансии в списке"""
+        """Получить вакансии в списке
+
+        Заполняются все столбцы, включая скрытые: PrettyTable выравнивает высоту строки
+        по всем ячейкам, поэтому без них таблица выглядела бы иначе.
+
+        :return list: Строки таблицы
+        """
         return [v.get_list() for v in self.vacancies_objects]
 
+    def iter_table(self, columns):
+        """Строки таблицы по одной, только с показываемыми столбцами
+
+        :param list columns: Показываемые столбцы таблицы
+        :return: Генератор строк (значения в порядке table_header)
+        """
+        fields = [f for f, c in zip(Vacancy.fields, InputConnect.table_header) if c in columns]
+        for v in self.vacancies_objects: yield [getattr(v, f) for f in fields]
+
     def filtering(self):
-        """Фильтрация вакансий"""
+        """Фильтрация вакансий
+
+        Правила проверяются по сырым полям вакансии (vacancy['поле']), очистка HTML,
+        форматирование зарплаты и разбор даты выполняются только для показанных вакансий.
+        """
         if len(self.filter_params) == 0: return
-        self.vacancies_objects = list(
-            filter(lambda v:
-                   self.filter_rules[self.filter_params[0]](v, self.filter_params[1]),
-                   self.vacancies_objects))
+        self.vacancies_objects = filter(self.get_predicate(self.filter_params), self.vacancies_objects)
+
+    def get_limit(self):
+        """Сколько первых вакансий после сортировки нужно для среза
+
+        :return int: Количество вакансий или None, если нужны все
+        """
+        return max(self.slice_num[1], 0) if len(self.slice_num) > 1 else None
 
     def sorting(self):
-        """Сортировка вакансий"""
-        if self.sort_params != '':
-            self.vacancies_objects.sort(key=lambda a: getattr(a, self.translate_list[self.sort_params]),
-                                        reverse=self.sort_reverse)
-        elif self.sort_params == '' and self.sort_reverse:
-            self.vacancies_objects.reverse()
+        """Сортировка вакансий
 
-    def get_range(self):
-        """Получить срез вакансий"""
-        vacancies_temp = []
+        Если срез ограничен сверху, остаются только первые limit вакансий: при сортировке -
+        через кучу размера limit (порядок равных элементов тот же, что у sorted),
+        без сортировки чтение останавливается, как только срез заполнен (в прямом порядке
+        вакансии остаются итератором и читаются по мере вывода). Полная сортировка
+        не помещающихся в sort_memory вакансий выполняется внешней сортировкой.
+        """
+        attrs = self.get_sort_attrs()
+        if len(attrs) == 0 and not self.sort_reverse:
+            self.vacancies_objects = itertools.islice(self.vacancies_objects, self.get_limit())
+            return
+        if attrs and self.get_limit() is None and self.sort_memory is not None:
+            self.vacancies_objects = self.external_sort(self.vacancies_objects, attrs)
+            return
+        key = attrgetter(*attrs) if attrs else None
+        self.vacancies_objects = self.select(self.vacancies_objects, key)
+
+    def external_sort(self, vacancies, attrs, processes=None):
+        """Внешняя сортировка вакансий
+
+        Вакансии набираются в память, пока их примерный размер не превысит бюджет. Если все
+        вакансии поместились, они сортируются в памяти. Иначе набранная серия сортируется в этом
+        процессе и сбрасывается во временный файл, а остальные вакансии делятся на серии по доле
+        бюджета и сортируются в пуле процессов (одновременно - не больше processes серий).
+        Файлы сливаются слиянием k списков по мере чтения результата.
+        При равных ключах сохраняется порядок чтения, как у sorted.
+
+        :param vacancies: Итератор вакансий
+        :param list attrs: Атрибуты сортировки
+        :param int processes: Количество процессов (по умолчанию - по числу ядер)
+        :return: Отсортированные вакансии (список или генератор)
+        """
+        processes = processes or multiprocessing.cpu_count()
+        budget = self.sort_memory
+        run, size, runs = [], 0, []
+        directory, pool = None, None
+        try:
+            for v in vacancies:
+                run.append(v)
+                size += sys.getsizeof(v) + sum(map(sys.getsizeof, v.values))
+                if size < budget: continue
+                if directory is None:
+                    directory = tempfile.mkdtemp(prefix='vacancies_sort_')
+                    runs.append(self.spill_run(None, directory, 0, run, size, attrs))
+                    budget = self.sort_memory // (processes + 1)
+                    if processes > 1: pool = multiprocessing.Pool(processes)
+                else:
+                    runs.append(self.spill_run(pool, directory, len(runs), run, size, attrs))
+                    if pool is not None and len(runs) > processes + 1: runs[-processes - 1].wait()
+                run, size = [], 0
+            if directory is None: return sorted(run, key=attrgetter(*attrs), reverse=self.sort_reverse)
+            if run: runs.append(self.spill_run(pool, directory, len(runs), run, size, attrs))
+            paths = [r if isinstance(r, str) else r.get() for r in runs]
+        except BaseException:
+            if pool is not None: pool.terminate()
+            if directory is not None: shutil.rmtree(directory, ignore_errors=True)
+            raise
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return self.merge_runs(directory, paths)
+
+    def spill_run(self, pool, directory, number, run, size, attrs):
+        """Отправляет серию на сортировку и запись во временный файл
+
+        :param multiprocessing.Pool pool: Пул процессов (None - сортировать в этом процессе)
+        :param str directory: Папка временных файлов
+        :param int number: Номер серии
+        :param list run: Вакансии серии
+        :param int size: Примерный размер серии в байтах
+        :param list attrs: Атрибуты сортировки
+        :return: Файл серии или AsyncResult, если серия сортируется в пуле
+        """
+        chunk = max(len(run) * self.sort_chunk // max(size, 1), 1)
+        task = (os.path.join(directory, 'run{0}.pickle'.format(number)), [v.values for v in run],
+                attrs, self.sort_reverse, chunk)
+        if pool is None: return DataSet.sort_run(task)
+        return pool.apply_async(DataSet.sort_run, (task,))
+
+    @staticmethod
+    def sort_run(task):
+        """Сортирует серию и записывает ее во временный файл (выполняется в процессе пула)
+
+        Записываются пары (ключ сортировки, сырые поля) пачками по chunk штук (около sort_chunk байт,
+        при слиянии в памяти держится по одной пачке каждой серии), ключи заново не вычисляются.
+
+        :param tuple task: Файл, сырые поля вакансий, атрибуты сортировки, обратный порядок и размер пачки
+        :return str: Файл серии
+        """
+        path, values, attrs, reverse, chunk = task
+        get_key = attrgetter(*attrs)
+        items = [(get_key(v), v.values) for v in (Vacancy(None, row) for row in values)]
+        items.sort(key=itemgetter(0), reverse=reverse)
+        with open(path, mode='wb') as file:
+            for i in range(0, len(items), chunk): pickle.dump(items[i:i + chunk], file, pickle.HIGHEST_PROTOCOL)
+        return path
+
+    @staticmethod
+    def read_run(path):
+        """Читает серию из временного файла пачками
+
+        :param str path: Файл серии
+        :return: Генератор пар (ключ сортировки, сырые поля)
+        """
+        with open(path, mode='rb') as file:
+            while True:
+                try:
+                    items = pickle.load(file)
+                except EOFError:
+                    return
+                yield from items
+
+    def merge_runs(self, directory, paths):
+        """Сливает отсортированные серии; временные файлы удаляются, когда слияние закончено или прервано
+
+        :param str directory: Папка временных файлов
+        :param list paths: Файлы серий в порядке чтения вакансий
+        :return: Генератор вакансий
+        """
+        runs = [self.read_run(path) for path in paths]
+        try:
+            for _, values in heapq.merge(*runs, key=itemgetter(0), reverse=self.sort_reverse):
+                yield Vacancy(None, values)
+        finally:
+            for run in runs: run.close()
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def get_sort_attrs(self):
+        """Атрибуты вакансии для сортировки
+
+        :return list: Атрибуты в порядке приоритета (пустой список - без сортировки)
+        """
+        if self.sort_params == '': return []
+        return [self.translate_list[p] for p in self.sort_params.split(', ')]
+
+    def select(self, items, key=None):
+        """Упорядочивает элементы и оставляет первые get_limit() из них
+
+        :param items: Итератор элементов
+        :param key: Ключ сортировки (None - порядок чтения, с учетом обратного порядка)
+        :return list: Упорядоченные элементы
+        """
+        limit = self.get_limit()
+        if key is not None:
+            if limit is None: return sorted(items, key=key, reverse=self.sort_reverse)
+            if self.sort_reverse: return heapq.nlargest(limit, items, key=key)
+            return heapq.nsmallest(limit, items, key=key)
+        if self.sort_reverse: return list(reversed(deque(items, maxlen=limit)))
+        return list(itertools.islice(items, limit))
+
+    def in_range(self, idx):
+        """Проверяет, попадает ли позиция в срез вывода
+
+        :param int idx: Позиция вакансии после сортировки (с нуля)
+        :return bool: Вакансия выводится
+        """
         slen = len(self.slice_num)
-        for idx, v in enumerate(self.vacancies_objects):
-            if (slen > 1 and self.slice_num[0] <= idx < self.slice_num[1]) or \
-                    (slen == 1 and self.slice_num[0] <= idx) or slen == 0:
+        return (slen > 1 and self.slice_num[0] <= idx < self.slice_num[1]) or \
+            (slen == 1 and self.slice_num[0] <= idx) or slen == 0
+
+    def iter_range(self, vacancies):
+        """Срез вакансий по одной (с проставленными номерами)
+
+        :param vacancies: Упорядоченные вакансии
+        :return: Генератор вакансий
+        """
+        for idx, v in enumerate(vacancies):
+            if self.in_range(idx):
                 v.index = idx + 1
-                vacancies_temp.append(v)
-        self.vacancies_objects = vacancies_temp
+                yield v
+
+    def get_range(self):
+        """Получить срез вакансий"""
+        self.vacancies_objects = list(self.iter_range(self.vacancies_objects))
 
 
 class Cleaners:
-    """Класс со статическими функциями для очистки"""
+    """Класс со статическими функциями для очистки
+
+    Шаблоны скомпилированы один раз. Результаты очистки кэшируются по содержимому строки
+    (LRU ограниченного размера), поэтому повторяющиеся названия и описания
+    перепубликованных вакансий чистятся один раз.
+
+    Attributes:
+        tag_pattern (re.Pattern): HTML тэг
+        space_pattern (re.Pattern): Последовательность пробельных символов
+        chunk_size (int): Начальная длина куска текста при укорачивании описаний
+    """
+    tag_pattern = re.compile('<.*?>')
+    space_pattern = re.compile(r'\s+')
+    chunk_size = 1024
+
+    @staticmethod
+    def strip_html(text):
+        """ Убирает HTML тэги и схлопывает пробельные символы (без кэша и без обрезки краев)
+
+        :param str text: Исходный текст
+        :return str: Почищенный текст
+        """
+        return Cleaners.space_pattern.sub(' ', Cleaners.tag_pattern.sub('', text))
+
     @staticmethod
+    @lru_cache(maxsize=4096)
     def html_remove(text):
         """ Убирает HTML тэги из строки
 
@@ -299,9 +927,33 @@ class Cleaners:
         >>> Cleaners.html_remove("<b>Test</b>",)
         'Test'
         """
-        text = re.sub('<.*?>', '', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        return Cleaners.strip_html(text).strip()
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def html_short(text, count):
+        """ Убирает HTML тэги и укорачивает текст до count символов (как short_text(html_remove(text), count))
+
+        Чистится только начало текста: кусок длиной chunk_size, а если в нем мало текста -
+        в 4 раза длиннее и т.д. Кусок обрезается перед незакрытым тэгом, а хвост почищенного
+        куска (последний символ может оказаться пробелом) в результат не попадает.
+
+        :param str text: Исходный текст
+        :param int count: Количество оставшихся символов
+        :return str: Почищенная укороченная строка
+
+        >>> Cleaners.html_short("<p>Test</p>\\n<p>Testing</p>", 6)
+        'Test T...'
+        """
+        size = Cleaners.chunk_size
+        while size < len(text):
+            head = text[:size]
+            cut = head.find('<', head.rfind('>') + 1)
+            if cut >= 0: head = head[:cut]
+            result = Cleaners.strip_html(head).lstrip()
+            if len(result) > count + 1: return result[:count] + "..."
+            size *= 4
+        return Cleaners.short_text(Cleaners.strip_html(text).strip(), count)
 
     @staticmethod
     def short_text(text, count):
@@ -331,6 +983,8 @@ class InputConnect:
     """
     table_header = ['№', 'Название', 'Описание', 'Навыки', 'Опыт работы', 'Премиум-вакансия',
                     'Компания', 'Оклад', 'Название региона', 'Дата публикации вакансии']
+    stream_rows = 1000
+    stream_index_width = 7
 
     def __init__(self):
         """
@@ -349,13 +1003,56 @@ class InputConnect:
             exit()
 
         data = DataSet(self.filename, self.filter_params, self.sort_params, self.sort_reverse, self.slice_num)
-        data.csv_reader()
-        data.filtering()
-        data.sorting()
-        data.get_range()
+        if self.filename.endswith(('.db', '.sqlite')):
+            data.store_reader()
+        elif RowIndex.supports(self.filename) and os.path.isfile(RowIndex.get_path(self.filename)):
+            data.index_reader()
+        elif multiprocessing.cpu_count() > 1 and data.get_size() >= DataSet.parallel_size:
+            data.parallel_reader()
+            data.vacancies_objects = data.iter_range(data.vacancies_objects)
+        else:
+            data.csv_reader()
+            data.filtering()
+            data.sorting()
+            data.vacancies_objects = data.iter_range(data.vacancies_objects)
+
+        self.output(data)
 
-        rows = data.get_rows()
+    def get_columns(self):
+        """ :return list: Показываемые столбцы в порядке таблицы """
+        return [c for c in self.table_header if c in self.slice_fields]
 
+    def output(self, data):
+        """Вывод результата запроса
+
+        Если вакансий не больше stream_rows, печатается обычная таблица. Иначе таблица
+        печатается построчно, по мере чтения вакансий: ширина столбцов подбирается, как в
+        PrettyTable, только по первым stream_rows + 1 строкам, у номера она фиксирована
+        (об этом печатается предупреждение перед таблицей).
+
+        :param DataSet data: Дата-сет с отобранными вакансиями
+        """
+        vacancies = iter(data.vacancies_objects)
+        head = list(itertools.islice(vacancies, self.stream_rows + 1))
+        if len(head) <= self.stream_rows:
+            data.vacancies_objects = head
+            self.print_table(data.get_rows())
+            return
+        print('Вакансий больше {0}: таблица выводится построчно, ширина столбцов подобрана по первым {1} '
+              'строкам (у № - {2} символов), более длинные значения переносятся'.format(
+                  self.stream_rows, len(head), self.stream_index_width))
+        head = [v.get_list() for v in head]
+        widths = TableWriter.get_widths(self.table_header, head)
+        widths['№'] = self.stream_index_width
+        table = TableWriter(self.table_header, widths=widths, fields=self.slice_fields)
+        for row in head: table.write_row(row)
+        for v in vacancies: table.write_row(v.get_list())
+
+    def print_table(self, rows):
+        """Печать таблицы вакансий
+
+        :param list rows: Строки таблицы
+        """
         if len(rows) == 0: print('Ничего не найдено')
         else:
             table = PrettyTable(align='l',
@@ -367,26 +1064,34 @@ class InputConnect:
     def parse_filter(self, filter_params):
         """Парсинг фильтров из строки
 
-        :param str filter_params: Фильтры в строке
-        :return list: Параметры фильтрации для дальнейшей работы
+        :param str filter_params: Фильтры в строке (несколько - через точку с запятой)
+        :return list: Пары (параметр, значение) для дальнейшей работы
         """
         if filter_params == '': return []
-        if ': ' not in filter_params:
-            self.err.append('Формат ввода некорректен')
-            return []
-        filter_params = filter_params.split(': ')
-        if filter_params[0] not in list(DataSet.filter_rules.keys()):
-            self.err.append('Параметр поиска некорректен')
-            return []
-        return filter_params
+        filters = []
+        for part in filter_params.split('; '):
+            if ': ' not in part:
+                self.err.append('Формат ввода некорректен')
+                return []
+            filter_param = part.split(': ')
+            if filter_param[0] not in list(DataSet.filter_rules.keys()):
+                self.err.append('Параметр поиска некорректен')
+                return []
+            try:
+                if filter_param[0] in DataSet.interval_filters: DataSet.interval_filters[filter_param[0]](filter_param[1])
+            except ValueError:
+                self.err.append('Формат ввода некорректен')
+                return []
+            filters.append(filter_param[:2])
+        return filters
 
     def parse_sort(self, sort_param):
         """Парсинг сортировки из строки
 
-        :param str sort_param: Параметры сортировки в строке
-        :return list: Параметры сортировки для дальнейшей работы
+        :param str sort_param: Параметры сортировки в строке (несколько - через запятую)
+        :return str: Параметры сортировки для дальнейшей работы
         """
-        if sort_param not in InputConnect.table_header + ['']:
+        if sort_param != '' and any(p not in InputConnect.table_header for p in sort_param.split(', ')):
             self.err.append('Параметр сортировки некорректен')
         return sort_param
 
@@ -417,5 +1122,151 @@ class InputConnect:
                                                                      if a in self.table_header]
 
 
+class InputSession(InputConnect):
+    """Интерактивная сессия: файл читается один раз, дальше запросы задаются командами
+
+    Вакансии остаются в памяти вместе с уже вычисленными полями (ключи сортировки, очищенные
+    названия), поэтому повторные сортировки не разбирают строки заново. Результаты последних
+    фильтров кэшируются: уточняющий запрос (прежние условия плюс новые) проверяет новые
+    условия только по самому маленькому подходящему результату из кэша.
+    База SQLite в памяти не держится - запросы к ней выполняются как обычно.
+
+    Attributes:
+        vacancies (list): Все вакансии файла (None для базы SQLite)
+        results (OrderedDict): Фильтры -> отфильтрованные вакансии (последние cache_size запросов)
+    """
+    commands = {
+        'Фильтр': ('filter_params', 'parse_filter'),
+        'Уточнить': ('filter_params', 'parse_refine'),
+        'Сортировка': ('sort_params', 'parse_sort'),
+        'Обратный порядок': ('sort_reverse', 'parse_sort_reverse'),
+        'Диапазон': ('slice_num', 'parse_slice_num'),
+        'Столбцы': ('slice_fields', 'parse_slice_fields'),
+    }
+    cache_size = 16
+
+    def __init__(self, fn=None):
+        """
+        Начало работы сессии
+
+        :param str fn: Название файла
+        """
+        self.err = []
+        self.filename = fn
+        if fn is None:
+            self.filename = input('Введите название файла: ')
+        self.filter_params, self.sort_params, self.sort_reverse = [], '', False
+        self.slice_num, self.slice_fields = [], self.table_header
+        self.results = OrderedDict()
+        self.vacancies = None
+        if not self.filename.endswith(('.db', '.sqlite')):
+            data = DataSet(self.filename, [], '', False, [])
+            data.csv_reader()
+            self.vacancies = list(data.vacancies_objects)
+            print('Загружено вакансий: ' + str(len(self.vacancies)))
+
+        prompt = 'Введите команду ({0}: значение) или Выход: '.format(', '.join(self.commands))
+        while True:
+            command = input(prompt)
+            if command in ('', 'Выход'): break
+            if self.run_command(command): self.print_table(self.query())
+
+    def run_command(self, command):
+        """Применяет команду к параметрам запроса
+
+        При ошибке параметры не меняются.
+
+        :param str command: Команда вида 'Команда: значение'
+        :return bool: Команда применена
+        """
+        name, _, value = command.partition(': ')
+        if name not in self.commands:
+            print('Неизвестная команда')
+            return False
+        attribute, parser = self.commands[name]
+        self.err = []
+        try:
+            result = getattr(self, parser)(value)
+        except ValueError:
+            self.err.append('Формат ввода некорректен')
+        if len(self.err) != 0:
+            print(self.err[0])
+            return False
+        setattr(self, attribute, result)
+        return True
+
+    def parse_refine(self, filter_params):
+        """Парсинг уточняющих фильтров (добавляются к текущим)
+
+        :param str filter_params: Фильтры в строке
+        :return list: Текущие и новые фильтры
+        """
+        return self.filter_params + self.parse_filter(filter_params)
+
+    def get_filtered(self, data):
+        """Отфильтрованные вакансии с учетом кэша предыдущих результатов
+
+        :param DataSet data: Дата-сет запроса (правила фильтров)
+        :return list: Вакансии в порядке файла
+        """
+        key = tuple(tuple(f) for f in self.filter_params)
+        if key not in self.results:
+            base, rest = self.vacancies, key
+            for cached, result in self.results.items():
+                if set(cached) <= set(key) and len(result) < len(base):
+                    base, rest = result, [f for f in key if f not in cached]
+            predicate = data.get_predicate(rest)
+            self.results[key] = [v for v in base if predicate(v)] if rest else base
+            if len(self.results) > self.cache_size: self.results.popitem(last=False)
+        self.results.move_to_end(key)
+        return self.results[key]
+
+    def query(self):
+        """Выполняет запрос с текущими параметрами
+
+        :return list: Строки таблицы
+        """
+        data = DataSet(self.filename, self.filter_params, self.sort_params, self.sort_reverse, self.slice_num)
+        if self.vacancies is None: data.store_reader()
+        else:
+            data.vacancies_objects = iter(self.get_filtered(data))
+            data.sort_memory = None
+            data.sorting()
+            data.get_range()
+        return data.get_rows()
+
+
+class InputExport(InputConnect):
+    """Выгрузка отобранных вакансий в CSV или XLSX вместо вывода таблицы
+
+    Вакансии пишутся в файл по одной, по мере чтения.
+
+    Attributes:
+        export_name (str): Файл выгрузки
+    """
+    def __init__(self, out=None):
+        """
+        Начало работы выгрузки
+
+        :param str out: Файл выгрузки (.csv или .xlsx)
+        """
+        self.export_name = out
+        if out is None:
+            self.export_name = input('Введите файл выгрузки (.csv или .xlsx): ')
+        if get_exporter(self.export_name) is None:
+            print('Формат файла выгрузки не поддерживается')
+            exit()
+        super().__init__()
+
+    def output(self, data):
+        """Выгрузка результата запроса в файл
+
+        :param DataSet data: Дата-сет с отобранными вакансиями
+        """
+        columns = self.get_columns()
+        count = get_exporter(self.export_name)(self.export_name, columns, data.iter_table(columns))
+        print('Выгружено вакансий: ' + str(count))
+
+
 if __name__ == '__main__':
     InputConnect()
@@ -0,0 +1,836 @@
+import base64
+import csv
+import io
+import itertools
+import json
+import os
+import struct
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+
+from compression import get_compressor
+from raw_csv import iter_records, parse_header
+
+
+def parse_row(record):
+    """Разбор сырой записи так же, как при чтении файла в текстовом режиме
+
+    Переводы строк внутри полей приводятся к '\\n'.
+
+    :param bytes record: Сырая запись
+    :return list: Поля записи
+
+    >>> parse_row(b'a,"x\\r\\ny",2\\r\\n')
+    ['a', 'x\\ny', '2']
+    """
+    text = record.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    return next(csv.reader(io.StringIO(text)), [])
+
+
+def reverse_stable(order, ranks):
+    """Обратный порядок перестановки с сохранением исходного порядка равных ключей (как sorted(reverse=True))
+
+    :param order: Номера записей по возрастанию ключа
+    :param ranks: Ранги ключей по номерам записей
+    :return: Генератор номеров записей
+
+    >>> list(reverse_stable([2, 0, 1, 3], [1, 1, 0, 2]))
+    [3, 0, 1, 2]
+    """
+    end = len(order)
+    while end > 0:
+        start, rank = end - 1, ranks[order[end - 1]]
+        while start > 0 and ranks[order[start - 1]] == rank: start -= 1
+        yield from order[start:end]
+        end = start
+
+
+class RowIndex:
+    """Индекс смещений записей CSV файла (сайдкар-файл <файл>.idx)
+
+    Хранит смещения только тех записей, которые vacancies.py считает вакансиями
+    (все поля заполнены, количество полей совпадает с заголовком), поэтому номер
+    в индексе совпадает с номером вакансии в выводе без фильтра и сортировки.
+    Индекс считается устаревшим, если изменились размер или время изменения CSV.
+
+    Attributes:
+        file_name (str): Название CSV файла
+        header (list): Заголовок CSV файла
+        offsets (array): Смещения записей
+        signature (tuple): Размер и время изменения CSV на момент построения
+    """
+    magic = b'VIDX1\n'
+
+    def __init__(self, file_name):
+        """Конструктор индекса
+
+        :param str file_name: Название CSV файла
+        """
+        self.file_name = file_name
+        self.header = []
+        self.offsets = array('Q')
+        self.signature = (0, 0)
+
+    @staticmethod
+    def get_path(file_name):
+        """ :return str: Путь к файлу индекса """
+        return file_name + '.idx'
+
+    @staticmethod
+    def supports(file_name):
+        """ :return bool: Индекс можно построить (обычный несжатый файл) """
+        return os.path.isfile(file_name) and get_compressor(file_name) is None
+
+    def get_signature(self):
+        """ :return tuple: Размер и время изменения CSV """
+        stat = os.stat(self.file_name)
+        return stat.st_size, stat.st_mtime_ns
+
+    def read_header(self, file):
+        """Читает заголовок
+
+        :param file: CSV файл, открытый в бинарном режиме
+        :return int: Смещение первой записи
+        """
+        line = file.readline()
+        self.header = parse_header(line) if line.strip() else []
+        return len(line)
+
+    def build(self):
+        """Строит индекс за один проход по файлу"""
+        self.signature = self.get_signature()
+        self.offsets = array('Q')
+        with open(self.file_name, mode='rb') as file:
+            offset = self.read_header(file)
+            header_length = len(self.header)
+            for record in iter_records(file):
+                row = parse_row(record)
+                if '' not in row and len(row) == header_length: self.offsets.append(offset)
+                offset += len(record)
+
+    def save(self):
+        """Атомарно записывает индекс"""
+        path = self.get_path(self.file_name)
+        with open(path + '.tmp', mode='wb') as file:
+            file.write(self.magic + struct.pack('<QqQ', self.signature[0], self.signature[1], len(self.offsets)))
+            self.offsets.tofile(file)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def load(file_name):
+        """Читает индекс
+
+        :param str file_name: Название CSV файла
+        :return RowIndex: Индекс или None, если его нет или CSV изменился
+        """
+        index = RowIndex(file_name)
+        path = index.get_path(file_name)
+        if not os.path.isfile(path): return None
+        with open(path, mode='rb') as file:
+            if file.read(len(index.magic)) != index.magic: return None
+            size, mtime, count = struct.unpack('<QqQ', file.read(24))
+            if (size, mtime) != index.get_signature(): return None
+            index.offsets.fromfile(file, count)
+        index.signature = (size, mtime)
+        with open(file_name, mode='rb') as file:
+            index.read_header(file)
+        return index
+
+    @staticmethod
+    def open(file_name):
+        """Читает индекс, а если его нет или он устарел - строит и сохраняет
+
+        :param str file_name: Название CSV файла
+        :return RowIndex: Индекс
+        """
+        index = RowIndex.load(file_name)
+        if index is None:
+            index = RowIndex(file_name)
+            index.build()
+            index.save()
+        return index
+
+    def __len__(self):
+        """ :return int: Количество вакансий """
+        return len(self.offsets)
+
+    def iter_rows(self):
+        """Последовательно читает вакансии файла
+
+        Номера вакансий не нужны смещениями, поэтому файл читается обычным csv.reader.
+
+        :return: Генератор словарей вакансий (в порядке номеров индекса)
+        """
+        header_length = len(self.header)
+        with open(self.file_name, mode='r', encoding='utf-8-sig') as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            for row in reader:
+                if '' not in row and len(row) == header_length: yield dict(zip(self.header, row))
+
+    def read(self, numbers):
+        """Читает вакансии по номерам (через смещения)
+
+        :param numbers: Номера вакансий
+        :return: Генератор словарей вакансий в порядке номеров
+        """
+        with open(self.file_name, mode='rb') as file:
+            for number in numbers:
+                file.seek(self.offsets[number])
+                yield dict(zip(self.header, parse_row(next(iter_records(file)))))
+
+
+def iter_bits(bits):
+    """Номера установленных битов битовой карты по возрастанию
+
+    :param int bits: Битовая карта (бит n - запись с номером n)
+    :return: Генератор номеров
+
+    >>> list(iter_bits(0b10110))
+    [1, 2, 4]
+    """
+    text = bin(bits)[:1:-1]
+    position = text.find('1')
+    while position != -1:
+        yield position
+        position = text.find('1', position + 1)
+
+
+def make_bits(numbers, count):
+    """Битовая карта из номеров записей
+
+    :param numbers: Номера записей
+    :param int count: Количество записей
+    :return int: Битовая карта
+
+    >>> bin(make_bits([1, 2, 4], 5))
+    '0b10110'
+    """
+    bitmap = bytearray((count + 7) // 8)
+    for number in numbers: bitmap[number >> 3] |= 1 << (number & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+class SortIndex:
+    """Постоянные индексы сортировки (сайдкар-файл <файл>.sort.idx)
+
+    Для каждого ключа хранятся перестановка номеров записей по возрастанию ключа
+    (устойчивая, как sorted) и ранги ключей по номерам записей: равные ключи имеют
+    равный ранг, поэтому ранги заменяют сами ключи (очищенные названия, зарплаты в рублях)
+    при сортировке отфильтрованных записей и при сортировке по нескольким ключам.
+    Индекс привязан к индексу смещений и устаревает вместе с ним.
+
+    Attributes:
+        file_name (str): Название CSV файла
+        signature (tuple): Размер и время изменения CSV на момент построения
+        orders (dict): Ключ -> номера записей по возрастанию ключа
+        ranks (dict): Ключ -> ранги ключа по номерам записей
+    """
+    magic = b'VSRT1\n'
+    keys = ['salary_average', 'published_str', 'experience_weight', 'skills_len', 'name', 'employer_name']
+
+    def __init__(self, file_name):
+        """Конструктор индекса
+
+        :param str file_name: Название CSV файла
+        """
+        self.file_name = file_name
+        self.signature = (0, 0)
+        self.orders = {}
+        self.ranks = {}
+
+    @staticmethod
+    def get_path(file_name):
+        """ :return str: Путь к файлу индекса """
+        return file_name + '.sort.idx'
+
+    @staticmethod
+    def covers(keys):
+        """ :return bool: Для всех ключей есть индекс """
+        return all(key in SortIndex.keys for key in keys)
+
+    def build(self, index, factory):
+        """Строит индексы всех ключей за один проход по файлу
+
+        :param RowIndex index: Индекс смещений
+        :param factory: Класс записи, по атрибутам которой вычисляются ключи (vacancies.Vacancy)
+        """
+        self.signature = index.signature
+        values = {key: [] for key in self.keys}
+        for record in map(factory, index.iter_rows()):
+            for key in self.keys: values[key].append(getattr(record, key))
+        for key in self.keys:
+            order = sorted(range(len(values[key])), key=values[key].__getitem__)
+            ranks = array('I', bytes(4 * len(order)))
+            rank, last = 0, None
+            for position, number in enumerate(order):
+                value = values[key][number]
+                if position and value != last: rank += 1
+                ranks[number], last = rank, value
+            self.orders[key] = array('I', order)
+            self.ranks[key] = ranks
+
+    def save(self):
+        """Атомарно записывает индекс"""
+        path = self.get_path(self.file_name)
+        with open(path + '.tmp', mode='wb') as file:
+            file.write(self.magic + struct.pack('<QqQ', self.signature[0], self.signature[1],
+                                                len(self.orders[self.keys[0]])))
+            file.write(','.join(self.keys).encode('utf-8') + b'\n')
+            for key in self.keys:
+                self.orders[key].tofile(file)
+                self.ranks[key].tofile(file)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def load(index):
+        """Читает индекс
+
+        :param RowIndex index: Индекс смещений того же файла
+        :return SortIndex: Индекс или None, если его нет или он построен не по текущему индексу смещений
+        """
+        sort_index = SortIndex(index.file_name)
+        path = sort_index.get_path(index.file_name)
+        if not os.path.isfile(path): return None
+        with open(path, mode='rb') as file:
+            if file.read(len(sort_index.magic)) != sort_index.magic: return None
+            size, mtime, count = struct.unpack('<QqQ', file.read(24))
+            if (size, mtime) != index.signature or count != len(index): return None
+            if file.readline().decode('utf-8').strip().split(',') != sort_index.keys: return None
+            for key in sort_index.keys:
+                sort_index.orders[key], sort_index.ranks[key] = array('I'), array('I')
+                sort_index.orders[key].fromfile(file, count)
+                sort_index.ranks[key].fromfile(file, count)
+        sort_index.signature = (size, mtime)
+        return sort_index
+
+    @staticmethod
+    def open(index, factory):
+        """Читает индекс, а если он устарел - перестраивает и сохраняет
+
+        Индекс сортировки необязателен: если его файла нет, он не строится.
+
+        :param RowIndex index: Индекс смещений
+        :param factory: Класс записи (vacancies.Vacancy)
+        :return SortIndex: Индекс или None, если он не построен
+        """
+        if not os.path.isfile(SortIndex.get_path(index.file_name)): return None
+        sort_index = SortIndex.load(index)
+        if sort_index is None:
+            sort_index = SortIndex(index.file_name)
+            sort_index.build(index, factory)
+            sort_index.save()
+        return sort_index
+
+    def iter_order(self, key, reverse=False):
+        """Номера записей в порядке сортировки по одному ключу
+
+        :param str key: Ключ
+        :param bool reverse: Обратный порядок
+        :return: Итератор номеров записей
+        """
+        if reverse: return reverse_stable(self.orders[key], self.ranks[key])
+        return iter(self.orders[key])
+
+    def get_key(self, keys):
+        """Ключ сортировки номеров записей по рангам
+
+        :param list keys: Ключи
+        :return: Функция номер записи -> ранг (кортеж рангов для нескольких ключей)
+        """
+        ranks = [self.ranks[key] for key in keys]
+        if len(ranks) == 1: return ranks[0].__getitem__
+        return lambda number: tuple(r[number] for r in ranks)
+
+
+class BitmapIndex:
+    """Битовые индексы столбцов с небольшим числом значений (сайдкар-файл <файл>.bitmap.json)
+
+    Для каждого значения столбца хранится битовая карта записей с этим значением
+    (сжатая zlib, как биты фильтров Блума в манифесте). Несколько условий на индексированные
+    столбцы проверяются пересечением битовых карт без чтения записей. Битовые карты
+    распаковываются только для запрошенных значений. Индекс привязан к индексу смещений
+    и устаревает вместе с ним.
+
+    Attributes:
+        file_name (str): Название CSV файла
+        signature (tuple): Размер и время изменения CSV на момент построения
+        count (int): Количество записей
+        bitmaps (dict): Столбец -> значение -> сжатая битовая карта
+    """
+    def __init__(self, file_name):
+        """Конструктор индекса
+
+        :param str file_name: Название CSV файла
+        """
+        self.file_name = file_name
+        self.signature = (0, 0)
+        self.count = 0
+        self.bitmaps = {}
+
+    @staticmethod
+    def get_path(file_name):
+        """ :return str: Путь к файлу индекса """
+        return file_name + '.bitmap.json'
+
+    def build(self, index, columns):
+        """Строит битовые карты всех столбцов за один проход по файлу
+
+        :param RowIndex index: Индекс смещений
+        :param dict columns: Столбец -> функция, возвращающая значение столбца по словарю записи
+        """
+        self.signature = index.signature
+        self.count = len(index)
+        size = (self.count + 7) // 8
+        bits = {column: {} for column in columns}
+        for number, row in enumerate(index.iter_rows()):
+            for column, get_value in columns.items():
+                value = get_value(row)
+                if value not in bits[column]: bits[column][value] = bytearray(size)
+                bits[column][value][number >> 3] |= 1 << (number & 7)
+        self.bitmaps = {column: {value: base64.b64encode(zlib.compress(bytes(b))).decode('ascii')
+                                 for value, b in values.items()} for column, values in bits.items()}
+
+    def save(self):
+        """Атомарно записывает индекс"""
+        path = self.get_path(self.file_name)
+        data = {'size': self.signature[0], 'mtime': self.signature[1], 'count': self.count, 'bitmaps': self.bitmaps}
+        with open(path + '.tmp', mode='w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def load(index, columns):
+        """Читает индекс
+
+        :param RowIndex index: Индекс смещений того же файла
+        :param dict columns: Индексируемые столбцы
+        :return BitmapIndex: Индекс или None, если его нет или он построен не по текущему индексу смещений
+        """
+        bitmap_index = BitmapIndex(index.file_name)
+        path = bitmap_index.get_path(index.file_name)
+        if not os.path.isfile(path): return None
+        with open(path, mode='r', encoding='utf-8') as file:
+            data = json.load(file)
+        if (data['size'], data['mtime']) != index.signature or data['count'] != len(index): return None
+        if sorted(data['bitmaps']) != sorted(columns): return None
+        bitmap_index.signature = (data['size'], data['mtime'])
+        bitmap_index.count = data['count']
+        bitmap_index.bitmaps = data['bitmaps']
+        return bitmap_index
+
+    @staticmethod
+    def open(index, columns):
+        """Читает индекс, а если он устарел - перестраивает и сохраняет
+
+        Битовый индекс необязателен: если его файла нет, он не строится.
+
+        :param RowIndex index: Индекс смещений
+        :param dict columns: Столбец -> функция значения столбца
+        :return BitmapIndex: Индекс или None, если он не построен
+        """
+        if not os.path.isfile(BitmapIndex.get_path(index.file_name)): return None
+        bitmap_index = BitmapIndex.load(index, columns)
+        if bitmap_index is None:
+            bitmap_index = BitmapIndex(index.file_name)
+            bitmap_index.build(index, columns)
+            bitmap_index.save()
+        return bitmap_index
+
+    def get_bitmap(self, column, value):
+        """Битовая карта записей со значением столбца
+
+        :param str column: Столбец
+        :param str value: Значение
+        :return int: Битовая карта (0, если значения нет)
+        """
+        data = self.bitmaps[column].get(value)
+        if data is None: return 0
+        return int.from_bytes(zlib.decompress(base64.b64decode(data)), 'little')
+
+    def select(self, filters, bits=None):
+        """Пересекает битовые карты индексированных условий
+
+        :param list filters: Пары (столбец, значение), все условия должны выполняться
+        :param int bits: Уже отобранные записи (None - все)
+        :return tuple: Битовая карта подходящих записей (None, если ни одно условие
+            не индексировано) и условия, которые нужно проверить по самим записям
+        """
+        rest = []
+        for column, value in filters:
+            if column not in self.bitmaps:
+                rest.append([column, value])
+                continue
+            bitmap = self.get_bitmap(column, value)
+            bits = bitmap if bits is None else bits & bitmap
+        return bits, rest
+
+
+class IntervalIndex:
+    """Индекс интервалов зарплат (сайдкар-файл <файл>.salary.idx)
+
+    Интервалы (salary_from, salary_to) в валюте вакансии упорядочены по нижней границе,
+    над ними построено дерево отрезков максимумов верхних границ. Запрос "вилка пересекается
+    с [low, high]" бинарным поиском отсекает интервалы с нижней границей больше high, а спуск
+    по дереву пропускает поддеревья, где все верхние границы меньше low. Спуск останавливается
+    на блоках по block интервалов, которые проверяются целиком через itertools.compress, поэтому
+    и редкие, и массовые выборки обходятся без поштучного спуска до листьев.
+    Точечный запрос (фильтр "Оклад") - частный случай low = high.
+    Индекс привязан к индексу смещений и устаревает вместе с ним.
+
+    Attributes:
+        file_name (str): Название CSV файла
+        signature (tuple): Размер и время изменения CSV на момент построения
+        starts (array): Нижние границы по возрастанию
+        order (array): Номера записей в том же порядке
+        maximums (array): Дерево отрезков максимумов верхних границ (листья - верхние границы с позиции size)
+        size (int): Количество листьев дерева (степень двойки)
+    """
+    magic = b'VSAL1\n'
+    block = 64
+
+    def __init__(self, file_name):
+        """Конструктор индекса
+
+        :param str file_name: Название CSV файла
+        """
+        self.file_name = file_name
+        self.signature = (0, 0)
+        self.starts = array('q')
+        self.order = array('I')
+        self.maximums = array('q')
+        self.size = 1
+
+    @staticmethod
+    def get_path(file_name):
+        """ :return str: Путь к файлу индекса """
+        return file_name + '.salary.idx'
+
+    def build(self, index):
+        """Строит индекс за один проход по файлу
+
+        :param RowIndex index: Индекс смещений
+        """
+        self.signature = index.signature
+        self.build_intervals([(int(float(row['salary_from'])), int(float(row['salary_to'])))
+                              for row in index.iter_rows()])
+
+    def build_intervals(self, intervals):
+        """Строит индекс по интервалам
+
+        :param list intervals: Пары (нижняя, верхняя граница) по номерам записей
+        """
+        order = sorted(range(len(intervals)), key=lambda number: intervals[number][0])
+        self.order = array('I', order)
+        self.starts = array('q', (intervals[number][0] for number in order))
+        self.size = 1
+        while self.size < len(order): self.size *= 2
+        self.maximums = array('q', [-1 << 63]) * (2 * self.size)
+        for position, number in enumerate(order): self.maximums[self.size + position] = intervals[number][1]
+        for node in range(self.size - 1, 0, -1):
+            self.maximums[node] = max(self.maximums[2 * node], self.maximums[2 * node + 1])
+
+    def save(self):
+        """Атомарно записывает индекс"""
+        path = self.get_path(self.file_name)
+        with open(path + '.tmp', mode='wb') as file:
+            file.write(self.magic + struct.pack('<QqQQ', self.signature[0], self.signature[1],
+                                                len(self.order), self.size))
+            self.starts.tofile(file)
+            self.order.tofile(file)
+            self.maximums.tofile(file)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def load(index):
+        """Читает индекс
+
+        :param RowIndex index: Индекс смещений того же файла
+        :return IntervalIndex: Индекс или None, если его нет или он построен не по текущему индексу смещений
+        """
+        interval_index = IntervalIndex(index.file_name)
+        path = interval_index.get_path(index.file_name)
+        if not os.path.isfile(path): return None
+        with open(path, mode='rb') as file:
+            if file.read(len(interval_index.magic)) != interval_index.magic: return None
+            size, mtime, count, interval_index.size = struct.unpack('<QqQQ', file.read(32))
+            if (size, mtime) != index.signature or count != len(index): return None
+            interval_index.starts.fromfile(file, count)
+            interval_index.order.fromfile(file, count)
+            interval_index.maximums.fromfile(file, 2 * interval_index.size)
+        interval_index.signature = (size, mtime)
+        return interval_index
+
+    @staticmethod
+    def open(index):
+        """Читает индекс, а если он устарел - перестраивает и сохраняет
+
+        Индекс интервалов необязателен: если его файла нет, он не строится.
+
+        :param RowIndex index: Индекс смещений
+        :return IntervalIndex: Индекс или None, если он не построен
+        """
+        if not os.path.isfile(IntervalIndex.get_path(index.file_name)): return None
+        interval_index = IntervalIndex.load(index)
+        if interval_index is None:
+            interval_index = IntervalIndex(index.file_name)
+            interval_index.build(index)
+            interval_index.save()
+        return interval_index
+
+    def query(self, low, high):
+        """Записи, вилка которых пересекается с [low, high]
+
+        :param float low: Нижняя граница запроса
+        :param float high: Верхняя граница запроса
+        :return list: Номера записей по возрастанию
+
+        >>> interval_index = IntervalIndex('test.csv')
+        >>> interval_index.build_intervals([(10, 20), (15, 30), (40, 50)])
+        >>> interval_index.query(18, 18), interval_index.query(25, 45), interval_index.query(60, 70)
+        ([0, 1], [1, 2], [])
+        """
+        low, end = float(low), bisect_right(self.starts, high)
+        numbers = []
+        stack = [(1, 0, self.size)] if end else []
+        while stack:
+            node, first, last = stack.pop()
+            if self.maximums[node] < low: continue
+            if last - first <= self.block:
+                last = min(last, end)
+                ends = self.maximums[self.size + first:self.size + last]
+                numbers.extend(itertools.compress(self.order[first:last], map(low.__le__, ends)))
+                continue
+            middle = (first + last) // 2
+            if middle < end: stack.append((2 * node + 1, middle, last))
+            stack.append((2 * node, first, middle))
+        numbers.sort()
+        return numbers
+
+    def select(self, filters, queries, bits=None):
+        """Пересекает результаты индексированных условий на зарплату
+
+        :param list filters: Пары (фильтр, значение), все условия должны выполняться
+        :param dict queries: Фильтр -> функция, переводящая значение в границы (low, high)
+        :param int bits: Уже отобранные записи (None - все)
+        :return tuple: Битовая карта подходящих записей (None, если ни одно условие
+            не индексировано) и условия, которые нужно проверить по самим записям
+        """
+        rest = []
+        for key, value in filters:
+            if key not in queries:
+                rest.append([key, value])
+                continue
+            bitmap = make_bits(self.query(*queries[key](value)), len(self.order))
+            bits = bitmap if bits is None else bits & bitmap
+        return bits, rest
+
+
+class SkillIndex:
+    """Инвертированный индекс навыков (сайдкар-файл <файл>.skills.idx)
+
+    Для каждого навыка хранится список номеров записей, где он встречается, по возрастанию.
+    Навыки сравниваются целиком, как в фильтре "Навыки". Условие на несколько навыков -
+    пересечение списков, начиная с самого короткого: каждый следующий список проверяется
+    бинарным поиском только для уже отобранных номеров. Длины списков - частоты навыков.
+    Индекс привязан к индексу смещений и устаревает вместе с ним.
+
+    Attributes:
+        file_name (str): Название CSV файла
+        signature (tuple): Размер и время изменения CSV на момент построения
+        count (int): Количество записей
+        positions (dict): Навык -> начало и длина его списка в postings
+        postings (array): Списки номеров записей всех навыков подряд
+    """
+    magic = b'VSKL1\n'
+
+    def __init__(self, file_name):
+        """Конструктор индекса
+
+        :param str file_name: Название CSV файла
+        """
+        self.file_name = file_name
+        self.signature = (0, 0)
+        self.count = 0
+        self.positions = {}
+        self.postings = array('I')
+
+    @staticmethod
+    def get_path(file_name):
+        """ :return str: Путь к файлу индекса """
+        return file_name + '.skills.idx'
+
+    def build(self, index):
+        """Строит индекс за один проход по файлу
+
+        :param RowIndex index: Индекс смещений
+        """
+        self.signature = index.signature
+        self.build_postings(row['key_skills'].split('\n') for row in index.iter_rows())
+
+    def build_postings(self, skill_lists):
+        """Строит списки номеров записей
+
+        :param skill_lists: Списки навыков по номерам записей
+        """
+        postings = {}
+        self.count = 0
+        for number, skills in enumerate(skill_lists):
+            for skill in skills:
+                numbers = postings.setdefault(skill, array('I'))
+                if not numbers or numbers[-1] != number: numbers.append(number)
+            self.count = number + 1
+        self.positions, self.postings = {}, array('I')
+        for skill, numbers in postings.items():
+            self.positions[skill] = [len(self.postings), len(numbers)]
+            self.postings.extend(numbers)
+
+    def save(self):
+        """Атомарно записывает индекс"""
+        path = self.get_path(self.file_name)
+        positions = json.dumps(self.positions, ensure_ascii=False).encode('utf-8')
+        with open(path + '.tmp', mode='wb') as file:
+            file.write(self.magic + struct.pack('<QqQQQ', self.signature[0], self.signature[1], self.count,
+                                                len(positions), len(self.postings)))
+            file.write(positions)
+            self.postings.tofile(file)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def load(index):
+        """Читает индекс
+
+        :param RowIndex index: Индекс смещений того же файла
+        :return SkillIndex: Индекс или None, если его нет или он построен не по текущему индексу смещений
+        """
+        skill_index = SkillIndex(index.file_name)
+        path = skill_index.get_path(index.file_name)
+        if not os.path.isfile(path): return None
+        with open(path, mode='rb') as file:
+            if file.read(len(skill_index.magic)) != skill_index.magic: return None
+            size, mtime, count, positions_length, postings_length = struct.unpack('<QqQQQ', file.read(40))
+            if (size, mtime) != index.signature or count != len(index): return None
+            skill_index.positions = json.loads(file.read(positions_length).decode('utf-8'))
+            skill_index.postings.fromfile(file, postings_length)
+        skill_index.signature = (size, mtime)
+        skill_index.count = count
+        return skill_index
+
+    @staticmethod
+    def open(index):
+        """Читает индекс, а если он устарел - перестраивает и сохраняет
+
+        Индекс навыков необязателен: если его файла нет, он не строится.
+
+        :param RowIndex index: Индекс смещений
+        :return SkillIndex: Индекс или None, если он не построен
+        """
+        if not os.path.isfile(SkillIndex.get_path(index.file_name)): return None
+        skill_index = SkillIndex.load(index)
+        if skill_index is None:
+            skill_index = SkillIndex(index.file_name)
+            skill_index.build(index)
+            skill_index.save()
+        return skill_index
+
+    def get_postings(self, skill):
+        """Номера записей с навыком
+
+        :param str skill: Навык
+        :return array: Номера по возрастанию
+        """
+        start, length = self.positions.get(skill, (0, 0))
+        return self.postings[start:start + length]
+
+    def intersect(self, skills):
+        """Записи, где есть все навыки
+
+        :param list skills: Навыки
+        :return list: Номера записей по возрастанию
+
+        >>> skill_index = SkillIndex('test.csv')
+        >>> skill_index.build_postings([['SQL', 'Git'], ['Git'], ['Python', 'SQL', 'Git'], ['SQL']])
+        >>> skill_index.intersect(['Git', 'SQL']), skill_index.intersect(['Git', 'Java'])
+        ([0, 2], [])
+        """
+        lists = sorted((self.get_postings(skill) for skill in skills), key=len)
+        numbers = list(lists[0])
+        for postings in lists[1:]:
+            if not numbers: break
+            last = len(postings) - 1
+            numbers = [n for n in numbers if postings[bisect_left(postings, n, 0, last)] == n]
+        return numbers
+
+    def get_frequencies(self, top=None):
+        """Частоты навыков
+
+        :param int top: Сколько самых частых навыков вернуть (None - все)
+        :return list: Пары (навык, количество вакансий) по убыванию количества
+
+        >>> skill_index = SkillIndex('test.csv')
+        >>> skill_index.build_postings([['SQL', 'Git'], ['Git'], ['Python', 'SQL', 'Git'], ['SQL']])
+        >>> skill_index.get_frequencies(2)
+        [('SQL', 3), ('Git', 3)]
+        """
+        frequencies = sorted(((skill, length) for skill, (_, length) in self.positions.items()),
+                             key=lambda item: item[1], reverse=True)
+        return frequencies if top is None else frequencies[:top]
+
+    def select(self, filters, key, bits=None):
+        """Пересекает результаты условий на навыки
+
+        :param list filters: Пары (фильтр, значение), все условия должны выполняться
+        :param str key: Фильтр по навыкам (значение - навыки через запятую)
+        :param int bits: Уже отобранные записи (None - все)
+        :return tuple: Битовая карта подходящих записей (None, если ни одно условие
+            не индексировано) и условия, которые нужно проверить по самим записям
+        """
+        skills = [skill for column, value in filters if column == key for skill in value.split(', ')]
+        rest = [[column, value] for column, value in filters if column != key]
+        if not skills: return bits, rest
+        bitmap = make_bits(self.intersect(skills), self.count)
+        return (bitmap if bits is None else bits & bitmap), rest
+
+
+class InputConnect:
+    """Начальная точка программы. Объединяет всю логику программы
+
+    Attributes:
+        file_name (str): Название файла
+    """
+    def __init__(self, fn=None):
+        """
+        Начало работы программы
+
+        :param str fn: Название CSV файла
+        """
+        self.file_name = fn
+        if fn is None:
+            self.file_name = input('Введите название файла: ')
+
+        if not RowIndex.supports(self.file_name):
+            print('Индекс строится только для несжатого CSV файла')
+            return
+        from vacancies import DataSet, Vacancy
+
+        index = RowIndex(self.file_name)
+        index.build()
+        index.save()
+        sort_index = SortIndex(self.file_name)
+        sort_index.build(index, Vacancy)
+        sort_index.save()
+        bitmap_index = BitmapIndex(self.file_name)
+        bitmap_index.build(index, DataSet.bitmap_columns)
+        bitmap_index.save()
+        interval_index = IntervalIndex(self.file_name)
+        interval_index.build(index)
+        interval_index.save()
+        skill_index = SkillIndex(self.file_name)
+        skill_index.build(index)
+        skill_index.save()
+        print('Проиндексировано вакансий: ' + str(len(index)))
+        print('Самые частые навыки: ' + ', '.join('{0} ({1})'.format(*item) for item in skill_index.get_frequencies(10)))
+
+
+if __name__ == '__main__': InputConnect()
@@ -0,0 +1,382 @@
+import csv
+import os
+import pathlib
+import re
+import sqlite3
+import time
+
+from compression import open_file
+
+
+class VacancyStore:
+    """Хранилище вакансий в SQLite
+
+    Исходные поля CSV хранятся как есть, рядом - вычисленные при загрузке столбцы
+    для фильтров, сортировок и агрегатов, чтобы повторные запросы шли по индексам
+    и не разбирали текст заново.
+
+    Attributes:
+        db_name (str): Файл базы данных
+        connection (Connection): Соединение с базой
+    """
+    columns = ['name', 'description', 'key_skills', 'experience_id', 'premium', 'employer_name',
+               'salary_from', 'salary_to', 'salary_gross', 'salary_currency', 'area_name', 'published_at']
+    currency_to_rub = {
+        "AZN": 35.68, "BYR": 23.91, "EUR": 59.90, "GEL": 21.74, "KGS": 0.76,
+        "KZT": 0.13, "RUR": 1, "UAH": 1.64, "USD": 60.66, "UZS": 0.0055,
+    }
+    exp_weight = {'noExperience': 1, 'between1And3': 2, 'between3And6': 3, 'moreThan6': 4}
+    ru_exp = {
+        'Нет опыта': 'noExperience',
+        'От 1 года до 3 лет': 'between1And3',
+        'От 3 до 6 лет': 'between3And6',
+        'Более 6 лет': 'moreThan6',
+    }
+    ru_currency = {
+        'Манаты': 'AZN', 'Белорусские рубли': 'BYR', 'Евро': 'EUR', 'Грузинский лари': 'GEL',
+        'Киргизский сом': 'KGS', 'Тенге': 'KZT', 'Рубли': 'RUR', 'Гривны': 'UAH', 'Доллары': 'USD',
+        'Узбекский сум': 'UZS',
+    }
+    sort_columns = {
+        'Описание': 'description_short',
+        'Навыки': 'skills_len',
+        'Оклад': 'salary_average',
+        'Дата публикации вакансии': 'published_at',
+        'Опыт работы': 'experience_weight',
+        'Премиум-вакансия': 'premium_ru',
+        'Идентификатор валюты оклада': 'salary_currency',
+        'Название': 'name_clean',
+        'Название региона': 'area_name',
+        'Компания': 'employer_name',
+    }
+
+    def __init__(self, db_name, read_only=False):
+        """Конструктор хранилища
+
+        :param str db_name: Файл базы данных (создается, если его нет и база открыта не только для чтения)
+        :param bool read_only: Открыть существующую базу только для чтения
+        """
+        self.db_name = db_name
+        if read_only:
+            self.connection = sqlite3.connect(pathlib.Path(os.path.abspath(db_name)).as_uri() + '?mode=ro', uri=True)
+        else:
+            self.connection = sqlite3.connect(db_name)
+            self.create_table('vacancies')
+
+    @staticmethod
+    def open(db_name):
+        """Открывает существующую базу только для чтения (файл базы при этом не создается)
+
+        :param str db_name: Файл базы данных
+        :return VacancyStore: Хранилище или None, если файла базы нет
+
+        >>> VacancyStore.open('missing.db') is None
+        True
+        """
+        if not os.path.isfile(db_name): return None
+        return VacancyStore(db_name, read_only=True)
+
+    def create_table(self, table):
+        """Создает таблицу вакансий, если ее нет
+
+        :param str table: Название таблицы
+        """
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS {1} (
+            id INTEGER PRIMARY KEY,
+            {0},
+            complete INTEGER,
+            year INTEGER,
+            sal_from REAL,
+            sal_to REAL,
+            salary_average REAL,
+            name_clean TEXT,
+            description_short TEXT,
+            skills_len INTEGER,
+            experience_weight INTEGER,
+            premium_ru TEXT,
+            published_date TEXT
+        )'''.format(', '.join(c + ' TEXT' for c in self.columns), table))
+
+    def close(self):
+        """Закрывает соединение"""
+        self.connection.close()
+
+    @staticmethod
+    def html_remove(text):
+        """Убирает HTML тэги из строки (как vacancies.Cleaners.html_remove)
+
+        :param str text: Исходный текст
+        :return str: Почищенный текст
+        """
+        return re.sub(r'\s+', ' ', re.sub('<.*?>', '', text)).strip()
+
+    def make_row(self, vacancy):
+        """Строка таблицы из словаря вакансии
+
+        :param dict vacancy: Словарь вакансии
+        :return tuple: Значения столбцов таблицы (без id)
+
+        >>> store = VacancyStore(':memory:')
+        >>> row = store.make_row({'name': '<b>Test</b>', 'salary_from': '10', 'salary_to': '20',
+        ...                       'salary_currency': 'USD', 'area_name': 'Test',
+        ...                       'published_at': '2007-12-03T17:34:36+0300'})
+        >>> row[12:18]
+        (1, 2007, 10, 20, 909.9, 'Test')
+        """
+        values = [vacancy.get(c) for c in self.columns]
+        complete = int(all(v != '' for v in vacancy.values()))
+        published = vacancy.get('published_at') or ''
+        year = int(published[:4]) if published[:4].isdigit() else None
+        try:
+            sal_from, sal_to = int(float(vacancy['salary_from'])), int(float(vacancy['salary_to']))
+            rate = self.currency_to_rub.get(vacancy.get('salary_currency'))
+            average = rate * (sal_from + sal_to) / 2 if rate is not None else None
+        except (KeyError, ValueError):
+            sal_from, sal_to, average = None, None, None
+        name = self.html_remove(vacancy.get('name') or '')
+        description = self.html_remove(vacancy.get('description') or '')
+        if len(description) > 100: description = description[:100] + '...'
+        skills = vacancy.get('key_skills')
+        premium = vacancy.get('premium')
+        published_date = published[8:10] + '.' + published[5:7] + '.' + published[:4] if published else None
+        return tuple(values) + (complete, year, sal_from, sal_to, average, name, description,
+                                len(skills.split('\n')) if skills is not None else None,
+                                self.exp_weight.get(vacancy.get('experience_id')),
+                                None if premium is None else ('Да' if premium.lower() == 'true' else 'Нет'),
+                                published_date)
+
+    def load(self, file_name, batch_size=10000):
+        """Загружает CSV файл пачками, каждая пачка - в своей транзакции
+
+        Файл загружается во временную таблицу, которая затем одной транзакцией заменяет
+        прежнюю: повторная загрузка не дублирует вакансии, а до замены запросы видят прежние данные.
+
+        :param str file_name: Название файла (может быть сжат)
+        :param int batch_size: Размер пачки
+        :return int: Количество загруженных вакансий
+
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'v.csv')
+        >>> with open(path, mode='w', encoding='utf-8') as file:
+        ...     _ = file.write('name,salary_from,salary_to,salary_currency,published_at\\nA,1,2,RUR,2022\\n')
+        >>> store = VacancyStore(':memory:')
+        >>> store.load(path), store.load(path), store.count()
+        (1, 1, 1)
+        """
+        with self.connection:
+            self.connection.execute('DROP TABLE IF EXISTS vacancies_load')
+        self.create_table('vacancies_load')
+        query = 'INSERT INTO vacancies_load ({0}, complete, year, sal_from, sal_to, salary_average, name_clean, ' \
+                'description_short, skills_len, experience_weight, premium_ru, published_date) ' \
+                'VALUES ({1})'.format(', '.join(self.columns), ', '.join('?' * (len(self.columns) + 11)))
+        count = 0
+        self.connection.execute('PRAGMA synchronous = OFF')
+        with open_file(file_name, mode='r', encoding='utf-8-sig') as file:
+            reader = csv.reader(file)
+            header = next(reader)
+            batch = []
+            for row in reader:
+                if len(row) != len(header): continue
+                batch.append(self.make_row(dict(zip(header, row))))
+                if len(batch) >= batch_size:
+                    with self.connection:
+                        self.connection.executemany(query, batch)
+                    count += len(batch)
+                    batch = []
+            with self.connection:
+                self.connection.executemany(query, batch)
+            count += len(batch)
+        self.connection.execute('PRAGMA synchronous = FULL')
+        with self.connection:
+            self.connection.execute('DROP TABLE vacancies')
+            self.connection.execute('ALTER TABLE vacancies_load RENAME TO vacancies')
+        self.create_indexes()
+        return count
+
+    def create_indexes(self):
+        """Создает индексы (после массовой загрузки это дешевле, чем поддерживать их при вставке)"""
+        with self.connection:
+            for column in ('year', 'area_name', 'salary_currency', 'name_clean'):
+                self.connection.execute('CREATE INDEX IF NOT EXISTS idx_{0} ON vacancies ({0})'.format(column))
+            self.connection.execute('ANALYZE')
+
+    def count(self):
+        """ :return: Количество полностью заполненных вакансий (0, если вакансии не загружались) """
+        if self.connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'vacancies'"
+                                   ).fetchone()[0] == 0: return 0
+        return self.connection.execute('SELECT COUNT(*) FROM vacancies WHERE complete').fetchone()[0]
+
+    def get_stat1(self):
+        """ Получить динамику уровня зарплат по годам
+
+        :return dict: Динамика уровня зарплат по годам
+        """
+        return {year: int(total / count) for year, total, count in self.connection.execute(
+            'SELECT year, SUM(salary_average), COUNT(*) FROM vacancies WHERE complete '
+            'GROUP BY year ORDER BY MIN(id)')}
+
+    def get_stat2(self):
+        """Получить динамику количества вакансий по годам
+
+        :return dict: Динамика количества вакансий по годам
+        """
+        return dict(self.connection.execute(
+            'SELECT year, COUNT(*) FROM vacancies WHERE complete GROUP BY year ORDER BY MIN(id)'))
+
+    def get_vacancy_stats(self, vacancy_name):
+        """Зарплаты и количество вакансий по годам для выбранной профессии
+
+        :param str vacancy_name: Подстрока названия (с учетом регистра, как str.find)
+        :return list: Тройки (год, сумма зарплат, количество)
+        """
+        return list(self.connection.execute(
+            'SELECT year, SUM(salary_average), COUNT(*) FROM vacancies WHERE complete AND instr(name, ?) > 0 '
+            'GROUP BY year ORDER BY MIN(id)', (vacancy_name,)))
+
+    def get_stat3(self, vacancy_name):
+        """Получить динамику уровня зарплат по годам для выбранной профессии
+
+        :param str vacancy_name: Название профессии
+        :return dict: Динамика уровня зарплат по годам для выбранной профессии
+        """
+        stats = self.get_vacancy_stats(vacancy_name)
+        if not stats: return {year: 0 for year in self.get_stat2()}
+        return {year: int(total / count) for year, total, count in stats}
+
+    def get_stat4(self, vacancy_name):
+        """Получить динамику количества вакансий по годам для выбранной профессии
+
+        :param str vacancy_name: Название профессии
+        :return dict: Динамика количества вакансий по годам для выбранной профессии
+        """
+        stats = self.get_vacancy_stats(vacancy_name)
+        if not stats: return {year: 0 for year in self.get_stat2()}
+        return {year: count for year, _, count in stats}
+
+    def get_stat5and6(self):
+        """Получить уровень и долю зарплат по городам (в порядке убывания)
+
+        :return: Уровень и доля зарплат по городам (в порядке убывания)
+        """
+        cities = list(self.connection.execute(
+            'SELECT area_name, SUM(salary_average), COUNT(*) FROM vacancies WHERE complete '
+            'GROUP BY area_name ORDER BY MIN(id)'))
+        total = sum(count for _, _, count in cities)
+        result1 = [(city, round(count / total, 4)) for city, _, count in cities]
+        result1 = [item for item in result1 if item[-1] >= 0.01]
+        result1.sort(key=lambda a: a[-1], reverse=True)
+        shown = dict(result1)
+        result2 = [(city, int(salary / count)) for city, salary, count in cities if city in shown]
+        result2.sort(key=lambda a: a[-1], reverse=True)
+        return dict(result2[:10]), dict(result1[:10])
+
+    def filter_clause(self, filter_params):
+        """SQL условие для фильтра vacancies.DataSet
+
+        :param list filter_params: Параметр фильтра и значение
+        :return tuple: Условие и параметры запроса
+        """
+        if len(filter_params) == 0: return '', []
+        key, val = filter_params[0], filter_params[1]
+        if key == 'Навыки':
+            skills = val.split(', ')
+            return ' AND '.join(["instr(char(10) || key_skills || char(10), char(10) || ? || char(10)) > 0"]
+                                * len(skills)), skills
+        if key == 'Оклад': return 'sal_from <= ? AND ? <= sal_to', [float(val), float(val)]
+        if key == 'Диапазон оклада':
+            low, high = val.split(' - ')
+            return 'sal_from <= ? AND ? <= sal_to', [float(high), float(low)]
+        if key == 'Дата публикации вакансии': return 'published_date = ?', [val]
+        if key == 'Опыт работы': return 'experience_id = ?', [self.ru_exp.get(val)]
+        if key == 'Премиум-вакансия': return 'premium_ru = ?', [val]
+        if key == 'Идентификатор валюты оклада': return 'salary_currency = ?', [self.ru_currency.get(val)]
+        if key == 'Название': return 'name_clean = ?', [val]
+        if key == 'Название региона': return 'area_name = ?', [val]
+        return 'employer_name = ?', [val]
+
+    def get_vacancies(self, filter_params, sort_params, sort_reverse, slice_num):
+        """Фильтрация, сортировка и срез вакансий одним запросом
+
+        :param list filter_params: Фильтры - пары (параметр, значение), должны выполняться все
+        :param str sort_params: Параметры сортировки (через запятую)
+        :param bool sort_reverse: Обратная сортировка?
+        :param list slice_num: Срез от и до
+        :return list: Пары (номер в выдаче, словарь вакансии)
+        """
+        clauses = [self.filter_clause(f) for f in filter_params]
+        where = ' AND '.join(clause for clause, _ in clauses)
+        params = [p for _, clause_params in clauses for p in clause_params]
+        query = 'SELECT {0} FROM vacancies WHERE complete'.format(', '.join(self.columns))
+        if where: query += ' AND ' + where
+        if sort_params != '':
+            query += ' ORDER BY {0}, id'.format(', '.join(self.sort_columns[p] + (' DESC' if sort_reverse else '')
+                                                         for p in sort_params.split(', ')))
+        else:
+            query += ' ORDER BY id DESC' if sort_reverse else ' ORDER BY id'
+        start = slice_num[0] if len(slice_num) > 0 else 0
+        query += ' LIMIT ? OFFSET ?'
+        params += [slice_num[1] - start if len(slice_num) > 1 else -1, start]
+        return [(start + i + 1, dict(zip(self.columns, row)))
+                for i, row in enumerate(self.connection.execute(query, params))]
+
+
+def benchmark(csv_name, db_name, vacancy_name):
+    """Сравнение загрузки и запросов к SQLite с разбором CSV
+
+    :param str csv_name: CSV файл
+    :param str db_name: Файл базы данных
+    :param str vacancy_name: Название профессии
+    """
+    import statistics
+
+    start = time.perf_counter()
+    store = VacancyStore(db_name)
+    count = store.load(csv_name)
+    elapsed = time.perf_counter() - start
+    print('Загрузка: {0} строк за {1:.2f} с ({2:.0f} строк/с)'.format(count, elapsed, count / elapsed))
+
+    start = time.perf_counter()
+    store.get_stat1(), store.get_stat2(), store.get_stat3(vacancy_name), store.get_stat4(vacancy_name)
+    store.get_stat5and6()
+    print('Статистика из SQLite: {0:.3f} с'.format(time.perf_counter() - start))
+
+    start = time.perf_counter()
+    stats = statistics.DataSet(csv_name, vacancy_name).get_statistic()
+    stats.get_stat1(), stats.get_stat2(), stats.get_stat3(), stats.get_stat4(), stats.get_stat5and6()
+    print('Статистика из CSV: {0:.3f} с'.format(time.perf_counter() - start))
+
+    start = time.perf_counter()
+    store.get_vacancies([['Название региона', 'Москва']], 'Оклад', True, [0, 20])
+    print('Выборка вакансий из SQLite: {0:.3f} с'.format(time.perf_counter() - start))
+    store.close()
+
+
+class InputConnect:
+    """Начальная точка программы. Загружает CSV файл в базу SQLite (содержимое базы заменяется)
+
+    Attributes:
+        file_name (str): Название файла
+        db_name (str): Файл базы данных
+    """
+    def __init__(self, fn=None, db=None):
+        """
+        Начало работы программы
+
+        :param str fn: Название файла
+        :param str db: Файл базы данных (по умолчанию - рядом с файлом, с расширением .db)
+        """
+        self.file_name = fn
+        if fn is None:
+            self.file_name = input('Введите название файла: ')
+        self.db_name = db
+        if db is None:
+            self.db_name = input('Введите название базы (пусто - рядом с файлом): ') or \
+                           self.file_name.split('.csv')[0] + '.db'
+
+        store = VacancyStore(self.db_name)
+        count = store.load(self.file_name)
+        store.close()
+        print('Загружено вакансий: {0} (база {1})'.format(count, self.db_name))
+
+
+if __name__ == '__main__': InputConnect()
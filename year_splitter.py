@@ -1,5 +1,15 @@
 import csv
+import io
+import multiprocessing
 import os
+import re
+import shutil
+import zlib
+
+from compression import COMPRESSORS, get_compressor, open_file
+from dedup import Deduplicator
+from manifest import Manifest, PartitionStats
+from raw_csv import iter_records, iter_range, parse_header, get_fields, record_ranges
 
 
 class Vacancy:
@@ -48,8 +58,8 @@ class DataSet:
         self.header = []
 
     def csv_reader(self):
-        """Читает CSV файл"""
-        with open(self.file_name, mode='r', encoding='utf-8-sig') as file:
+        """Читает CSV файл (переводы строк внутри полей сохраняются как есть)"""
+        with open_file(self.file_name, mode='r', encoding='utf-8-sig', newline='') as file:
             reader = csv.reader(file)
             self.header = next(reader)
             # header_length = len(self.header)
@@ -60,33 +70,307 @@ class DataSet:
                     self.data[v_year] = []
                 self.data[v_year].append(dict(zip(self.header, row)))
 
-    def export_csv(self, directory):
-        """Экпорт данных по файлам"""
+    def export_csv(self, directory, compression=None):
+        """Экпорт данных по файлам
+
+        :param str directory: Выходная папка
+        :param str compression: Сжатие выходных файлов (gz, bz2, xz) или None
+        """
         os.makedirs(directory, exist_ok=True)
         for year in self.data.keys():
-            filename = directory + "/" + str(year) + ".csv"
-            with open(filename, "w", encoding='utf-8-sig', newline="") as file:
+            filename = directory + "/" + str(year) + ".csv" + ("." + compression if compression else "")
+            with open_file(filename, "w", encoding='utf-8-sig', newline="") as file:
                 writer = csv.DictWriter(file, fieldnames=self.header)
                 writer.writeheader()
                 writer.writerows(self.data[year])
 
 
+class PartitionKey:
+    """Выражение ключа разбиения
+
+    Уровни вложенности разделяются '/', каждый уровень - одно из:
+    year, month, year-month, название столбца (area_name, salary_currency, ...)
+    или hash(столбец, N) - номер корзины от 0 до N - 1.
+
+    Attributes:
+        expression (str): Исходное выражение
+        levels (list): Уровни разбиения (номер столбца, функция значения)
+    """
+    date_levels = {
+        'year': lambda value: value[:4] if value[:4].isdigit() else None,
+        'month': lambda value: value[5:7] if value[5:7].isdigit() else None,
+        'year-month': lambda value: value[:7] if value[:4].isdigit() and value[5:7].isdigit() else None,
+    }
+    bad_chars = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+    def __init__(self, expression, columns):
+        """Конструктор ключа разбиения
+
+        :param str expression: Выражение ключа, например 'year/month' или 'hash(name, 16)'
+        :param list columns: Названия столбцов файла
+
+        >>> PartitionKey('year/month', ['name', 'published_at']).get(['Test', '2007-12-03T17:34:36+0300'])
+        ['2007', '12']
+        >>> PartitionKey('hash(name, 4)', ['name', 'published_at']).get(['Test', '2007-12-03T17:34:36+0300'])
+        ['2']
+        """
+        self.expression = expression
+        self.levels = []
+        for level in expression.split('/'):
+            level = level.strip()
+            match = re.fullmatch(r'hash\((\w+),\s*(\d+)\)', level)
+            if level in self.date_levels:
+                self.levels.append((columns.index('published_at'), self.date_levels[level]))
+            elif match:
+                buckets = int(match.group(2))
+                self.levels.append((columns.index(match.group(1)),
+                                    lambda value, n=buckets: str(zlib.crc32(value.encode('utf-8')) % n)))
+            elif level in columns:
+                self.levels.append((columns.index(level),
+                                    lambda value: self.bad_chars.sub('_', value.strip()) or '_'))
+            else:
+                raise ValueError('Неизвестный ключ разбиения: ' + level)
+
+    @property
+    def indexes(self):
+        """ :return: Номера столбцов, нужных для ключа """
+        return sorted(set(index for index, _ in self.levels))
+
+    def get(self, fields):
+        """Вычисляет партицию записи
+
+        :param fields: Поля записи (список или словарь номер -> значение)
+        :return list: Значения уровней или None, если ключ не вычисляется
+        """
+        result = []
+        for index, func in self.levels:
+            value = func(fields[index])
+            if value is None: return None
+            result.append(value)
+        return result
+
+
+class RawDataSet:
+    """Дата-сет для разбиения без разбора строк (passthrough)
+
+    Записи переносятся в файлы партиций в исходном байтовом виде,
+    из записи достаются только поля, входящие в ключ разбиения и в статистику манифеста.
+
+    Attributes:
+        file_name (str): Название файла
+        key (str): Выражение ключа разбиения
+        blooms (bool): Строить фильтры Блума по названиям, городам и навыкам
+        compression (str): Сжатие выходных файлов (gz, bz2, xz) или None
+        dedup (list): Столбцы ключа для удаления дубликатов или None
+        deduplicator (Deduplicator): Дедупликатор (на время разбиения)
+        header (bytes): Сырая строка заголовка
+        skipped (int): Количество записей, для которых не вычислился ключ
+        data_start (int): Смещение первой записи после заголовка
+        columns (list): Названия столбцов
+        newline (bytes): Перевод строки, используемый в файле
+    """
+    parallel_size = 64 << 20
+
+    def __init__(self, file_name, key='year', blooms=True, compression=None, dedup=None):
+        """Конструктор класса RawDataSet
+
+        :param str file_name: Название файла (может быть сжат: .gz, .bz2, .xz)
+        :param str key: Выражение ключа разбиения
+        :param bool blooms: Строить фильтры Блума по названиям, городам и навыкам
+        :param str compression: Сжатие выходных файлов (gz, bz2, xz) или None
+        :param list dedup: Столбцы ключа для удаления дубликатов или None
+        """
+        self.file_name = file_name
+        self.key = key
+        self.blooms = blooms
+        self.compression = compression
+        self.dedup = dedup
+        self.deduplicator = None
+        self.header = b''
+        self.skipped = 0
+        self.data_start = 0
+        self.columns = []
+        self.newline = b'\n'
+
+    def get_processes(self):
+        """Количество процессов по умолчанию
+
+        Пул и склейка сегментов окупаются только на больших несжатых файлах без удаления дубликатов.
+
+        :return int: По числу ядер для несжатого файла от parallel_size байт, иначе 1
+        """
+        if get_compressor(self.file_name) or self.dedup or os.path.getsize(self.file_name) < self.parallel_size:
+            return 1
+        return multiprocessing.cpu_count()
+
+    def read_header(self):
+        """Читает заголовок файла"""
+        with open_file(self.file_name, mode='rb', threaded=False) as file:
+            self.header = file.readline()
+        self.columns = parse_header(self.header)
+        self.data_start = len(self.header)
+        self.newline = self.header[len(self.header.rstrip(b'\r\n')):] or b'\n'
+
+    @property
+    def extension(self):
+        """ :return: Расширение файлов партиций """
+        return ".csv" + ("." + self.compression if self.compression else "")
+
+    def open_output(self, path, mode="wb"):
+        """Открывает выходной файл (сегмент) с учетом сжатия
+
+        Сжатые сегменты - самостоятельные потоки gzip/bz2/xz,
+        поэтому их можно склеивать обычной конкатенацией файлов.
+
+        :param str path: Путь к файлу
+        :param str mode: Режим открытия
+        :return: Файловый объект
+        """
+        if not self.compression: return open(path, mode, buffering=1 << 20)
+        return io.BufferedWriter(COMPRESSORS["." + self.compression].open(path, mode), 1 << 20)
+
+    def split_range(self, task):
+        """Разбивает диапазон байт файла по партициям
+
+        :param tuple task: Начало и конец диапазона (None - до конца файла), выходная папка
+            и суффикс сегмента (если суффикс пустой, пишутся готовые файлы с заголовком)
+        :return tuple: Пути файлов и статистика по партициям, количество пропущенных записей
+        """
+        start, end, directory, suffix = task
+        key = PartitionKey(self.key, self.columns)
+        stat_columns = PartitionStats.columns + (PartitionStats.bloom_columns if self.blooms else [])
+        stat_columns = [(c, self.columns.index(c)) for c in stat_columns if c in self.columns]
+        dedup_columns = []
+        if self.deduplicator:
+            dedup_columns = [(c, self.columns.index(c)) for c in self.deduplicator.get_columns(self.columns)]
+        indexes = sorted(set(key.indexes) | set(i for _, i in stat_columns + dedup_columns))
+        length = len(self.columns)
+        files, paths, stats, skipped = {}, {}, {}, 0
+        try:
+            with open_file(self.file_name, mode='rb') as file:
+                if get_compressor(self.file_name): file.readline()
+                lines = file if end is None else iter_range(file, start, end)
+                for record in iter_records(lines):
+                    try:
+                        fields = get_fields(record, indexes, length)
+                    except (IndexError, UnicodeDecodeError):
+                        fields = None
+                    partition = fields and key.get(fields)
+                    if not partition:
+                        skipped += 1
+                        continue
+                    if dedup_columns and self.deduplicator.is_duplicate({c: fields[i] for c, i in dedup_columns}):
+                        continue
+                    partition = '/'.join(partition)
+                    out = files.get(partition)
+                    if out is None:
+                        path = directory + "/" + partition + self.extension
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        out = self.open_output(path + suffix)
+                        if not suffix: out.write(self.header)
+                        files[partition], paths[partition] = out, path + suffix
+                        stats[partition] = PartitionStats(partition + self.extension)
+                    if not record.endswith(b'\n'): record += self.newline
+                    out.write(record)
+                    stats[partition].add({c: fields[i] for c, i in stat_columns})
+        finally:
+            for out in files.values(): out.close()
+        return paths, stats, skipped
+
+    def split(self, directory, processes=1):
+        """Разбивает файл по партициям и записывает манифест
+
+        :param str directory: Выходная папка
+        :param int processes: Количество процессов (1 - без параллельности,
+            сжатый входной файл и удаление дубликатов всегда обрабатываются последовательно)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.read_header()
+        PartitionKey(self.key, self.columns)
+        manifest = Manifest(directory, self.key)
+        if get_compressor(self.file_name) or self.dedup: processes = 1
+        if processes <= 1:
+            end = None if get_compressor(self.file_name) else os.path.getsize(self.file_name)
+            if self.dedup: self.deduplicator = Deduplicator(self.dedup)
+            try:
+                _, manifest.partitions, self.skipped = self.split_range((self.data_start, end, directory, ''))
+            finally:
+                if self.deduplicator: self.deduplicator.close()
+            self.write_manifest(manifest)
+            return
+
+        tasks = [(start, end, directory, '.part' + str(i))
+                 for i, (start, end) in enumerate(record_ranges(self.file_name, self.data_start, processes))]
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(self.split_range, tasks)
+
+        segments = {}
+        for paths, stats, skipped in results:
+            self.skipped += skipped
+            for partition, path in paths.items():
+                segments.setdefault(partition, []).append(path)
+                if partition in manifest.partitions: manifest.partitions[partition].merge(stats[partition])
+                else: manifest.partitions[partition] = stats[partition]
+        for partition, parts in segments.items():
+            path = directory + "/" + partition + self.extension
+            with self.open_output(path) as out:
+                out.write(self.header)
+            with open(path, "ab") as out:
+                for part_path in parts:
+                    with open(part_path, "rb") as part:
+                        shutil.copyfileobj(part, out, 1 << 20)
+                    os.remove(part_path)
+        self.write_manifest(manifest)
+
+    def write_manifest(self, manifest):
+        """Дописывает размеры файлов, строит фильтры Блума и сохраняет манифест
+
+        :param Manifest manifest: Манифест со статистикой партиций
+        """
+        for stats in manifest.partitions.values():
+            stats.size = os.path.getsize(os.path.join(manifest.directory, stats.file))
+            stats.build_blooms()
+        manifest.save()
+
+
 class InputConnect:
     """Начальная точка программы. Объединяет всю логику программы
 
     Attributes:
         file_name (str): Название файла
+        dir_name (str): Название выходной папки
     """
-    def __init__(self):
+    def __init__(self, fn=None, dn=None, passthrough=True, processes=None, key='year', compression=None, dedup=None):
         """
         Начало работы программы
+
+        :param str fn: Название файла
+        :param str dn: Название выходной папки
+        :param bool passthrough: Переносить записи без разбора
+        :param int processes: Количество процессов для разбиения (по умолчанию - по числу ядер
+            для несжатого файла от RawDataSet.parallel_size байт, иначе 1)
+        :param str key: Ключ разбиения: year, month, year-month, столбец или hash(столбец, N),
+            уровни вложенности через '/', например 'year/month'
+        :param str compression: Сжатие выходных файлов (gz, bz2, xz) или None
+        :param list dedup: Столбцы ключа для удаления дубликатов (например name, employer_name, published_at)
+            или None; дубликаты удаляются только при разбиении без разбора строк
         """
-        self.file_name = input('Введите название файла: ')
-        self.dir_name = input('Введите название выходной папки: ')
+        self.file_name = fn
+        if fn is None:
+            self.file_name = input('Введите название файла: ')
+        self.dir_name = dn
+        if dn is None:
+            self.dir_name = input('Введите название выходной папки: ')
 
-        dataset = DataSet(self.file_name)
-        dataset.csv_reader()
-        dataset.export_csv(self.dir_name)
+        if passthrough:
+            dataset = RawDataSet(self.file_name, key, compression=compression, dedup=dedup)
+            dataset.split(self.dir_name, processes or dataset.get_processes())
+            if dataset.skipped: print('Пропущено записей без ключа разбиения: ' + str(dataset.skipped))
+            if dataset.deduplicator: print(dataset.deduplicator.report())
+        else:
+            dataset = DataSet(self.file_name)
+            dataset.csv_reader()
+            dataset.export_csv(self.dir_name, compression)
 
 
 if __name__ == '__main__': InputConnect()